@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     # add
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "users",
@@ -150,3 +151,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = "users.User"
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
+
+# add
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "users.authentication.UserJWTAuthentication",
+    ],
+    "DEFAULT_PERMISSION_CLASSES": [
+        "rest_framework.permissions.IsAuthenticated",
+    ],
+}
+
+# Default page size of the keyset paginated list endpoints, clients may ask for up to 100
+KEYSET_PAGE_SIZE = 20
+
+# Per-process cache of principals resolved from JWT cookies
+PRINCIPAL_CACHE_MAX_SIZE = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 300
+
+# Token revocation list (logout), checked through a per-process Bloom filter
+TOKEN_REVOCATION_ENABLED = True
+TOKEN_REVOCATION_FILTER_CAPACITY = 100000
+TOKEN_REVOCATION_FILTER_ERROR_RATE = 0.001
+TOKEN_REVOCATION_FILTER_REBUILD_SECONDS = 60
+
+# "default" is private to each worker process. "shared" is seen by every worker and backs the menu cache and
+# Idempotency-Key records, which are refused on a per-process cache. It defaults to the database cache, whose
+# table is created by migrate (or "python manage.py createcachetable"); point SHARED_CACHE_BACKEND/SHARED_CACHE_LOCATION at Redis
+# (django.core.cache.backends.redis.RedisCache) or Memcached in production
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": config("SHARED_CACHE_BACKEND", default="django.core.cache.backends.db.DatabaseCache"),
+        "LOCATION": config("SHARED_CACHE_LOCATION", default="shared_cache"),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
+# Versioned cache of the public vendor detail and menu payloads, MENU_CACHE_ALIAS names a shared entry in CACHES
+MENU_CACHE_ENABLED = config("MENU_CACHE_ENABLED", default=True, cast=bool)
+MENU_CACHE_ALIAS = config("MENU_CACHE_ALIAS", default="shared")
+MENU_CACHE_TIMEOUT_SECONDS = 3600
+
+# Resized WebP and JPEG derivatives of uploaded images, generated in a thread pool after the upload commits
+IMAGE_DERIVATIVES_ASYNC = True
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Media delivery, "nginx" sends X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX (an internal location aliased
+# to MEDIA_ROOT), "apache" sends X-Sendfile, empty streams the file from Django with byte range support
+MEDIA_SENDFILE_BACKEND = config("MEDIA_SENDFILE_BACKEND", default="")
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
+# Idempotency-Key support on mutating endpoints, responses are replayed to retries for IDEMPOTENCY_TTL_SECONDS.
+# IDEMPOTENCY_CACHE_ALIAS has to name a cache shared by all workers (not LocMemCache)
+IDEMPOTENCY_CACHE_ALIAS = config("IDEMPOTENCY_CACHE_ALIAS", default="shared")
+IDEMPOTENCY_TTL_SECONDS = 86400
+IDEMPOTENCY_LOCK_SECONDS = 30
+IDEMPOTENCY_WAIT_SECONDS = 10
+
+# Live order events streamed over Server-Sent Events (run under ASGI), "postgres" fans them out to every worker
+# through LISTEN/NOTIFY, "memory" only within the process, "auto" picks by database engine
+ORDER_EVENTS_BACKEND = config("ORDER_EVENTS_BACKEND", default="auto")
+ORDER_EVENTS_QUEUE_SIZE = 100
+ORDER_EVENTS_HEARTBEAT_SECONDS = 15
+ORDER_EVENTS_MAX_STREAM_SECONDS = 300
+
+# Shopping carts, "database" uses the Cart table directly. "cache" keeps live carts in CART_CACHE_ALIAS and writes
+# them back to the Cart table CART_FLUSH_DELAY_SECONDS after they change and at logout. It needs Redis or Memcached
+# shared by all workers (the cart lock and counters have to hold across workers) and refuses to start otherwise
+CART_STORE = config("CART_STORE", default="database")
+CART_CACHE_ALIAS = config("CART_CACHE_ALIAS", default="shared")
+CART_CACHE_TIMEOUT_SECONDS = 1209600
+CART_FLUSH_DELAY_SECONDS = 30
+CART_LOCK_SECONDS = 30
+CART_LOCK_WAIT_SECONDS = 10
+
+# Order statuses and food categories are kept in memory by every process, reloaded this often to pick up
+# changes made by other processes (changes made in the process itself apply right away)
+LOOKUP_REGISTRY_REFRESH_SECONDS = 300
+# An id or name they don't know reloads them at most this often, unknown ids sent by clients are not found without a query
+LOOKUP_REGISTRY_MISS_RELOAD_SECONDS = 5
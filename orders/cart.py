@@ -0,0 +1,394 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Import python standard modules
+import contextlib, datetime, logging, threading, time, uuid
+
+# Import project modules
+from .models import Cart
+from users.caches import check_shared_cache
+from vendors.models import Menu
+
+logger = logging.getLogger(__name__)
+
+
+# Raised when there is nothing to check out, also what a concurrent duplicate checkout sees
+class EmptyCart(Exception):
+    pass
+
+
+# Raised when a cart stays locked by another request for longer than CART_LOCK_WAIT_SECONDS.
+# DRF answers it with a 409 in every view using the cart store
+class CartBusy(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Cart is being updated, try again"
+    default_code = "cart_busy"
+
+
+# Define a line of a cart as the stores hand it out, attribute names follow the Cart model.
+# id is the Cart row id, None for lines the cache store has not written back yet
+class CartEntry:
+    def __init__(self, user_id, item_id, quantity, created_at, id=None):
+        self.id = id
+        self.user_id = user_id
+        self.item_id = item_id
+        self.quantity = quantity
+        self.created_at = created_at
+
+
+# Fold a list of {"op", "item", "quantity"} cart operations into one change per item, applied in order.
+# Returns item_id -> (absolute, quantity): adds stay a delta unless a set or remove of the item came first
+def fold_operations(operations):
+    changes = {}
+    for operation in operations:
+        item_id = operation["item"]
+        absolute, quantity = changes.get(item_id, (False, 0))
+        if operation["op"] == "add":
+            changes[item_id] = (absolute, quantity + operation.get("quantity", 1))
+        elif operation["op"] == "set":
+            changes[item_id] = (True, operation["quantity"])
+        else:
+            changes[item_id] = (True, 0)
+    return changes
+
+
+# Define the cart store kept in the Cart table, every change is a write to the database
+class DatabaseCartStore:
+    def items(self, user_id):
+        rows = Cart.objects.filter(user_id=user_id).only("id", "user_id", "item_id", "quantity", "created_at").order_by("created_at", "item_id")
+        return [CartEntry(row.user_id, row.item_id, row.quantity, row.created_at, row.id) for row in rows]
+
+    def get(self, user_id, item_id):
+        row = Cart.objects.filter(user_id=user_id, item_id=item_id).first()
+        return CartEntry(row.user_id, row.item_id, row.quantity, row.created_at, row.id) if row else None
+
+    def add(self, user_id, item_id, quantity=1):
+        # One statement whether or not the item is in the cart, concurrent adds can't lose an increment
+        # or create a second row. Understood by PostgreSQL and SQLite alike
+        table = connection.ops.quote_name(Cart._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, item_id, quantity, created_at) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (user_id, item_id) DO UPDATE SET quantity = {table}.quantity + excluded.quantity "
+                f"RETURNING id, quantity, created_at",
+                [user_id, item_id, quantity, timezone.now()],
+            )
+            row_id, new_quantity, created_at = cursor.fetchone()
+        return CartEntry(user_id, item_id, new_quantity, created_at, row_id)
+
+    def set(self, user_id, item_id, quantity):
+        if not Cart.objects.filter(user_id=user_id, item_id=item_id).update(quantity=quantity):
+            return None
+        return self.get(user_id, item_id)
+
+    def remove(self, user_id, item_id):
+        deleted, _ = Cart.objects.filter(user_id=user_id, item_id=item_id).delete()
+        return bool(deleted)
+
+    def clear(self, user_id):
+        Cart.objects.filter(user_id=user_id).delete()
+
+    def apply(self, user_id, operations):
+        changes = fold_operations(operations)
+        now = timezone.now()
+        with transaction.atomic():
+            # Lock the cart so the batch lands whole or waits for a concurrent checkout
+            rows = {row.item_id: row for row in Cart.objects.select_for_update().filter(user_id=user_id).order_by("id")}
+
+            upserts, removed = [], []
+            for item_id, (absolute, quantity) in changes.items():
+                row = rows.get(item_id)
+                if not absolute and row is not None:
+                    quantity += row.quantity
+                if quantity > 0:
+                    upserts.append(Cart(user_id=user_id, item_id=item_id, quantity=quantity, created_at=row.created_at if row else now))
+                elif row is not None:
+                    removed.append(item_id)
+
+            Cart.objects.bulk_create(upserts, update_conflicts=True, unique_fields=["user", "item"], update_fields=["quantity"])
+            if removed:
+                Cart.objects.filter(user_id=user_id, item_id__in=removed).delete()
+
+        # Read the cart back, the upsert doesn't return the ids of the rows it inserted
+        return self.items(user_id)
+
+    def flush(self, user_id):
+        pass # Always persisted
+
+    def checkout(self, user_id, place):
+        with transaction.atomic():
+            # Lock the cart rows, a second checkout of the same cart waits here and then finds it empty
+            rows = list(Cart.objects.select_for_update().filter(user_id=user_id).only("id", "item_id", "quantity").order_by("id"))
+            if not rows:
+                raise EmptyCart()
+
+            result = place([CartEntry(user_id, row.item_id, row.quantity, None) for row in rows])
+            Cart.objects.filter(id__in=[row.id for row in rows]).delete()
+        return result
+
+
+# Define the cart store kept in a shared cache. Every line is a counter changed with atomic incr, and an index
+# per cart maps item ids to when they were added. Carts are written back to the Cart table a while after they
+# change (write-behind), when their user logs out, and are consumed from the cache at checkout. The Cart rows
+# are only read to rebuild a cart that left the cache.
+class CacheCartStore:
+    def __init__(self, alias, timeout, lock_timeout):
+        self.alias = alias
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def index_key(self, user_id):
+        return f"cart:{user_id}:index"
+
+    def quantity_key(self, user_id, item_id):
+        return f"cart:{user_id}:item:{item_id}"
+
+    @contextlib.contextmanager
+    def lock(self, user_id):
+        # add() is atomic, the lock changes hands through the cache so it holds across workers
+        key, token = f"cart:{user_id}:lock", uuid.uuid4().hex
+        deadline = time.monotonic() + getattr(settings, "CART_LOCK_WAIT_SECONDS", 10)
+        while not self.cache.add(key, token, timeout=self.lock_timeout):
+            if time.monotonic() > deadline:
+                raise CartBusy()
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def load_index(self, user_id):
+        # Callers hold the cart lock
+        index = self.cache.get(self.index_key(user_id))
+        if index is not None:
+            return index
+
+        # First use since the cart left the cache, rebuild it from its last flushed rows
+        rows = Cart.objects.filter(user_id=user_id).values_list("item_id", "quantity", "created_at")
+        index = {}
+        quantities = {}
+        for item_id, quantity, created_at in rows:
+            index[item_id] = created_at.timestamp()
+            quantities[self.quantity_key(user_id, item_id)] = quantities.get(self.quantity_key(user_id, item_id), 0) + quantity
+        self.cache.set_many(quantities, timeout=self.timeout)
+        self.cache.set(self.index_key(user_id), index, timeout=self.timeout)
+        return index
+
+    def index(self, user_id):
+        index = self.cache.get(self.index_key(user_id))
+        if index is None:
+            with self.lock(user_id):
+                index = self.load_index(user_id)
+        return index
+
+    def entries(self, user_id, index):
+        if not index:
+            return []
+        keys = {item_id: self.quantity_key(user_id, item_id) for item_id in index}
+        quantities = self.cache.get_many(list(keys.values()))
+        entries = [
+            CartEntry(user_id, item_id, quantities[keys[item_id]], self.added_at(index[item_id]))
+            for item_id in index if quantities.get(keys[item_id], 0) > 0
+        ]
+        entries.sort(key=lambda entry: (entry.created_at, entry.item_id))
+        return entries
+
+    def added_at(self, timestamp):
+        return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+    def items(self, user_id):
+        return self.entries(user_id, self.index(user_id))
+
+    def get(self, user_id, item_id):
+        index = self.index(user_id)
+        quantity = self.cache.get(self.quantity_key(user_id, item_id)) if item_id in index else None
+        return CartEntry(user_id, item_id, quantity, self.added_at(index[item_id])) if quantity else None
+
+    def add(self, user_id, item_id, quantity=1):
+        index = self.index(user_id)
+        key = self.quantity_key(user_id, item_id)
+
+        # Items already in the cart take one atomic increment and no lock
+        if item_id in index:
+            try:
+                entry = CartEntry(user_id, item_id, self.cache.incr(key, quantity), self.added_at(index[item_id]))
+                self.mark_dirty(user_id)
+                return entry
+            except ValueError:
+                pass # Removed meanwhile, added back below
+
+        with self.lock(user_id):
+            index = self.load_index(user_id)
+            try:
+                new_quantity = self.cache.incr(key, quantity) if item_id in index else None
+            except ValueError:
+                new_quantity = None
+            if new_quantity is None:
+                # A new line, overwriting whatever a line removed earlier left behind
+                self.cache.set(key, quantity, timeout=self.timeout)
+                new_quantity = quantity
+            index.setdefault(item_id, timezone.now().timestamp())
+            self.cache.set(self.index_key(user_id), index, timeout=self.timeout)
+
+        self.mark_dirty(user_id)
+        return CartEntry(user_id, item_id, new_quantity, self.added_at(index[item_id]))
+
+    def set(self, user_id, item_id, quantity):
+        index = self.index(user_id)
+        if item_id not in index:
+            return None
+        self.cache.set(self.quantity_key(user_id, item_id), quantity, timeout=self.timeout)
+        self.mark_dirty(user_id)
+        return CartEntry(user_id, item_id, quantity, self.added_at(index[item_id]))
+
+    def remove(self, user_id, item_id):
+        with self.lock(user_id):
+            index = self.load_index(user_id)
+            if index.pop(item_id, None) is None:
+                return False
+            self.cache.set(self.index_key(user_id), index, timeout=self.timeout)
+            self.cache.delete(self.quantity_key(user_id, item_id))
+        self.mark_dirty(user_id)
+        return True
+
+    def clear(self, user_id):
+        with self.lock(user_id):
+            index = self.load_index(user_id)
+            # Keep an empty index, a missing one would bring the flushed rows back
+            self.cache.set(self.index_key(user_id), {}, timeout=self.timeout)
+            self.cache.delete_many([self.quantity_key(user_id, item_id) for item_id in index])
+        self.mark_dirty(user_id)
+
+    def apply(self, user_id, operations):
+        changes = fold_operations(operations)
+        with self.lock(user_id):
+            index = self.load_index(user_id)
+
+            updates, removed = {}, []
+            for item_id, (absolute, quantity) in changes.items():
+                key = self.quantity_key(user_id, item_id)
+                # Adds to lines already in the cart stay increments, so adds that bypass the lock aren't lost
+                if not absolute and item_id in index:
+                    try:
+                        self.cache.incr(key, quantity)
+                        continue
+                    except ValueError:
+                        pass # Removed meanwhile, added back below
+                if quantity > 0:
+                    updates[key] = quantity
+                    index.setdefault(item_id, timezone.now().timestamp())
+                elif index.pop(item_id, None) is not None:
+                    removed.append(key)
+
+            self.cache.set_many(updates, timeout=self.timeout)
+            self.cache.delete_many(removed)
+            self.cache.set(self.index_key(user_id), index, timeout=self.timeout)
+            entries = self.entries(user_id, index)
+
+        self.mark_dirty(user_id)
+        return entries
+
+    def checkout(self, user_id, place):
+        # The cart lock makes a second checkout of the same cart wait and then find it empty
+        with self.lock(user_id):
+            entries = self.entries(user_id, self.load_index(user_id))
+            if not entries:
+                raise EmptyCart()
+
+            with transaction.atomic():
+                result = place(entries)
+                # The cart is consumed, and so is its flushed copy
+                Cart.objects.filter(user_id=user_id).delete()
+
+            # Take away what was ordered, increments that landed during the checkout stay in the cart
+            index = self.load_index(user_id)
+            for entry in entries:
+                key = self.quantity_key(user_id, entry.item_id)
+                try:
+                    remaining = self.cache.decr(key, entry.quantity)
+                except ValueError:
+                    remaining = 0
+                if remaining <= 0:
+                    self.cache.delete(key)
+                    index.pop(entry.item_id, None)
+            self.cache.set(self.index_key(user_id), index, timeout=self.timeout)
+        return result
+
+    def flush(self, user_id):
+        with self.lock(user_id):
+            index = self.cache.get(self.index_key(user_id))
+            if index is None:
+                return # Not in the cache, the rows are current
+            entries = self.entries(user_id, index)
+
+            # Lines of items deleted from the menu are dropped
+            menu_ids = set(Menu.objects.filter(id__in=[entry.item_id for entry in entries]).values_list("id", flat=True))
+            entries = {entry.item_id: entry for entry in entries if entry.item_id in menu_ids}
+
+            with transaction.atomic():
+                rows = dict(Cart.objects.filter(user_id=user_id).values_list("item_id", "quantity"))
+                # Only new and changed lines are written, in one upsert
+                Cart.objects.bulk_create(
+                    [
+                        Cart(user_id=user_id, item_id=item_id, quantity=entry.quantity, created_at=entry.created_at)
+                        for item_id, entry in entries.items() if rows.get(item_id) != entry.quantity
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["user", "item"],
+                    update_fields=["quantity"],
+                )
+                Cart.objects.filter(user_id=user_id, item_id__in=[item_id for item_id in rows if item_id not in entries]).delete()
+
+    def mark_dirty(self, user_id):
+        # Flush the carts that changed CART_FLUSH_DELAY_SECONDS after the first change, 0 leaves it to logout
+        delay = getattr(settings, "CART_FLUSH_DELAY_SECONDS", 30)
+        if not delay:
+            return
+        with self._dirty_lock:
+            self._dirty.add(user_id)
+            if delay and self._timer is None:
+                self._timer = threading.Timer(delay, self.flush_dirty)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush_dirty(self):
+        with self._dirty_lock:
+            users, self._dirty, self._timer = self._dirty, set(), None
+        try:
+            for user_id in users:
+                try:
+                    self.flush(user_id)
+                except Exception:
+                    logger.exception("Could not flush the cart of user %s", user_id)
+        finally:
+            connection.close()
+
+
+# Build the store CART_STORE asks for. The cache store keeps the only live copy of a cart, its lock and its
+# counters in the cache, so every worker has to see the same cache and increment it atomically
+def build_cart_store():
+    if getattr(settings, "CART_STORE", "database") != "cache":
+        return DatabaseCartStore()
+
+    alias = getattr(settings, "CART_CACHE_ALIAS", "shared")
+    check_shared_cache(alias, "The cache cart store", atomic=True)
+    return CacheCartStore(
+        alias=alias,
+        timeout=getattr(settings, "CART_CACHE_TIMEOUT_SECONDS", 1209600),
+        lock_timeout=getattr(settings, "CART_LOCK_SECONDS", 30),
+    )
+
+
+cart_store = build_cart_store()
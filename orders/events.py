@@ -0,0 +1,215 @@
+from django.conf import settings
+from django.db import connections, transaction
+
+# Import python standard modules
+import asyncio, json, logging, select, threading, time
+
+logger = logging.getLogger(__name__)
+
+
+# Define a subscription, the asyncio queue one streaming response reads its events from
+class Subscription:
+    def __init__(self, bus, channels, loop, queue_size):
+        self.bus = bus
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # Set when events were dropped because the client fell behind, the stream ends and the client resyncs
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Called from any thread, the queue is only touched on the loop that owns it
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            self.close() # The loop is gone
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+# Define an in-process publish/subscribe bus, events published in this process reach its subscribers
+class EventBus:
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self._subscribers = {} # channel -> set of subscriptions
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        # Idle subscribers cost one queue each, no thread and no database connection
+        subscription = Subscription(self, channels, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, messages):
+        # messages is a list of (channels, event) pairs
+        for channels, event in messages:
+            self.dispatch(channels, event)
+
+    def dispatch(self, channels, event):
+        with self._lock:
+            subscriptions = set()
+            for channel in channels:
+                subscriptions.update(self._subscribers.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def dispatch_all(self, event):
+        with self._lock:
+            subscriptions = set().union(*self._subscribers.values())
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._subscribers.values()))
+
+
+# Define a bus fanned out through PostgreSQL LISTEN/NOTIFY, so an event published by any worker reaches the
+# subscribers of every worker. Each process holds one listening connection whatever its number of subscribers
+class PostgresEventBus(EventBus):
+    channel = "order_events"
+
+    def __init__(self, queue_size, alias):
+        super().__init__(queue_size)
+        self.alias = alias
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self.start_listener()
+        return super().subscribe(channels)
+
+    def publish(self, messages):
+        if not messages:
+            return
+        # One statement for all the messages, NOTIFY inside a transaction is only delivered on commit
+        payloads = [json.dumps({"c": channels, "e": event}, separators=(",", ":")) for channels, event in messages]
+        notify = ", ".join(["pg_notify(%s, %s)"] * len(payloads))
+        params = []
+        for payload in payloads:
+            params += [self.channel, payload]
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(f"SELECT {notify}", params)
+
+    def start_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self.listen, name="order-events-listener", daemon=True)
+                self._listener.start()
+
+    def listen(self):
+        backoff = 1
+        while True:
+            started = time.monotonic()
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception("Order event listener lost its connection")
+
+            # Back off while the database is unreachable, a connection that held up starts over
+            if time.monotonic() - started > 60:
+                backoff = 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def listen_once(self):
+        # A dedicated connection outside Django's connection handling, it lives as long as the process
+        database = connections[self.alias]
+        pg_connection = database.Database.connect(**database.get_connection_params())
+        try:
+            pg_connection.autocommit = True
+            with pg_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+
+            # Events sent while we were not listening are lost, tell every subscriber to refetch
+            self.dispatch_all({"type": "resync"})
+
+            while True:
+                if select.select([pg_connection], [], [], 30) == ([], [], []):
+                    continue
+                pg_connection.poll()
+                while pg_connection.notifies:
+                    notify = pg_connection.notifies.pop(0)
+                    try:
+                        message = json.loads(notify.payload)
+                        self.dispatch(message["c"], message["e"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Ignoring malformed order event %r", notify.payload)
+        finally:
+            pg_connection.close()
+
+
+_event_bus = None
+_event_bus_lock = threading.Lock()
+
+
+# Return the process wide event bus, "auto" picks LISTEN/NOTIFY when the database is PostgreSQL
+def get_event_bus():
+    global _event_bus
+    with _event_bus_lock:
+        if _event_bus is None:
+            alias = getattr(settings, "ORDER_EVENTS_DATABASE_ALIAS", "default")
+            backend = getattr(settings, "ORDER_EVENTS_BACKEND", "auto")
+            if backend == "auto":
+                backend = "postgres" if connections[alias].vendor == "postgresql" else "memory"
+
+            queue_size = getattr(settings, "ORDER_EVENTS_QUEUE_SIZE", 100)
+            _event_bus = PostgresEventBus(queue_size, alias) if backend == "postgres" else EventBus(queue_size)
+        return _event_bus
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def vendor_channel(vendor_id):
+    return f"vendor:{vendor_id}"
+
+
+# Describe an order for its subscribers, small enough to render without fetching the order
+def order_event(event_type, order):
+    return {
+        "type": event_type,
+        "order": order.id,
+        "vendor": order.vendor_id,
+        "status": order.status_id,
+        "delivered": order.delivered,
+        "item_count": order.item_count,
+        "total": str(order.total),
+        "updated_at": order.updated_at.isoformat() if order.updated_at else None,
+    }
+
+
+# Push events about orders to their vendor and user once the current transaction commits
+def publish_order_events(event_type, orders):
+    messages = []
+    for order in orders:
+        channels = [vendor_channel(order.vendor_id)]
+        if order.user_id:
+            channels.append(user_channel(order.user_id))
+        messages.append((channels, order_event(event_type, order)))
+
+    if messages:
+        # A failed push is logged, the order itself is already committed
+        transaction.on_commit(lambda: get_event_bus().publish(messages), robust=True)
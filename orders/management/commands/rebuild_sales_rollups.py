@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Import python standard modules
+import time
+
+# Import project modules
+from orders.models import Order, VendorDailySales
+from vendors.models import Vendor
+
+
+# Define command that rebuilds the vendor sales rollups from the orders, a few vendors per transaction
+class Command(BaseCommand):
+    help = "Rebuild the per vendor, per day sales rollups from the orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=100, help="Number of vendors rebuilt per transaction")
+        parser.add_argument("--vendor", type=int, action="append", help="Only rebuild this vendor, may be repeated")
+
+    def handle(self, *args, **options):
+        vendors = Vendor.objects.order_by("id").values_list("id", flat=True)
+        if options["vendor"]:
+            vendors = vendors.filter(id__in=options["vendor"])
+
+        started = time.monotonic()
+        rebuilt, rows = 0, 0
+        last_id = 0
+        while True:
+            # Walk the vendors by id so every chunk is an index range, not an OFFSET
+            chunk = list(vendors.filter(id__gt=last_id)[:options["chunk_size"]])
+            if not chunk:
+                break
+            rows += self.rebuild_chunk(chunk)
+            rebuilt += len(chunk)
+            last_id = chunk[-1]
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Rebuilt sales rollups of {rebuilt} vendors, {rows} rows in {elapsed:.2f} s")
+
+    def rebuild_chunk(self, vendor_ids):
+        with transaction.atomic():
+            # Lock the orders of the chunk so placements and status changes wait for the rebuild
+            # instead of adding to rows that are about to be replaced
+            list(Order.objects.select_for_update().filter(vendor_id__in=vendor_ids).values_list("id", flat=True))
+
+            totals = (
+                Order.objects.filter(vendor_id__in=vendor_ids)
+                .annotate(day=TruncDate("order_date", tzinfo=timezone.get_current_timezone()))
+                .values("vendor_id", "day", "status_id")
+                .annotate(order_count=Count("id"), item_count=Sum("item_count"), revenue=Sum("total"))
+                .order_by()
+            )
+
+            VendorDailySales.objects.filter(vendor_id__in=vendor_ids).delete()
+            sales = VendorDailySales.objects.bulk_create(
+                [VendorDailySales(**row) for row in totals.iterator(chunk_size=2000)],
+                batch_size=1000,
+            )
+        return len(sales)
@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# Import python standard modules
+import queue, random, threading, time, uuid
+
+# Import project modules
+from orders.models import Order, OrderItem, Cart, Status
+from orders.utils import checkout, EmptyCart
+from users.models import User
+from vendors.models import Vendor, Category, Menu
+
+
+# Define command that checks out many carts from several threads at once, each cart several times,
+# then verifies that no cart was ordered twice and reports the checkout throughput
+class Command(BaseCommand):
+    help = "Stress test concurrent checkouts for duplicate orders and throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50, help="Number of carts checked out")
+        parser.add_argument("--items", type=int, default=5, help="Items in every cart")
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent checkout threads")
+        parser.add_argument("--attempts", type=int, default=3, help="Concurrent checkouts of every cart")
+
+    def handle(self, *args, **options):
+        # Threads use their own connections, so the fixtures have to be committed and are removed afterwards
+        run = uuid.uuid4().hex[:8]
+        # New orders start out pending, the status is seeded by a migration but test databases may be flushed
+        created_status = not Status.objects.filter(name="pending").exists()
+        if created_status:
+            Status.objects.create(name="pending")
+
+        vendor = Vendor.objects.create(
+            name=f"Stress {run}", description="", email=f"stress-{run}@example.com",
+            contact_info=f"+23480{random.randint(10000000, 99999999)}",
+        )
+        users = []
+        try:
+            category = Category.objects.create(name=f"Stress {run}", description="")
+            items = Menu.objects.bulk_create([
+                Menu(vendor=vendor, category=category, name=f"Item {i}", description="", price=1000 + i)
+                for i in range(options["items"])
+            ])
+            phone_base = random.randint(10000000, 90000000)
+            for i in range(options["users"]):
+                users.append(User.objects.create_user(f"stress-{run}-{i}@example.com", phone_number=f"+23481{phone_base + i}"))
+            Cart.objects.bulk_create([Cart(user=user, item=item, quantity=2) for user in users for item in items])
+
+            self.run_checkouts(users, options)
+            self.verify(users, options)
+        finally:
+            Order.objects.filter(user__in=users).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+            vendor.delete()
+            Category.objects.filter(name=f"Stress {run}").delete()
+            if created_status:
+                Status.objects.filter(name="pending").delete()
+
+    def run_checkouts(self, users, options):
+        tasks = queue.Queue()
+        attempts = [user for user in users for _ in range(options["attempts"])]
+        random.shuffle(attempts)
+        for user in attempts:
+            tasks.put(user)
+
+        self.succeeded, self.empty, self.failed = 0, 0, []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        user = tasks.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        checkout(user)
+                        outcome = "succeeded"
+                    except EmptyCart:
+                        outcome = "empty"
+                    except Exception as e:
+                        outcome = e
+                    with lock:
+                        if outcome == "succeeded":
+                            self.succeeded += 1
+                        elif outcome == "empty":
+                            self.empty += 1
+                        else:
+                            self.failed.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+
+    def verify(self, users, options):
+        # Every cart holds one vendor's items, so a clean run has one order per user
+        orders = Order.objects.filter(user__in=users).count()
+        lines = OrderItem.objects.filter(order__user__in=users).count()
+        duplicates = orders - len(users) + lines - len(users) * options["items"]
+        left_in_cart = Cart.objects.filter(user__in=users).count()
+
+        self.stdout.write(
+            f"{self.succeeded} checkouts in {self.elapsed:.2f} s ({self.succeeded / self.elapsed:.0f} checkouts/s, "
+            f"{len(users) * options['attempts'] / self.elapsed:.0f} attempts/s), {self.empty} duplicate attempts found an empty cart"
+        )
+        self.stdout.write(f"Orders: {orders}, lines: {lines}, duplicate orders: {duplicates}, items left in carts: {left_in_cart}, errors: {len(self.failed)}")
+        for error in self.failed[:5]:
+            self.stderr.write(repr(error))
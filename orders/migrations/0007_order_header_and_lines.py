@@ -0,0 +1,110 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import itertools
+
+
+# Group the legacy one-row-per-item orders into headers, one per (user, order_date, vendor)
+def group_lines(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+
+    lines = (
+        OrderItem.objects.filter(order__isnull=True)
+        .values("id", "user_id", "order_date", "item__vendor_id", "status_id", "quantity", "price", "delivered", "paid_for")
+        .order_by("user_id", "order_date", "item__vendor_id", "id")
+    )
+    group_key = lambda line: (line["user_id"], line["order_date"], line["item__vendor_id"])
+    for (user_id, order_date, vendor_id), group in itertools.groupby(lines.iterator(chunk_size=2000), key=group_key):
+        group = list(group)
+        order = Order.objects.create(
+            user_id=user_id,
+            vendor_id=vendor_id,
+            status_id=group[0]["status_id"],
+            item_count=sum(line["quantity"] for line in group),
+            total=sum(line["price"] * line["quantity"] for line in group),
+            order_date=order_date,
+            delivered=all(line["delivered"] for line in group),
+            paid_for=all(line["paid_for"] for line in group),
+        )
+        OrderItem.objects.filter(id__in=[line["id"] for line in group]).update(order=order)
+
+
+# Copy the header fields back onto every line
+def ungroup_lines(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+
+    for order in Order.objects.iterator(chunk_size=2000):
+        OrderItem.objects.filter(order=order).update(
+            user_id=order.user_id,
+            status_id=order.status_id,
+            order_date=order.order_date,
+            delivered=order.delivered,
+            paid_for=order.paid_for,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_date_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_user_date_id_idx',
+        ),
+        migrations.RenameModel(
+            old_name='Order',
+            new_name='OrderItem',
+        ),
+        # Drop the indexes the lines kept from the old table, their names would clash with the header's
+        migrations.AlterField(
+            model_name='orderitem',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='status',
+            field=models.ForeignKey(db_index=False, default=1, on_delete=django.db.models.deletion.CASCADE, to='orders.status'),
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('order_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('delivered', models.BooleanField(default=False)),
+                ('paid_for', models.BooleanField(default=False)),
+                ('status', models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, to='orders.status')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendors.vendor')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+                    models.Index(fields=['user', 'order_date', 'id'], name='order_user_date_id_idx'),
+                    models.Index(fields=['vendor', 'order_date', 'id'], name='order_vendor_date_id_idx'),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order'),
+        ),
+        migrations.RunPython(group_lines, ungroup_lines),
+    ]
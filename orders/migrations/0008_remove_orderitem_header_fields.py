@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Kept apart from the grouping so the table is altered in a transaction without pending foreign key checks
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_header_and_lines'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='user',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='order_date',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='delivered',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='paid_for',
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order'),
+        ),
+    ]
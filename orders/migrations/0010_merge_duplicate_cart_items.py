@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:05
+
+from django.db import migrations
+from django.db.models import Count
+
+
+# Fold duplicate (user, item) rows into the oldest one, adding up their quantities
+def merge_duplicates(apps, schema_editor):
+    Cart = apps.get_model("orders", "Cart")
+
+    duplicates = (
+        Cart.objects.values("user_id", "item_id")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates.iterator():
+        rows = list(Cart.objects.filter(user_id=duplicate["user_id"], item_id=duplicate["item_id"]).order_by("created_at", "id"))
+        kept = rows[0]
+        kept.quantity = sum(row.quantity for row in rows)
+        kept.save(update_fields=["quantity"])
+        Cart.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_vendor_daily_sales'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
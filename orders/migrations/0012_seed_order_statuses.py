@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:34
+
+from django.db import migrations
+
+
+# The statuses orders.utils.STATUS_TRANSITIONS moves orders through, a new order starts out pending
+CANONICAL_STATUSES = ["pending", "accepted", "preparing", "ready", "delivered", "cancelled"]
+
+# Statuses databases may already use for the same thing, matched case-insensitively. Orders on them move to
+# the canonical status. A status in use that is neither canonical nor listed here stops the migration, add it
+LEGACY_STATUSES = {
+    "new": "pending",
+    "placed": "pending",
+    "confirmed": "accepted",
+    "processing": "preparing",
+    "in progress": "preparing",
+    "ready for pickup": "ready",
+    "out for delivery": "ready",
+    "done": "delivered",
+    "complete": "delivered",
+    "completed": "delivered",
+    "canceled": "cancelled",
+    "rejected": "cancelled",
+}
+
+
+def canonical_name(name):
+    name = " ".join(name.lower().replace("_", " ").split())
+    return name if name in CANONICAL_STATUSES else LEGACY_STATUSES.get(name)
+
+
+# Move the orders and sales rollups of a status to another one, rollup rows of the same vendor and day are summed
+def merge_status(apps, source, target):
+    Order = apps.get_model("orders", "Order")
+    VendorDailySales = apps.get_model("orders", "VendorDailySales")
+
+    Order.objects.filter(status=source).update(status=target)
+    for sales in VendorDailySales.objects.filter(status=source):
+        existing = VendorDailySales.objects.filter(vendor_id=sales.vendor_id, day=sales.day, status=target).first()
+        if existing is None:
+            sales.status = target
+            sales.save(update_fields=["status"])
+        else:
+            existing.order_count += sales.order_count
+            existing.item_count += sales.item_count
+            existing.revenue += sales.revenue
+            existing.save(update_fields=["order_count", "item_count", "revenue"])
+            sales.delete()
+    source.delete()
+
+
+# Bring the statuses to the canonical set: existing rows are matched case-insensitively and renamed in place,
+# so orders keep their status ids, duplicates and known legacy statuses are merged into them, missing ones added
+def seed_statuses(apps, schema_editor):
+    Status = apps.get_model("orders", "Status")
+    Order = apps.get_model("orders", "Order")
+
+    groups = {name: [] for name in CANONICAL_STATUSES}
+    unmapped = []
+    for status in Status.objects.order_by("id"):
+        name = canonical_name(status.name)
+        if name is not None:
+            groups[name].append(status)
+        elif Order.objects.filter(status=status).exists():
+            unmapped.append(status.name)
+    if unmapped:
+        raise RuntimeError(
+            f"Orders use statuses with no canonical equivalent: {', '.join(sorted(unmapped))}. "
+            f"Map them in LEGACY_STATUSES of {__name__}"
+        )
+
+    for name, statuses in groups.items():
+        if not statuses:
+            Status.objects.create(name=name)
+            continue
+
+        # Keep the row already named like the canonical status, else the oldest one
+        kept = next((status for status in statuses if status.name == name), statuses[0])
+        for status in statuses:
+            if status is not kept:
+                merge_status(apps, status, kept)
+        if kept.name != name:
+            kept.name = name
+            kept.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_cart_user_item_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_statuses, migrations.RunPython.noop),
+    ]
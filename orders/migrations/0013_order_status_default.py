@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import orders.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_seed_order_statuses'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.ForeignKey(default=orders.models.default_status, on_delete=django.db.models.deletion.CASCADE, to='orders.status'),
+        ),
+    ]
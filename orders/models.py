@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Sum
 from vendors.models import *
 from users.models import *
 from django.utils import timezone
+from users.registry import ModelRegistry
 
 
 
@@ -10,18 +13,77 @@ class Status(models.Model):
     name = models.CharField(max_length=50, unique=True)
 
 
+# Statuses change maybe monthly, every process keeps them in memory. The canonical ones are seeded by a migration
+status_registry = ModelRegistry(
+    "orders.Status",
+    refresh_interval=getattr(settings, "LOOKUP_REGISTRY_REFRESH_SECONDS", 300),
+    miss_reload_interval=getattr(settings, "LOOKUP_REGISTRY_MISS_RELOAD_SECONDS", 5),
+)
 
-# Define OrderItem model
+
+# New orders start out pending, looked up by name so the default doesn't hang on which row got id 1
+def default_status():
+    return status_registry.named("pending").id
+
+
+
+# Define Order model, one row per checkout and vendor carrying the status and the totals of its lines
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    item = models.ForeignKey(Menu, on_delete=models.CASCADE)
-    status = models.ForeignKey(Status, on_delete=models.CASCADE, default=1)
-    quantity = models.IntegerField()
-    price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    status = models.ForeignKey(Status, on_delete=models.CASCADE, default=default_status)
+    # Denormalized when the order is placed so listings never aggregate the lines
+    item_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     order_date = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     delivered = models.BooleanField(default=False)
     paid_for = models.BooleanField(default=False)
 
+    class Meta:
+        # Back the keyset paginated listings ordered by (order_date, id)
+        indexes = [
+            models.Index(fields=["order_date", "id"], name="order_date_id_idx"),
+            models.Index(fields=["user", "order_date", "id"], name="order_user_date_id_idx"),
+            models.Index(fields=["vendor", "order_date", "id"], name="order_vendor_date_id_idx"),
+        ]
+
+    def refresh_totals(self):
+        # Recompute the denormalized totals after the lines change
+        totals = self.items.aggregate(
+            item_count=Sum("quantity"),
+            total=Sum(F("price") * F("quantity"), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        )
+        self.item_count = totals["item_count"] or 0
+        self.total = totals["total"] or 0
+
+
+
+# Define OrderItem model, a line of an order with the price snapshotted at checkout
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    item = models.ForeignKey(Menu, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+
+
+
+# Define VendorDailySales model, per vendor, day and status totals kept up to date as orders are placed and
+# change status, dashboards read these rows instead of the orders
+class VendorDailySales(models.Model):
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    day = models.DateField()
+    status = models.ForeignKey(Status, on_delete=models.CASCADE)
+    order_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        # Target of the incremental upserts, also backs the dashboard range scan on (vendor, day)
+        constraints = [
+            models.UniqueConstraint(fields=["vendor", "day", "status"], name="vendor_daily_sales_unique"),
+        ]
+
 
 
 # Define CartItem model
@@ -30,6 +92,16 @@ class Cart(models.Model):
     item = models.ForeignKey(Menu, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # Back the keyset paginated cart listing ordered by (created_at, id)
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="cart_user_created_id_idx"),
+        ]
+        # One row per item in a cart, also the conflict target of the add to cart upsert
+        constraints = [
+            models.UniqueConstraint(fields=["user", "item"], name="cart_user_item_unique"),
+        ]
     
 
 
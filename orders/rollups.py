@@ -0,0 +1,76 @@
+from django.db import connection
+from django.utils import timezone
+
+# Import python standard modules
+from decimal import Decimal
+
+# Import project modules
+from .models import VendorDailySales
+
+
+# The rollup row an order counts towards, days are local dates so they match the dashboard's calendar
+def sales_key(order, status_id=None):
+    return (order.vendor_id, timezone.localdate(order.order_date), status_id or order.status_id)
+
+
+# Add deltas to the rollup rows in one statement, rows that don't exist yet are created
+def apply_sales_deltas(deltas):
+    # deltas maps (vendor_id, day, status_id) to [order_count, item_count, revenue]
+    rows = [
+        (key, delta) for key, delta in sorted(deltas.items())
+        if any(delta)
+    ]
+    if not rows:
+        return
+
+    # INSERT ... ON CONFLICT DO UPDATE is understood by PostgreSQL and SQLite alike, sorted keys take
+    # the row locks in the same order in every transaction so concurrent checkouts can't deadlock
+    table = connection.ops.quote_name(VendorDailySales._meta.db_table)
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    params = []
+    for (vendor_id, day, status_id), (order_count, item_count, revenue) in rows:
+        params += [vendor_id, day, status_id, order_count, item_count, revenue]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (vendor_id, day, status_id, order_count, item_count, revenue) VALUES {values} "
+            f"ON CONFLICT (vendor_id, day, status_id) DO UPDATE SET "
+            f"order_count = {table}.order_count + excluded.order_count, "
+            f"item_count = {table}.item_count + excluded.item_count, "
+            f"revenue = {table}.revenue + excluded.revenue",
+            params,
+        )
+
+
+# Count newly placed orders
+def record_new_orders(orders):
+    deltas = {}
+    for order in orders:
+        delta = deltas.setdefault(sales_key(order), [0, 0, Decimal(0)])
+        delta[0] += 1
+        delta[1] += order.item_count
+        delta[2] += Decimal(order.total)
+    apply_sales_deltas(deltas)
+
+
+# Move the counts of orders from their old status to their current one, changes is a list of (order, old_status_id)
+def record_status_changes(changes):
+    deltas = {}
+    for order, old_status_id in changes:
+        if old_status_id == order.status_id:
+            continue
+        for key, sign in ((sales_key(order, old_status_id), -1), (sales_key(order), 1)):
+            delta = deltas.setdefault(key, [0, 0, Decimal(0)])
+            delta[0] += sign
+            delta[1] += sign * order.item_count
+            delta[2] += sign * Decimal(order.total)
+    apply_sales_deltas(deltas)
+
+
+def record_status_change(order, old_status_id):
+    record_status_changes([(order, old_status_id)])
+
+
+# Adjust for lines of an order changing after it was placed
+def record_total_change(order, item_delta, revenue_delta):
+    apply_sales_deltas({sales_key(order): [0, item_delta, Decimal(revenue_delta)]})
@@ -1,16 +1,34 @@
 from rest_framework import serializers
+from django.utils import timezone
 from .models import *
 from vendors.serializers import MenuSerializer
 from users.serializers import UserSerializer
 
+# Import python standard modules
+import datetime
+
 
 
 # Define serializer for OrderItem
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ["id", "item", "quantity", "price"]
+
+
+# Define serializer for Order, the header alone for listings
 class OrderSerializer(serializers.ModelSerializer):
-    item = MenuSerializer
     class Meta:
         model = Order
-        fields = '__all__'
+        fields = ["id", "user", "vendor", "status", "item_count", "total", "order_date", "updated_at", "delivered", "paid_for"]
+
+
+# Define serializer for Order with its lines
+class OrderDetailSerializer(OrderSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        fields = OrderSerializer.Meta.fields + ["items"]
 
 
 # Define serializer for Status
@@ -20,14 +38,62 @@ class StatusSerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
-# Define serializer for CartItem
-class CartSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Cart
-        fields = '__all__'
+# Define serializer for CartItem, reads cart store entries as well as Cart rows
+class CartSerializer(serializers.Serializer):
+    # The Cart row id, null for lines the cache cart store has not written back yet
+    id = serializers.IntegerField(allow_null=True)
+    user = serializers.IntegerField(source="user_id")
+    item = serializers.IntegerField(source="item_id")
+    quantity = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+
+
+# Define serializer for a new cart item quantity
+class CartQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1, max_value=1000)
+
+
+# Define serializer for one operation of a cart batch, add increments (by 1 by default), set replaces, remove drops the line
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=["add", "set", "remove"])
+    item = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+
+    def validate(self, data):
+        if data["op"] == "set" and "quantity" not in data:
+            raise serializers.ValidationError("set needs a quantity")
+        return data
+
+
+# Define serializer for a batch of cart operations, applied in order
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(child=CartOperationSerializer(), min_length=1, max_length=100)
+
+
+# Define serializer for the date range of the vendor sales dashboard, the last 30 days by default
+class SalesRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
 
+    def validate(self, data):
+        data.setdefault("end", timezone.localdate())
+        data.setdefault("start", data["end"] - datetime.timedelta(days=29))
+        if data["start"] > data["end"]:
+            raise serializers.ValidationError("start must not be after end")
+        return data
 
 
+# Define serializer for order status updates, a target status and/or delivered flag
+class OrderStatusSerializer(serializers.Serializer):
+    status = serializers.IntegerField(required=False)
+    delivered = serializers.BooleanField(required=False)
 
 
+# Define serializer for bulk order status updates, a list of order ids with a target status and/or delivered flag
+class BulkOrderStatusSerializer(OrderStatusSerializer):
+    orders = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=200)
 
+    def validate(self, data):
+        if "status" not in data and "delivered" not in data:
+            raise serializers.ValidationError("Provide a status, a delivered flag or both")
+        return data
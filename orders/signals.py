@@ -0,0 +1,27 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+# Import project modules
+from .cart import cart_store
+from .models import Status, status_registry
+from users.models import User
+
+
+# Write the cart back to the Cart table at the end of the session. Vendors log out through the same signal
+# and share id ranges with users, only users have carts
+@receiver(user_logged_out, sender=User)
+def flush_cart(sender, user, **kwargs):
+    if user is not None:
+        cart_store.flush(user.id)
+
+
+# Drop this process' copy of the statuses when they change, again at commit so a copy reloaded
+# inside the transaction doesn't outlive it. Migrations and test flushes may change them too
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+@receiver(post_migrate)
+def invalidate_status_registry(sender, **kwargs):
+    status_registry.invalidate()
+    transaction.on_commit(status_registry.invalidate)
@@ -1,3 +1,606 @@
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
 
 # Create your tests here.
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+
+# Import python standard modules
+import asyncio
+import datetime
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+# Import project modules
+from users.authentication import principal_cache
+from users.models import User
+from users.revocation import revocation_list
+from users.idempotency import idempotent
+from users.testing import query_budget, cache_queries_only
+from users.utils import create_access_token
+from django.utils import timezone
+from vendors.models import Vendor, Category, Menu
+from .models import Status, Order, OrderItem, Cart, VendorDailySales, status_registry
+from .utils import checkout, EmptyCart
+from .cart import cart_store, CacheCartStore, DatabaseCartStore
+from .events import EventBus, get_event_bus, vendor_channel
+
+
+# Base test case with a user, their API client and a menu of ten items.
+# Carts are only written back to the database when a test asks for it
+@override_settings(CART_FLUSH_DELAY_SECONDS=0)
+class OrderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        revocation_list.reset()
+        revocation_list.rebuild()
+
+        self.user = User.objects.create_user("user@example.com", phone_number="+2348012345678", first_name="Ada", last_name="Obi")
+        self.client = APIClient()
+        self.client.cookies["jwt"] = create_access_token(self.user)
+
+        self.vendor = vendor = Vendor.objects.create(name="Mama Put", description="", email="mama@example.com", contact_info="+2348098765432")
+        category = Category.objects.create(name="Soups", description="")
+        self.menu = [
+            Menu.objects.create(vendor=vendor, category=category, name=f"Dish {i}", description="", price=1000 + i)
+            for i in range(10)
+        ]
+
+
+class CheckoutTests(OrderTestCase):
+    def checkout(self, count):
+        for item in self.menu[:count]:
+            cart_store.add(self.user.id, item.id, 2)
+
+        # Principal lookup, locked cart, prices, order and line inserts, sales rollup upsert, cart delete
+        # and the lines for the response whatever the cart size, plus the savepoint of the checkout inside the test transaction
+        with query_budget(10):
+            response = self.client.post("/api/order/make_order/")
+        self.assertEqual(response.status_code, 201)
+
+    def test_checkout_query_count_does_not_grow_with_cart_size(self):
+        self.checkout(1)
+        principal_cache.clear()
+        self.checkout(10)
+
+        self.assertEqual(cart_store.items(self.user.id), [])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 11)
+        self.assertEqual(
+            sorted(OrderItem.objects.values_list("price", flat=True))[-1], self.menu[-1].price
+        )
+
+    def test_second_checkout_finds_the_cart_empty(self):
+        cart_store.add(self.user.id, self.menu[0].id, 1)
+        checkout(self.user)
+
+        with self.assertRaises(EmptyCart):
+            checkout(self.user)
+        self.assertEqual(self.client.post("/api/order/make_order/").status_code, 400)
+
+    def test_orders_snapshot_the_price_at_checkout(self):
+        cart_store.add(self.user.id, self.menu[0].id, 3)
+        order = checkout(self.user)[0]
+
+        Menu.objects.filter(id=self.menu[0].id).update(price=9999)
+        line = order.items.get()
+        order.refresh_from_db()
+        self.assertEqual((line.price, line.quantity), (self.menu[0].price, 3))
+        self.assertEqual((order.total, order.item_count), (self.menu[0].price * 3, 3))
+
+    def test_checkout_places_one_order_per_vendor_with_totals(self):
+        other_vendor = Vendor.objects.create(name="Buka", description="", email="buka@example.com", contact_info="+2348011112222")
+        other_item = Menu.objects.create(vendor=other_vendor, category=self.menu[0].category, name="Suya", description="", price=500)
+        cart_store.add(self.user.id, self.menu[0].id, 2)
+        cart_store.add(self.user.id, self.menu[1].id, 1)
+        cart_store.add(self.user.id, other_item.id, 4)
+
+        orders = {order.vendor_id: order for order in checkout(self.user)}
+        self.assertEqual(
+            (orders[self.vendor.id].item_count, orders[self.vendor.id].total),
+            (3, self.menu[0].price * 2 + self.menu[1].price),
+        )
+        self.assertEqual((orders[other_vendor.id].item_count, orders[other_vendor.id].total), (4, 2000))
+
+        # The listing reads the stored totals, the details carry the lines
+        response = self.client.get("/api/order/orders/")
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertNotIn("items", response.data["results"][0])
+        response = self.client.get(f"/api/order/order_details/{orders[self.vendor.id].id}/")
+        self.assertEqual(len(response.data["items"]), 2)
+
+    def test_updating_a_line_refreshes_the_totals(self):
+        cart_store.add(self.user.id, self.menu[0].id, 1)
+        cart_store.add(self.user.id, self.menu[1].id, 1)
+        order = checkout(self.user)[0]
+        line = order.items.get(item=self.menu[0])
+
+        response = self.client.put(f"/api/order/update_order/{order.id}/", {"item": line.id, "quantity": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["item_count"], response.data["total"]), (4, str(self.menu[0].price * 3 + self.menu[1].price) + ".00"))
+
+    def test_only_pending_orders_can_be_changed(self):
+        cart_store.add(self.user.id, self.menu[0].id, 1)
+        order = checkout(self.user)[0]
+        line = order.items.get()
+        Order.objects.filter(id=order.id).update(status=status_registry.named("delivered"))
+
+        response = self.client.put(f"/api/order/update_order/{order.id}/", {"item": line.id, "quantity": 3}, format="json")
+
+        self.assertEqual(response.status_code, 409)
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 1)
+        self.assertEqual(VendorDailySales.objects.get().item_count, 1)
+
+
+class CartStoreTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        # Run the views on the cache store, a single test process may use the per-process cache
+        self.store = CacheCartStore(alias="default", timeout=60, lock_timeout=5)
+        for module in ("orders.views", "orders.utils", "orders.signals"):
+            patcher = patch(f"{module}.cart_store", self.store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cart_views_never_write_to_the_cart_table(self):
+        # Principal, the menu item check and loading the flushed cart on first use, then only the item check
+        with self.assertNumQueries(3):
+            response = self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/")
+        self.assertEqual((response.status_code, response.data["quantity"]), (201, 1))
+        with self.assertNumQueries(1):
+            self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/")
+        self.client.post(f"/api/order/add_to_cart/{self.menu[1].id}/")
+
+        response = self.client.put(f"/api/order/update_cart_item/{self.menu[1].id}/", {"quantity": 5}, format="json")
+        self.assertEqual(response.data["quantity"], 5)
+        self.assertEqual(self.client.put(f"/api/order/update_cart_item/{self.menu[2].id}/", {"quantity": 5}, format="json").status_code, 404)
+        self.assertEqual(self.client.put(f"/api/order/update_cart_item/{self.menu[1].id}/", {"quantity": 0}, format="json").status_code, 400)
+
+        response = self.client.get("/api/order/list_cart_items/")
+        self.assertEqual([(row["item"], row["quantity"]) for row in response.data["results"]], [(self.menu[0].id, 2), (self.menu[1].id, 5)])
+        self.assertFalse(Cart.objects.exists())
+
+        self.client.delete(f"/api/order/delete_cart_item/{self.menu[0].id}/")
+        self.assertEqual(self.client.delete(f"/api/order/delete_cart_item/{self.menu[0].id}/").status_code, 404)
+        self.assertEqual([entry.item_id for entry in self.store.items(self.user.id)], [self.menu[1].id])
+
+    def test_flush_writes_back_and_a_lost_cart_is_rebuilt(self):
+        self.store.add(self.user.id, self.menu[0].id, 2)
+        self.store.add(self.user.id, self.menu[1].id)
+        self.store.flush(self.user.id)
+        self.assertEqual(sorted(Cart.objects.values_list("item_id", "quantity")), [(self.menu[0].id, 2), (self.menu[1].id, 1)])
+
+        # Only the changes are written on the next flush
+        self.store.remove(self.user.id, self.menu[1].id)
+        self.store.add(self.user.id, self.menu[0].id)
+        self.store.flush(self.user.id)
+        self.assertEqual(list(Cart.objects.values_list("item_id", "quantity")), [(self.menu[0].id, 3)])
+
+        # The cache is lost, the cart comes back from the flushed rows
+        cache.clear()
+        self.assertEqual([(entry.item_id, entry.quantity) for entry in self.store.items(self.user.id)], [(self.menu[0].id, 3)])
+
+    def test_logout_flushes_the_cart(self):
+        self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/")
+        self.client.post("/api/user/logout/")
+        self.assertEqual(list(Cart.objects.values_list("item_id", "quantity")), [(self.menu[0].id, 1)])
+
+    def test_vendor_logout_leaves_the_cart_of_the_user_with_the_same_id(self):
+        self.assertEqual(self.vendor.id, self.user.id)
+        self.store.add(self.user.id, self.menu[0].id, 2)
+        self.store.flush(self.user.id)
+        self.store.add(self.user.id, self.menu[0].id)
+
+        vendor_client = APIClient()
+        vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+        self.assertEqual(vendor_client.post("/api/vendor/logout_vendor/").status_code, 200)
+        self.assertEqual(list(Cart.objects.values_list("item_id", "quantity")), [(self.menu[0].id, 2)])
+        self.assertEqual(self.store.get(self.user.id, self.menu[0].id).quantity, 3)
+
+    def test_cart_listing_is_paginated_on_both_stores(self):
+        for store in (self.store, DatabaseCartStore()):
+            with self.subTest(store=type(store).__name__), patch("orders.views.cart_store", store):
+                store.clear(self.user.id)
+                for item in self.menu[:3]:
+                    store.add(self.user.id, item.id)
+
+                pages, url = [], "/api/order/list_cart_items/?page_size=2"
+                while url:
+                    response = self.client.get(url)
+                    pages.append([row["item"] for row in response.data["results"]])
+                    url = response.data["next"]
+                self.assertEqual(pages, [[self.menu[0].id, self.menu[1].id], [self.menu[2].id]])
+
+                previous = self.client.get(response.data["previous"]).data
+                self.assertEqual([row["item"] for row in previous["results"]], [self.menu[0].id, self.menu[1].id])
+
+        # Lines of the database store carry their row id
+        self.assertEqual(response.data["results"][0]["id"], Cart.objects.get(item=self.menu[2]).id)
+
+    def test_checkout_keeps_items_added_meanwhile(self):
+        store = CacheCartStore(alias="default", timeout=60, lock_timeout=5)
+        store.add(self.user.id, self.menu[0].id, 2)
+
+        def place(entries):
+            # Another request adds one more while the order is being placed
+            store.add(self.user.id, self.menu[0].id)
+            return entries
+
+        self.assertEqual([entry.quantity for entry in store.checkout(self.user.id, place)], [2])
+        self.assertEqual(store.get(self.user.id, self.menu[0].id).quantity, 1)
+
+    def test_database_store(self):
+        store = DatabaseCartStore()
+        store.add(self.user.id, self.menu[0].id)
+        # Adding an item already in the cart is a single upsert
+        with self.assertNumQueries(1):
+            self.assertEqual(store.add(self.user.id, self.menu[0].id, 2).quantity, 3)
+        self.assertEqual(Cart.objects.count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(user=self.user, item=self.menu[0], quantity=1)
+
+        self.assertEqual(store.set(self.user.id, self.menu[0].id, 4).quantity, 4)
+        self.assertEqual([entry.quantity for entry in store.checkout(self.user.id, lambda entries: entries)], [4])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_batch_update_applies_all_operations_at_once(self):
+        self.store.add(self.user.id, self.menu[2].id)
+        operations = [
+            {"op": "add", "item": self.menu[0].id, "quantity": 2},
+            {"op": "add", "item": self.menu[1].id},
+            {"op": "add", "item": self.menu[0].id},
+            {"op": "set", "item": self.menu[1].id, "quantity": 4},
+            {"op": "remove", "item": self.menu[2].id},
+        ]
+        # Principal and the menu item check, the cart store works in the cache
+        with self.assertNumQueries(2):
+            response = self.client.post("/api/order/update_cart/", {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row["item"], row["quantity"]) for row in response.data["results"]], [(self.menu[0].id, 3), (self.menu[1].id, 4)])
+
+        # One unknown item and nothing is applied
+        response = self.client.post("/api/order/update_cart/", {"operations": [{"op": "add", "item": self.menu[0].id}, {"op": "add", "item": 999}]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post("/api/order/update_cart/", {"operations": [{"op": "set", "item": self.menu[0].id}]}, format="json").status_code, 400)
+        self.assertEqual(self.store.get(self.user.id, self.menu[0].id).quantity, 3)
+
+    @override_settings(CART_LOCK_WAIT_SECONDS=0)
+    def test_every_cart_view_answers_a_held_lock_with_a_conflict(self):
+        # Another request holds the lock of a cart that is not loaded in the cache yet
+        self.store.cache.add(f"cart:{self.user.id}:lock", "other", timeout=60)
+        requests = [
+            lambda: self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/"),
+            lambda: self.client.put(f"/api/order/update_cart_item/{self.menu[0].id}/", {"quantity": 2}, format="json"),
+            lambda: self.client.get("/api/order/list_cart_items/"),
+            lambda: self.client.post("/api/order/update_cart/", {"operations": [{"op": "add", "item": self.menu[0].id}]}, format="json"),
+            lambda: self.client.delete(f"/api/order/delete_cart_item/{self.menu[0].id}/"),
+            lambda: self.client.delete("/api/order/delete_all_cart_items/"),
+            lambda: self.client.post("/api/order/make_order/"),
+        ]
+        for request in requests:
+            response = request()
+            self.assertEqual((response.status_code, response.data["detail"]), (409, "Cart is being updated, try again"))
+
+    def test_database_store_batch(self):
+        store = DatabaseCartStore()
+        store.add(self.user.id, self.menu[0].id)
+        store.add(self.user.id, self.menu[2].id)
+        operations = [
+            {"op": "add", "item": self.menu[0].id, "quantity": 2},
+            {"op": "set", "item": self.menu[1].id, "quantity": 5},
+            {"op": "remove", "item": self.menu[2].id},
+        ]
+        # Lock the cart, one upsert, one delete and reading the cart back, plus the savepoint pair of the nested atomic block
+        with self.assertNumQueries(6):
+            entries = store.apply(self.user.id, operations)
+        self.assertEqual([(entry.item_id, entry.quantity) for entry in entries], [(self.menu[0].id, 3), (self.menu[1].id, 5)])
+        self.assertEqual(sorted(Cart.objects.values_list("item_id", "quantity")), [(self.menu[0].id, 3), (self.menu[1].id, 5)])
+
+
+
+class VendorSalesTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.vendor_client = APIClient()
+        self.vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+
+    def place_order(self, *quantities):
+        for item, quantity in zip(self.menu, quantities):
+            cart_store.add(self.user.id, item.id, quantity)
+        return checkout(self.user)[0]
+
+    def rollups(self):
+        return sorted(VendorDailySales.objects.values_list("status_id", "order_count", "item_count", "revenue"))
+
+    def test_rollups_follow_placement_status_changes_and_line_updates(self):
+        first = self.place_order(1, 2)
+        self.place_order(3)
+        self.assertEqual(self.rollups(), [(1, 2, 6, Decimal("6002.00"))])
+
+        line = first.items.get(item=self.menu[0])
+        self.client.put(f"/api/order/update_order/{first.id}/", {"item": line.id, "quantity": 2}, format="json")
+        self.assertEqual(self.rollups(), [(1, 2, 7, Decimal("7002.00"))])
+
+        self.vendor_client.put(f"/api/order/{first.id}/update_order_status/", {"status": 2}, format="json")
+        self.assertEqual(self.rollups(), [(1, 1, 3, Decimal("3000.00")), (2, 1, 4, Decimal("4002.00"))])
+
+        # A rebuild from the orders lands on the same rows
+        call_command("rebuild_sales_rollups", chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.rollups(), [(1, 1, 3, Decimal("3000.00")), (2, 1, 4, Decimal("4002.00"))])
+
+    def test_dashboard_reads_the_rollups_of_the_range(self):
+        order = self.place_order(2)
+        self.place_order(1)
+        Order.objects.filter(id=order.id).update(order_date=timezone.now() - datetime.timedelta(days=3))
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+
+        # Principal lookup and the rollup rows, however many orders the range covers
+        with query_budget(2):
+            response = self.vendor_client.get("/api/order/vendor_sales/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data["totals"]["order_count"], response.data["totals"]["item_count"], response.data["totals"]["revenue"]),
+            (2, 3, Decimal("3000.00")),
+        )
+        self.assertEqual(response.data["totals"]["by_status"], {"pending": 2})
+        self.assertEqual(len(response.data["days"]), 2)
+
+        today = timezone.localdate().isoformat()
+        response = self.vendor_client.get(f"/api/order/vendor_sales/?start={today}&end={today}")
+        self.assertEqual(response.data["totals"]["order_count"], 1)
+        response = self.vendor_client.get(f"/api/order/vendor_sales/?start={today}&end=2020-01-01")
+        self.assertEqual(response.status_code, 400)
+
+
+
+class StatusRegistryTests(OrderTestCase):
+    def test_lookups_are_served_from_memory_and_follow_changes(self):
+        status_registry.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(status_registry.named("pending").id, status_registry.get("1").id)
+            self.assertEqual([status.name for status in status_registry.all()], ["pending", "accepted", "preparing", "ready", "delivered", "cancelled"])
+            # New orders start out pending whatever the id of the row
+            self.assertEqual(Order(vendor=self.vendor).status_id, status_registry.named("pending").id)
+
+        Status.objects.create(name="on_hold")
+        self.assertEqual(status_registry.named("on_hold").name, "on_hold")
+        with self.assertRaises(Status.DoesNotExist):
+            status_registry.get("nope")
+
+    def test_unknown_ids_reload_the_registry_at_most_once_per_interval(self):
+        status_registry.all()
+        with patch.object(status_registry, "_miss_reloaded_at", None):
+            with self.assertNumQueries(1):
+                for status_id in (991, 992, 993):
+                    with self.assertRaises(Status.DoesNotExist):
+                        status_registry.get(status_id)
+
+    def test_status_update_looks_up_the_status_without_a_query(self):
+        order, = self.place_order()
+        vendor_client = APIClient()
+        vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+        status_registry.all()
+
+        # Principal, locked order, its update and the rollup upsert, plus the savepoint
+        with query_budget(6):
+            response = vendor_client.put(f"/api/order/{order.id}/update_order_status/", {"status": 2}, format="json")
+        self.assertEqual(response.data["status"], 2)
+        self.assertEqual(vendor_client.put(f"/api/order/{order.id}/update_order_status/", {"status": 99}, format="json").status_code, 404)
+
+    def test_status_update_follows_the_transition_rules(self):
+        order, = self.place_order()
+        vendor_client = APIClient()
+        vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+        delivered = status_registry.named("delivered")
+        Order.objects.filter(id=order.id).update(status=delivered)
+
+        response = vendor_client.put(
+            f"/api/order/{order.id}/update_order_status/", {"status": status_registry.named("pending").id}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"id": order.id, "result": "invalid_transition", "status": "delivered"})
+        order.refresh_from_db()
+        self.assertEqual(order.status_id, delivered.id)
+
+    def test_delivered_flag_is_a_boolean(self):
+        order, = self.place_order()
+        vendor_client = APIClient()
+        vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+        url = f"/api/order/{order.id}/update_order_status/"
+
+        self.assertEqual(vendor_client.put(url, {"delivered": "false"}, format="json").data["delivered"], False)
+        self.assertEqual(vendor_client.put(url, {"delivered": True}, format="json").data["delivered"], True)
+        self.assertEqual(vendor_client.put(url, {"delivered": False}, format="json").data["delivered"], False)
+        self.assertEqual(vendor_client.put(url, {"delivered": "maybe"}, format="json").status_code, 400)
+
+    def place_order(self):
+        cart_store.add(self.user.id, self.menu[0].id, 1)
+        return checkout(self.user)
+
+
+
+class BulkOrderStatusTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.vendor_client = APIClient()
+        self.vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+
+        self.orders = []
+        for item in self.menu[:5]:
+            cart_store.add(self.user.id, item.id, 1)
+            self.orders += checkout(self.user)
+
+    def bulk_update(self, data):
+        return self.vendor_client.put("/api/order/bulk_update_order_status/", data, format="json")
+
+    def test_outcome_per_order_with_constant_queries(self):
+        other_vendor = Vendor.objects.create(name="Buka", description="", email="buka@example.com", contact_info="+2348011112222")
+        Order.objects.filter(id=self.orders[0].id).update(vendor=other_vendor)
+        Order.objects.filter(id=self.orders[1].id).update(status_id=5) # Already delivered
+        ids = [order.id for order in self.orders] + [999]
+
+        # Principal, locked orders, the UPDATE and the rollup upsert, plus the savepoint. Statuses come from the registry
+        with query_budget(6):
+            response = self.bulk_update({"orders": ids, "status": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["result"] for result in response.data["results"]],
+            ["not_found", "invalid_transition", "updated", "updated", "updated", "not_found"],
+        )
+        self.assertEqual(response.data["results"][1]["status"], "delivered")
+        self.assertEqual(Order.objects.filter(status_id=2).count(), 3)
+        self.assertEqual(
+            sorted(VendorDailySales.objects.filter(vendor=self.vendor).values_list("status_id", "order_count")),
+            [(1, 2), (2, 3)], # The two orders changed above went around the rollups
+        )
+
+        # Repeating the request changes nothing
+        response = self.bulk_update({"orders": ids[2:5], "status": 2})
+        self.assertEqual({result["result"] for result in response.data["results"]}, {"unchanged"})
+
+    def test_delivered_flag_alone_and_bad_requests(self):
+        response = self.bulk_update({"orders": [self.orders[0].id], "delivered": True})
+        self.assertEqual(response.data["results"], [{"id": self.orders[0].id, "result": "updated"}])
+        self.assertTrue(Order.objects.get(id=self.orders[0].id).delivered)
+
+        self.assertEqual(self.bulk_update({"orders": [self.orders[0].id]}).status_code, 400)
+        self.assertEqual(self.bulk_update({"orders": [self.orders[0].id], "status": 99}).status_code, 400)
+        self.assertEqual(self.client.put("/api/order/bulk_update_order_status/", {"orders": [1], "status": 2}, format="json").status_code, 401)
+
+
+
+class OrderEventTests(OrderTestCase):
+    async def test_bus_delivers_events_published_from_other_threads(self):
+        bus = EventBus(queue_size=2)
+        subscription = bus.subscribe(["vendor:1"])
+        other = bus.subscribe(["vendor:2"])
+
+        publisher = threading.Thread(target=bus.publish, args=([(["vendor:1"], {"type": "order.created"})],))
+        publisher.start()
+        publisher.join()
+        self.assertEqual(await subscription.get(1), {"type": "order.created"})
+        self.assertTrue(other.queue.empty())
+
+        # A subscriber that falls behind is flagged instead of growing without bound
+        bus.publish([(["vendor:1"], {"type": str(i)}) for i in range(3)])
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.overflowed)
+
+        subscription.close()
+        other.close()
+        self.assertEqual(bus.subscriber_count(), 0)
+
+    def test_checkout_and_status_changes_publish_after_commit(self):
+        cart_store.add(self.user.id, self.menu[0].id, 1)
+        with patch.object(get_event_bus(), "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                order = checkout(self.user)[0]
+            (channels, event), = publish.call_args.args[0]
+            self.assertEqual(channels, [vendor_channel(self.vendor.id), f"user:{self.user.id}"])
+            self.assertEqual((event["type"], event["order"]), ("order.created", order.id))
+
+            vendor_client = APIClient()
+            vendor_client.cookies["jwt"] = create_access_token(self.vendor)
+            with self.captureOnCommitCallbacks(execute=True):
+                vendor_client.put(f"/api/order/{order.id}/update_order_status/", {"status": 2}, format="json")
+            (channels, event), = publish.call_args.args[0]
+            self.assertEqual((event["type"], event["status"]), ("order.status_changed", 2))
+
+            # Nothing changes and nothing is published
+            publish.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                vendor_client.put(f"/api/order/{order.id}/update_order_status/", {"status": 2, "delivered": False}, format="json")
+            publish.assert_not_called()
+
+    @override_settings(ORDER_EVENTS_MAX_STREAM_SECONDS=0.5)
+    async def test_vendor_stream_pushes_events(self):
+        client = AsyncClient()
+        client.cookies["jwt"] = create_access_token(self.vendor)
+        response = await client.get("/api/order/vendor_events/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        get_event_bus().publish([([vendor_channel(self.vendor.id)], {"type": "order.created", "order": 7})])
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(chunk.decode().split("\n")[:2], ["event: order.created", 'data: {"type":"order.created","order":7}'])
+
+        # The stream runs out its lifetime and lets go of the subscription
+        self.assertEqual([chunk async for chunk in stream], [])
+        self.assertEqual(get_event_bus().subscriber_count(), 0)
+
+    @override_settings(ORDER_EVENTS_MAX_STREAM_SECONDS=0)
+    async def test_stream_ends_and_unsubscribes_after_its_lifetime(self):
+        client = AsyncClient()
+        client.cookies["jwt"] = create_access_token(self.user)
+        response = await client.get("/api/order/events/")
+
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(chunks, [b"retry: 3000\n\n"])
+        self.assertEqual(get_event_bus().subscriber_count(), 0)
+
+    async def test_stream_requires_a_token(self):
+        response = await AsyncClient().get("/api/order/events/")
+        self.assertEqual(response.status_code, 401)
+
+
+
+class IdempotencyTests(OrderTestCase):
+    def test_retried_checkout_is_replayed(self):
+        cart_store.add(self.user.id, self.menu[0].id, 1)
+
+        first = self.client.post("/api/order/make_order/", HTTP_IDEMPOTENCY_KEY="checkout-1")
+        # The retry reaches another worker, with nothing of the first request in its per-process cache
+        cache.clear()
+        with cache_queries_only():
+            retry = self.client.post("/api/order/make_order/", HTTP_IDEMPOTENCY_KEY="checkout-1")
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retried_add_to_cart_does_not_double_the_quantity(self):
+        for _ in range(3):
+            self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/", HTTP_IDEMPOTENCY_KEY="add-1")
+        self.assertEqual(cart_store.get(self.user.id, self.menu[0].id).quantity, 1)
+
+        # A new key is a new request
+        self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/", HTTP_IDEMPOTENCY_KEY="add-2")
+        self.assertEqual(cart_store.get(self.user.id, self.menu[0].id).quantity, 2)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.client.post(f"/api/order/add_to_cart/{self.menu[0].id}/", HTTP_IDEMPOTENCY_KEY="add-1")
+        response = self.client.post(f"/api/order/add_to_cart/{self.menu[1].id}/", HTTP_IDEMPOTENCY_KEY="add-1")
+        self.assertEqual(response.status_code, 422)
+
+    @override_settings(IDEMPOTENCY_CACHE_ALIAS="default")
+    def test_per_process_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            idempotent(lambda view, request: None)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_duplicate_of_a_request_in_progress_is_a_conflict(self):
+        with patch("users.idempotency.run_and_store") as run_and_store:
+            # The first request claims the key and is still running when the duplicate arrives
+            run_and_store.side_effect = lambda *args, **kwargs: self.client.post("/api/order/make_order/", HTTP_IDEMPOTENCY_KEY="checkout-1")
+            response = self.client.post("/api/order/make_order/", HTTP_IDEMPOTENCY_KEY="checkout-1")
+
+        self.assertEqual(response.status_code, 409)
+
+
+# Concurrent checkouts need row locks and real transactions in several connections
+@skipUnlessDBFeature("has_select_for_update")
+class CheckoutConcurrencyTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_double_order(self):
+        output = StringIO()
+        call_command("stress_checkout", users=10, items=3, threads=6, attempts=4, stdout=output)
+
+        self.assertIn("duplicate orders: 0, items left in carts: 0, errors: 0", output.getvalue())
@@ -4,6 +4,7 @@ from .views import *
 urlpatterns = [
     path("add_to_cart/<int:item_id>/", AddToCartView.as_view(), name="add_to_cart"),
     path("update_cart_item/<int:item_id>/", UpdateCartItemView.as_view(), name="update_cart_item"),
+    path("update_cart/", UpdateCartView.as_view(), name="update_cart"),
     path("list_cart_items/", ListCartItemsView.as_view(), name="list_cart_items"),
     path("delete_cart_item/<int:item_id>/", DeleteCartItemView.as_view(), name="delete_cart_item"),
     path("delete_all_cart_items/", DeleteAllCartItemsView.as_view(), name='delete_all_cart_items'),
@@ -14,5 +15,9 @@ urlpatterns = [
     path("update_order/<int:order_id>/", UpdateOrderView.as_view(), name="update_order"),
     path("vendor_orders/", GetVendorOrdersView.as_view(), name="vendor_orders"),
     path("<int:order_id>/update_order_status/", UpdateOrderStatus.as_view(), name="update_order_status"),
+    path("bulk_update_order_status/", BulkUpdateOrderStatusView.as_view(), name="bulk_update_order_status"),
+    path("vendor_sales/", VendorSalesView.as_view(), name="vendor_sales"),
+    path("events/", UserOrderEventsView.as_view(), name="order_events"),
+    path("vendor_events/", VendorOrderEventsView.as_view(), name="vendor_order_events"),
 
 ]
\ No newline at end of file
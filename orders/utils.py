@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.utils import timezone
+
+# Import project modules
+from .models import Order, OrderItem, status_registry
+from .cart import cart_store, EmptyCart
+from vendors.models import Menu
+from .rollups import record_new_orders, record_status_changes
+from .events import publish_order_events
+
+
+# Turn the user's cart into one order per vendor in one transaction with a fixed number of statements:
+# read the prices, insert the orders and their lines, upsert the vendor sales rollups, drop the cart.
+# The cart store holds the cart locked meanwhile, so a second checkout of the same cart finds it empty
+def checkout(user):
+    def place(entries):
+        menus = Menu.objects.filter(id__in=[entry.item_id for entry in entries]).only("id", "vendor_id", "price").in_bulk()
+        # Lines of items deleted from the menu are dropped
+        entries = [entry for entry in entries if entry.item_id in menus]
+        if not entries:
+            raise EmptyCart()
+
+        # Group the cart by vendor, every vendor gets its own order
+        by_vendor = {}
+        for entry in entries:
+            by_vendor.setdefault(menus[entry.item_id].vendor_id, []).append(entry)
+
+        # Snapshot the prices and totals at checkout, later menu price changes don't touch placed orders
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(
+                user=user,
+                vendor_id=vendor_id,
+                item_count=sum(entry.quantity for entry in vendor_entries),
+                total=sum(menus[entry.item_id].price * entry.quantity for entry in vendor_entries),
+                order_date=now,
+                delivered=False,
+                paid_for=False,
+            )
+            for vendor_id, vendor_entries in by_vendor.items()
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, item_id=entry.item_id, quantity=entry.quantity, price=menus[entry.item_id].price)
+            for order, vendor_entries in zip(orders, by_vendor.values())
+            for entry in vendor_entries
+        ])
+        record_new_orders(orders)
+        publish_order_events("order.created", orders)
+        return orders
+
+    return cart_store.checkout(user.id, place)
+
+
+# Statuses an order may move to from each status, by name. An order keeps its status when it is not listed
+STATUS_TRANSITIONS = {
+    "pending": {"accepted", "cancelled"},
+    "accepted": {"preparing", "ready", "cancelled"},
+    "preparing": {"ready", "cancelled"},
+    "ready": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+
+def can_transition(from_status, to_status):
+    return from_status == to_status or to_status in STATUS_TRANSITIONS.get(from_status, ())
+
+
+# Move many orders of a vendor to a status and/or delivered flag: one query checks ownership and the
+# current statuses, one UPDATE applies every allowed change. Returns an outcome per requested id
+def bulk_transition(vendor, order_ids, status_id=None, delivered=None):
+    # Raises Status.DoesNotExist for an unknown target status. Statuses come from the registry, no query or join
+    target = status_registry.get(status_id) if status_id is not None else None
+
+    with transaction.atomic():
+        orders = {
+            order.id: order for order in
+            Order.objects.select_for_update(of=("self",))
+            .filter(id__in=order_ids, vendor_id=vendor.id)
+            .only("id", "user_id", "vendor_id", "status_id", "item_count", "total", "order_date", "delivered", "updated_at")
+            .order_by("id")
+        }
+
+        outcomes, changes = [], []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                # Other vendors' orders are reported the same as missing ones
+                outcomes.append({"id": order_id, "result": "not_found"})
+            elif target is not None and not can_transition(status_registry.get(order.status_id).name, target.name):
+                outcomes.append({"id": order_id, "result": "invalid_transition", "status": status_registry.get(order.status_id).name})
+            elif (target is None or target.id == order.status_id) and (delivered is None or delivered == order.delivered):
+                outcomes.append({"id": order_id, "result": "unchanged"})
+            else:
+                outcomes.append({"id": order_id, "result": "updated"})
+                changes.append((order, order.status_id))
+
+        if changes:
+            now = timezone.now()
+            values = {"updated_at": now}
+            if target is not None:
+                values["status_id"] = target.id
+            if delivered is not None:
+                values["delivered"] = delivered
+            Order.objects.filter(id__in=[order.id for order, _ in changes]).update(**values)
+
+            # Bring the fetched rows up to date for the rollups and the events
+            for order, _ in changes:
+                for field, value in values.items():
+                    setattr(order, field, value)
+            record_status_changes(changes)
+            publish_order_events("order.status_changed", [order for order, _ in changes])
+
+    return outcomes
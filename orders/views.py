@@ -3,46 +3,44 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
+
+# Import python standard modules
+from decimal import Decimal
+import asyncio, json, time
 
 
 # Import project modules
 from .models import *
 from .serializers import *
 from users.utils import *
-
-# Import python standard modules
-import jwt
+from users.authentication import VendorJWTAuthentication, UserClaimsJWTAuthentication
+from users.pagination import KeysetPagination
+from users.idempotency import idempotent
+from .utils import checkout, bulk_transition, can_transition, EmptyCart
+from .cart import cart_store
+from .rollups import record_status_change, record_total_change
+from .events import get_event_bus, publish_order_events, user_channel, vendor_channel
 
 
 # Define view to enable users add item to thier Cart
 class AddToCartView(APIView):
+   @idempotent
    def post(self, request, item_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = User.objects.get(id=user_id)
+        if not Menu.objects.filter(id=item_id).exists():
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
-                item = get_object_or_404(Menu, id=item_id)
+        # Add the item or increment its quantity by one, an atomic increment in the cart store
+        cart_item = cart_store.add(request.user.id, item_id)
 
-                # Check if the item is already in the user's cart
-                cart_item, created = Cart.objects.get_or_create(user=user, item=item)
-                if not created:
-                    # If the item already exists, increment the quantity by one
-                    cart_item.quantity += 1
-                    cart_item.save()
-
-                serializer = CartSerializer(cart_item)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        serializer = CartSerializer(cart_item)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
     
 
 
@@ -50,316 +48,344 @@ class AddToCartView(APIView):
 # Define a view to enable user update CartItem quantity 
 class UpdateCartItemView(APIView):
     def put(self, request, item_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = get_object_or_404(User, id=user_id)
+        serializer = CartQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-                cart_item = get_object_or_404(Cart, user=user, item=item_id)
+        # Update the quantity based on the request data
+        cart_item = cart_store.set(request.user.id, item_id, serializer.validated_data["quantity"])
+        if cart_item is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
-                # Update the quantity based on the request data
-                new_quantity = request.data.get('quantity', cart_item.quantity)
-                cart_item.quantity = new_quantity
-                cart_item.save()
+        serializer = CartSerializer(cart_item)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-                serializer = CartSerializer(cart_item)
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            except Cart.DoesNotExist:
-                return Response({"detail": "CartItem not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
 
+# Cart lines are listed in the order they were added, a user has one line per item
+CART_ORDERING = ("created_at", "item_id")
 
 
 # Define view to list all user cartitem 
 class ListCartItemsView(APIView):
     def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        # Carts are read whole from the cart store and paginated in the order items were added
+        user_cart_items = cart_store.items(request.user.id)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user_cart_items = Cart.objects.filter(user_id=user_id)
-                serializer = CartSerializer(user_cart_items, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = KeysetPagination(ordering=CART_ORDERING)
+        page = paginator.paginate_list(user_cart_items, request, view=self)
+        serializer = CartSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+ 
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
- 
+# Define view to apply a list of add/set/remove operations to the user's cart at once and return the cart
+class UpdateCartView(APIView):
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data["operations"]
 
+        # Check every item added or set in one query, the batch is applied whole or not at all
+        item_ids = {operation["item"] for operation in operations if operation["op"] != "remove"}
+        unknown = item_ids - set(Menu.objects.filter(id__in=item_ids).values_list("id", flat=True))
+        if unknown:
+            return Response({"operations": [f"Unknown menu items: {', '.join(map(str, sorted(unknown)))}"]}, status=status.HTTP_400_BAD_REQUEST)
 
-# Define a view to delete an item from user Cart 
-class DeleteCartItemView(APIView):
-    def delete(self, request, item_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        user_cart_items = cart_store.apply(request.user.id, operations)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                # Ensure that the user only deletes items from their own cart
-                cart_item = get_object_or_404(Cart, user_id=user_id, item_id=item_id)
-                cart_item.delete()
+        # Answer with the first page of the cart, as list_cart_items would
+        paginator = KeysetPagination(ordering=CART_ORDERING)
+        page = paginator.paginate_list(user_cart_items, request, view=self)
+        serializer = CartSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-                return Response({"detail": "Item deleted successfully"}, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+# Define a view to delete an item from user Cart 
+class DeleteCartItemView(APIView):
+    def delete(self, request, item_id, *args, **kwargs):
+        # Ensure that the user only deletes items from their own cart
+        if not cart_store.remove(request.user.id, item_id):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"detail": "Item deleted successfully"}, status=status.HTTP_200_OK)
     
 
 
 # Define view to enable user delete all user cartitem
 class DeleteAllCartItemsView(APIView):
     def delete(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                # Ensure that the user only deletes items from their own cart
-                cart_items = Cart.objects.filter(user_id=user_id)
-                cart_items.delete()
+        # Ensure that the user only deletes items from their own cart
+        cart_store.clear(request.user.id)
 
-                return Response({"detail": "All items deleted successfully"}, status=status.HTTP_200_OK)
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({"detail": "All items deleted successfully"}, status=status.HTTP_200_OK)
 
 
 # Define view to enable user place order
 class AddCartItemsToOrderView(APIView):
+    @idempotent
     def post(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = User.objects.get(id=user_id)
-
-                # Ensure that the user only adds items from their own cart to OrderItem
-                cart_items = Cart.objects.filter(user_id=user_id)
-                order_items = []
-
-                # Create OrderItem instances from CartItem instances
-                for cart_item in cart_items:
-                    order_items.append(
-                        Order(
-                            user=user,
-                            item=cart_item.item,
-                            quantity=cart_item.quantity,
-                            # price=cart_item.item.price * cart_item.quantity,
-                            price=cart_item.item.price,
-                            order_date=timezone.now(),
-                            delivered=False,
-                            paid_for=False  # Adjust this based on your logic
-                        )
-                    )
+        # Move the cart into orders atomically, concurrent checkouts of the same cart can't double order
+        try:
+            orders = checkout(request.user)
+        except EmptyCart:
+            return Response({"detail": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+
+        prefetch_related_objects(orders, "items")
+        serializer = OrderDetailSerializer(orders, many=True)
+        return Response({"detail": "Cart items added to OrderItem successfully", "orders": serializer.data}, status=status.HTTP_201_CREATED)
 
-                # Bulk create the OrderItem instances
-                Order.objects.bulk_create(order_items)
 
-                # Delete the cart items after creating the order items
-                cart_items.delete()
 
-                return Response({"detail": "Cart items added to OrderItem successfully"}, status=status.HTTP_201_CREATED)
+# Define view for user to retrieve a list of orders placed
+class ListOrdersView(APIView):
+    def get(self, request, *args, **kwargs):
+        # Get orders for the authenticated user
+        orders = Order.objects.filter(user=request.user)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+        # Paginate the orders, newest first, and serialize them
+        paginator = KeysetPagination(ordering=("-order_date", "-id"))
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = OrderSerializer(page, many=True)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        return paginator.get_paginated_response(serializer.data)
 
 
 
-# Define view for user to retrieve a list of orders placed
-class ListOrdersView(APIView):
-    def get(self, request, *args, **kwargs):
-       jwt_token = request.COOKIES.get("jwt")
+# Define view for user to retrieve a list of orders placed with a specific food vendor.
+class VendorOrdersView(APIView):
+    def get(self, request, vendor_id, *args, **kwargs):
+        # Get orders for the authenticated user and a specific vendor
+        orders = Order.objects.filter(user=request.user, vendor_id=vendor_id)
 
-       if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = User.objects.get(id=user_id)
+        # Serialize the orders using OrderSerializer
+        serializer = OrderSerializer(orders, many=True)
 
-                # Get orders for the authenticated user
-                orders = Order.objects.filter(user=user)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-                # Serialize the orders
-                serializer = OrderSerializer(orders, many=True)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+# Define view for user to retrieve details about a specific order.
+class OrderDetailsView(APIView):
+    def get(self, request, order_id, *args, **kwargs):
+        # Get the order for the authenticated user
+        order = get_object_or_404(Order.objects.prefetch_related("items"), id=order_id, user=request.user)
 
-       return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        # Serialize the order details with its lines
+        serializer = OrderDetailSerializer(order)
 
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-# Define view for user to retrieve a list of orders placed with a specific food vendor.
-class VendorOrdersView(APIView):
-    def get(self, request, vendor_id, *args, **kwargs):
-        
-        jwt_token = request.COOKIES.get("jwt")
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = User.objects.get(id=user_id)
+# Define view to enable user update order(quantity)
+class UpdateOrderView(APIView):
+    def put(self, request, order_id,  *args, **kwargs):
+        try:
+            line_id = int(request.data.get("item"))
+            new_quantity = int(request.data.get("quantity"))
+        except (TypeError, ValueError):
+            return Response({"detail": "item and quantity must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if new_quantity < 1:
+            return Response({"detail": "quantity must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Lock the order so concurrent line updates recompute the totals one after another
+            order = get_object_or_404(Order.objects.select_for_update(), id=order_id, user=request.user)
+            # Once the vendor took the order up its lines are final, and so are its past sales rollups
+            if order.status_id != status_registry.named("pending").id:
+                return Response({"detail": "Only pending orders can be changed"}, status=status.HTTP_409_CONFLICT)
+            line = get_object_or_404(OrderItem, id=line_id, order=order)
+
+            # Update the quantity of the line and the denormalized totals of the order
+            line.quantity = new_quantity
+            line.save(update_fields=["quantity"])
+            item_count, total = order.item_count, order.total
+            order.refresh_totals()
+            order.save(update_fields=["item_count", "total", "updated_at"])
+            record_total_change(order, order.item_count - item_count, order.total - total)
+
+        prefetch_related_objects([order], "items")
+        serializer = OrderDetailSerializer(order)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-                # Get orders for the authenticated user and a specific vendor
-                orders = Order.objects.filter(user=user, item__vendor__id=vendor_id)
 
-                # Serialize the orders using OrderItemSerializer
-                serializer = OrderSerializer(orders, many=True)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
+# Define view to enable  vendors to retrieve a list of orders placed with their them
+class GetVendorOrdersView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+    def get(self, request,  *args, **kwargs):
+        # Get orders for the specific vendor
+        orders = Order.objects.filter(vendor_id=request.user.id)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        # Paginate the orders, newest first, and serialize them
+        paginator = KeysetPagination(ordering=("-order_date", "-id"))
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = OrderSerializer(page, many=True)
 
+        return paginator.get_paginated_response(serializer.data)
 
 
-# Define view for user to retrieve details about a specific order.
-class OrderDetailsView(APIView):
-    def get(self, request, order_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+# Define view to allows vendor to update specific orderstatus
+class UpdateOrderStatus(APIView):
+    authentication_classes = [VendorJWTAuthentication]
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = User.objects.get(id=user_id)
+    def put(self, request, order_id,  *args, **kwargs):
+        # Get the new order status and/or delivered flag
+        serializer = OrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data.get("status")
+        delivery_status = serializer.validated_data.get("delivered")
+
+        with transaction.atomic():
+            # Get specific order for the specific vendor, locked so the sales rollups see every change once
+            order = get_object_or_404(Order.objects.select_for_update(), id=order_id, vendor_id=request.user.id)
+            old_status_id = order.status_id
+            old_delivered = order.delivered
+
+            # Update user details
+            if new_status is not None:
+                # A dict hit in the status registry, no query
+                try:
+                    target = status_registry.get(new_status)
+                except Status.DoesNotExist:
+                    return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+                # Same transition rules and outcome as the bulk endpoint
+                current = status_registry.get(order.status_id).name
+                if not can_transition(current, target.name):
+                    return Response(
+                        {"id": order.id, "result": "invalid_transition", "status": current},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                order.status = target
+            if delivery_status is not None:
+                order.delivered = delivery_status
 
-                # Get the order for the authenticated user
-                order = get_object_or_404(Order, id=order_id, user=user)
+            # Orders left as they were are not written, counted or announced again
+            if order.status_id != old_status_id or order.delivered != old_delivered:
+                order.save()
+                record_status_change(order, old_status_id)
+                publish_order_events("order.status_changed", [order])
 
-                # Serialize the order details
-                serializer = OrderSerializer(order)
+        # Serialize the orders using OrderItemSerializer
+        serializer = OrderSerializer(order)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
 
+# Define view to allow vendors to move many orders to a status and/or delivered flag in one request
+class BulkUpdateOrderStatusView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
 
-# Define view to enable user update order(quantity)
-class UpdateOrderView(APIView):
-    def put(self, request, order_id,  *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+    def put(self, request, *args, **kwargs):
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                user = User.objects.get(id=user_id)
+        try:
+            results = bulk_transition(
+                request.user,
+                list(dict.fromkeys(serializer.validated_data["orders"])),
+                status_id=serializer.validated_data.get("status"),
+                delivered=serializer.validated_data.get("delivered"),
+            )
+        except Status.DoesNotExist:
+            return Response({"status": ["Unknown status"]}, status=status.HTTP_400_BAD_REQUEST)
 
-                # Get the order for the authenticated user
-                order = get_object_or_404(Order, id=order_id, user=user)
+        return Response({"results": results}, status=status.HTTP_200_OK)
 
 
-                # Update the quantity based on the request data
-                new_quantity = request.data.get('quantity', order.quantity)
-                order.quantity = new_quantity
-                order.save()
 
-                serializer = OrderSerializer(order)
-                return Response(serializer.data, status=status.HTTP_200_OK)
+# Define view to give vendors their sales dashboard over a date range, read from the daily rollups
+class VendorSalesView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+    def get(self, request, *args, **kwargs):
+        serializer = SalesRangeSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start, end = serializer.validated_data["start"], serializer.validated_data["end"]
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        # One row per day and status in the range, however many orders they stand for
+        rows = (
+            VendorDailySales.objects.filter(vendor_id=request.user.id, day__range=(start, end))
+            .values_list("day", "status__name", "order_count", "item_count", "revenue")
+            .order_by("day")
+        )
 
+        totals = {"order_count": 0, "item_count": 0, "revenue": Decimal(0), "by_status": {}}
+        days = {}
+        for day, status_name, order_count, item_count, revenue in rows:
+            for summary in (totals, days.setdefault(day, {"day": day, "order_count": 0, "item_count": 0, "revenue": Decimal(0), "by_status": {}})):
+                summary["order_count"] += order_count
+                summary["item_count"] += item_count
+                summary["revenue"] += revenue
+                summary["by_status"][status_name] = summary["by_status"].get(status_name, 0) + order_count
 
+        return Response({"start": start, "end": end, "totals": totals, "days": list(days.values())}, status=status.HTTP_200_OK)
 
-# Define view to enable  vendors to retrieve a list of orders placed with their them
-class GetVendorOrdersView(APIView):
-    def get(self, request,  *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
 
-                # Get orders for the specific vendor
-                orders = Order.objects.filter(item__vendor__id=vendor_id)
+# Define base view that streams order events as Server-Sent Events, needs an ASGI server so idle streams
+# only cost a queue on the event loop instead of a worker thread
+class OrderEventsView(View):
+    authentication_class = None
 
-                # Serialize the orders using OrderItemSerializer
-                serializer = OrderSerializer(orders, many=True)
+    async def get(self, request, *args, **kwargs):
+        try:
+            authenticated = await sync_to_async(self.authentication_class().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=401)
+        if authenticated is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
+        response = StreamingHttpResponse(self.stream(self.channels(authenticated[0])), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+    def channels(self, principal):
+        raise NotImplementedError
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+    async def stream(self, channels):
+        subscription = get_event_bus().subscribe(channels)
+        heartbeat = getattr(settings, "ORDER_EVENTS_HEARTBEAT_SECONDS", 15)
+        # Streams end after a while and EventSource reconnects, so streams of vanished clients don't pile up
+        ends_at = time.monotonic() + getattr(settings, "ORDER_EVENTS_MAX_STREAM_SECONDS", 300)
+        try:
+            yield "retry: 3000\n\n"
+            while not subscription.overflowed and time.monotonic() < ends_at:
+                try:
+                    event = await subscription.get(max(0, min(heartbeat, ends_at - time.monotonic())))
+                except asyncio.TimeoutError:
+                    if time.monotonic() < ends_at:
+                        yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+        finally:
+            subscription.close()
 
 
-# Define view to allows vendor to update specific orderstatus
-class UpdateOrderStatus(APIView):
-    def put(self, request, order_id,  *args, **kwargs):
-        # Get the JWT token from the cookie
-        jwt_token = request.COOKIES.get("jwt")
-
-        # Get the new order status 
-        new_status = request.data.get("status")
-        delivery_status = request.data.get("delivered")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                
-
-                # Get specific order for the specific vendor
-                order = get_object_or_404(Order, id=order_id, item__vendor__id=vendor_id)
-                # orders = Order.objects.filter(item__vendor__id=vendor_id)
-
-                # Update user details
-                if new_status:
-                    status_instance = get_object_or_404(Status, id=new_status)
-                    order.status = status_instance
-                if delivery_status:
-                        order.delivered = delivery_status
 
-                order.save()
+# Define view to stream new orders and status changes to a vendor
+class VendorOrderEventsView(OrderEventsView):
+    authentication_class = VendorJWTAuthentication
 
-                # Serialize the orders using OrderItemSerializer
-                serializer = OrderSerializer(order)
+    def channels(self, vendor):
+        return [vendor_channel(vendor.id)]
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+# Define view to stream status changes of their orders to a user, the token claims are enough to subscribe
+class UserOrderEventsView(OrderEventsView):
+    authentication_class = UserClaimsJWTAuthentication
 
+    def channels(self, user):
+        return [user_channel(user.id)]
 
 
-     
 
 # Define view to enable user Cancels a specific order.
 
@@ -0,0 +1,194 @@
+# Import third party modules
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
+
+# Import python standard modules
+from collections import OrderedDict
+import copy, threading, time
+import jwt
+
+# Import project modules
+from .utils import decode_token
+from .revocation import revocation_list
+from .models import User
+from vendors.models import Vendor
+
+
+# Define a per-process LRU cache (with a time to live) of principals resolved from JWT tokens
+class PrincipalCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # (model label, token) -> (expiry time, principal, token claims)
+        self._keys = {} # (model label, pk) -> set of cache keys, used for invalidation
+        self._lock = threading.Lock()
+
+    def get(self, model, token):
+        key = (model._meta.label, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Hand out a copy so a view mutating its principal never leaks into other requests
+            return copy.copy(entry[1]), entry[2]
+
+    def set(self, model, token, principal, payload):
+        key = (model._meta.label, token)
+        # Never keep a principal around for longer than its token is valid
+        ttl = min(self.ttl, payload["exp"] - time.time())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, copy.copy(principal), payload)
+            self._keys.setdefault((model._meta.label, principal.pk), set()).add(key)
+
+            # Evict the least recently used entries
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, principal):
+        with self._lock:
+            for key in self._keys.pop((principal._meta.label, principal.pk), set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        _, principal, _ = self._entries.pop(key)
+        keys = self._keys.get((principal._meta.label, principal.pk))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[(principal._meta.label, principal.pk)]
+
+
+principal_cache = PrincipalCache(
+    max_size=getattr(settings, "PRINCIPAL_CACHE_MAX_SIZE", 10000),
+    ttl=getattr(settings, "PRINCIPAL_CACHE_TTL_SECONDS", 300),
+)
+
+
+# Define a principal built from the claims of an access token, without touching the database
+class TokenPrincipal:
+    is_authenticated = True
+
+    def __init__(self, payload):
+        self.id = payload["id"]
+        self.pk = payload["id"]
+        self.type = payload["type"]
+        self.is_verified = payload.get("is_verified", False)
+        self.is_active = payload.get("is_active", False)
+        self.claims = payload
+
+
+# Define base authentication class that reads the access token from the "jwt" cookie
+class JWTCookieAuthentication(BaseAuthentication):
+    principal_type = None
+
+    def authenticate(self, request):
+        token = request.COOKIES.get("jwt")
+
+        # Let the permission classes decide what to do with anonymous requests
+        if not token:
+            return None
+
+        principal, payload = self.get_principal(token)
+
+        # Reject tokens that were revoked on logout
+        if revocation_list.is_revoked(payload["jti"]):
+            raise AuthenticationFailed("Token revoked")
+
+        # Expose the token claims as request.auth
+        return (principal, payload)
+
+    def decode(self, token):
+        try:
+            # Decode the JWT and check its expiry and token type
+            payload = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            raise AuthenticationFailed("Token expired")
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed("Invalid token")
+
+        if payload["type"] != self.principal_type:
+            raise AuthenticationFailed("Invalid token")
+        # Deactivated users are locked out, vendors use is_active to flag that they have a location
+        if payload["type"] == "user" and not payload.get("is_active"):
+            raise AuthenticationFailed("User inactive")
+
+        return payload
+
+    def get_principal(self, token):
+        raise NotImplementedError
+
+    def authenticate_header(self, request):
+        # Return a value so DRF answers unauthenticated requests with 401 instead of 403
+        return 'JWT realm="api"'
+
+
+# Define authentication class that loads the principal row through the principal cache
+class ModelJWTAuthentication(JWTCookieAuthentication):
+    model = None
+    not_found_message = "User not found"
+
+    def get_principal(self, token):
+        cached = principal_cache.get(self.model, token)
+        if cached is None:
+            payload = self.decode(token)
+
+            principal = self.model.objects.filter(id=payload["id"]).first()
+            if principal is None:
+                raise AuthenticationFailed(self.not_found_message)
+            if self.principal_type == "user" and not principal.is_active:
+                raise AuthenticationFailed("User inactive")
+
+            principal_cache.set(self.model, token, principal, payload)
+            return principal, payload
+
+        return cached
+
+
+# Define authentication class for user endpoints
+class UserJWTAuthentication(ModelJWTAuthentication):
+    principal_type = "user"
+    model = User
+
+
+# Define authentication class for vendor endpoints
+class VendorJWTAuthentication(ModelJWTAuthentication):
+    principal_type = "vendor"
+    model = Vendor
+    not_found_message = "Vendor not found"
+
+
+# Define authentication class for read-only user endpoints that only need the token claims
+class UserClaimsJWTAuthentication(JWTCookieAuthentication):
+    principal_type = "user"
+
+    def get_principal(self, token):
+        payload = self.decode(token)
+        return TokenPrincipal(payload), payload
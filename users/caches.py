@@ -0,0 +1,21 @@
+from django.core.cache import caches, InvalidCacheBackendError
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+
+
+# Check that a cache alias is seen by every worker process, for data that has to hold across workers.
+# Per-process backends (LocMemCache, DummyCache) are refused. atomic=True also asks for incr() that is atomic
+# across workers, which only Redis and Memcached provide (the database cache reads and writes back)
+def check_shared_cache(alias, purpose, atomic=False):
+    try:
+        cache = caches[alias]
+    except InvalidCacheBackendError:
+        raise ImproperlyConfigured(f"{purpose} needs CACHES[{alias!r}], which is not configured")
+
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(f"{purpose} needs a cache shared by all workers, CACHES[{alias!r}] is a {type(cache).__name__}")
+    if atomic and not isinstance(cache, (RedisCache, BaseMemcachedCache)):
+        raise ImproperlyConfigured(f"{purpose} needs Redis or Memcached for atomic counters, CACHES[{alias!r}] is a {type(cache).__name__}")
@@ -0,0 +1,36 @@
+from django.views.decorators.http import condition
+
+# Import python standard modules
+import hashlib
+
+
+# Build a conditional GET decorator from a state function returning (last_modified, fingerprint) or None.
+# The state is computed once per request and must be cheap, e.g. a max(updated_at) and a count, so a
+# matching If-None-Match or If-Modified-Since is answered with 304 before anything is serialized.
+def conditional_on(state_func):
+    def state(request, *args, **kwargs):
+        if not hasattr(request, "_conditional_state"):
+            request._conditional_state = state_func(request, *args, **kwargs)
+        return request._conditional_state
+
+    def etag(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None:
+            return None
+        last_modified, fingerprint = current
+
+        # Pages and filters are different representations, so the full path is part of the tag
+        value = f"{request.get_full_path()}|{fingerprint}|{last_modified.isoformat() if last_modified else ''}"
+        return hashlib.sha256(value.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        return current[0] if current else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+# Return the latest of several optional datetimes
+def latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
@@ -0,0 +1,93 @@
+# Import python standard modules
+import math
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LATITUDE = 111.32
+
+# Size of a grid cell in degrees, about 5.5 km north to south
+GRID_CELL_DEGREES = 0.05
+
+# Above this many cells a bounding box on latitude and longitude prunes better than a long IN list
+MAX_GRID_CELLS = 400
+
+
+# Return the id of the grid cell holding a point, or None for points without coordinates
+def grid_cell(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return f"{math.floor(latitude / GRID_CELL_DEGREES)}:{math.floor(longitude / GRID_CELL_DEGREES)}"
+
+
+# Great circle distance between two points in kilometres
+def haversine(latitude1, longitude1, latitude2, longitude2):
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(longitude2 - longitude1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Return (min latitude, max latitude, min longitude, max longitude) of a box holding every point within radius_km
+def bounding_box(latitude, longitude, radius_km):
+    d_latitude = radius_km / KM_PER_DEGREE_LATITUDE
+    min_latitude, max_latitude = max(-90.0, latitude - d_latitude), min(90.0, latitude + d_latitude)
+
+    # Near the poles or for huge radii every longitude is in range
+    cos_latitude = math.cos(math.radians(max(abs(min_latitude), abs(max_latitude))))
+    if cos_latitude <= 0 or radius_km / (KM_PER_DEGREE_LATITUDE * cos_latitude) >= 180:
+        return min_latitude, max_latitude, -180.0, 180.0
+
+    d_longitude = radius_km / (KM_PER_DEGREE_LATITUDE * cos_latitude)
+    return min_latitude, max_latitude, longitude - d_longitude, longitude + d_longitude
+
+
+# Return the ids of the grid cells overlapping a bounding box, or None when there are too many to list
+def grid_cells_in_box(min_latitude, max_latitude, min_longitude, max_longitude):
+    rows = range(math.floor(min_latitude / GRID_CELL_DEGREES), math.floor(max_latitude / GRID_CELL_DEGREES) + 1)
+    columns = range(math.floor(min_longitude / GRID_CELL_DEGREES), math.floor(max_longitude / GRID_CELL_DEGREES) + 1)
+    if len(rows) * len(columns) > MAX_GRID_CELLS:
+        return None
+    return [f"{row}:{column}" for row in rows for column in columns]
+
+
+# Filter a queryset of rows with latitude, longitude and grid_cell down to candidates within radius_km of a point
+def within_box(queryset, latitude, longitude, radius_km):
+    min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(latitude, longitude, radius_km)
+    queryset = queryset.filter(latitude__gte=min_latitude, latitude__lte=max_latitude)
+
+    # Boxes crossing the antimeridian are rare enough to prune on latitude only
+    if min_longitude >= -180 and max_longitude <= 180:
+        queryset = queryset.filter(longitude__gte=min_longitude, longitude__lte=max_longitude)
+        cells = grid_cells_in_box(min_latitude, max_latitude, min_longitude, max_longitude)
+        if cells is not None:
+            queryset = queryset.filter(grid_cell__in=cells)
+    return queryset
+
+
+# Return (distance, row) pairs within radius_km of a point, nearest first, keeping the nearest row per distinct_on value.
+# With k set, search outwards from a single cell, doubling the radius until k rows are found or radius_km is reached.
+def nearest(queryset, latitude, longitude, radius_km, k=None, distinct_on="pk"):
+    search_radius = radius_km if k is None else min(radius_km, GRID_CELL_DEGREES * KM_PER_DEGREE_LATITUDE)
+
+    while True:
+        candidates = []
+        for row in within_box(queryset, latitude, longitude, search_radius):
+            distance = haversine(latitude, longitude, row.latitude, row.longitude)
+            # The box corners reach further than the radius, drop those rows
+            if distance <= search_radius:
+                candidates.append((distance, row))
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1].pk))
+
+        results, seen = [], set()
+        for distance, row in candidates:
+            key = getattr(row, distinct_on)
+            if key not in seen:
+                seen.add(key)
+                results.append((distance, row))
+
+        # Everything within search_radius has been seen, so the k nearest found so far are the true k nearest
+        if k is None or len(results) >= k or search_radius >= radius_km:
+            return results[:k]
+        search_radius = min(radius_km, search_radius * 2)
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+# Import python standard modules
+import functools, hashlib, json, time
+
+# Import project modules
+from .caches import check_shared_cache
+
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# Identify the authenticated principal, users and vendors share id ranges
+def principal_key(request):
+    principal = request.user
+    principal_type = getattr(principal, "type", None) or principal._meta.model_name
+    return f"{principal_type}:{principal.pk}"
+
+
+# Fingerprint the request, a key reused for a different request is rejected instead of replayed
+def request_fingerprint(request):
+    data = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path} {data}".encode()).hexdigest()
+
+
+# Make a DRF view method idempotent per (principal, Idempotency-Key header).
+# The first response is stored for IDEMPOTENCY_TTL_SECONDS and replayed to retries without running the view,
+# a retry arriving while the first request is still running waits for its outcome.
+def idempotent(view_method):
+    # A retry may land on another worker, it has to find the first request's record there
+    check_shared_cache(_setting("IDEMPOTENCY_CACHE_ALIAS", "shared"), "Idempotency-Key support")
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"detail": "Idempotency-Key is too long"}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache = caches[_setting("IDEMPOTENCY_CACHE_ALIAS", "shared")]
+        cache_key = "idempotency:" + hashlib.sha256(f"{principal_key(request)}:{key}".encode()).hexdigest()
+        fingerprint = request_fingerprint(request)
+
+        # add() is atomic, exactly one of several concurrent duplicates claims the key
+        marker = {"state": IN_PROGRESS, "fingerprint": fingerprint}
+        if cache.add(cache_key, marker, timeout=_setting("IDEMPOTENCY_LOCK_SECONDS", 30)):
+            return run_and_store(cache, cache_key, fingerprint, view_method, self, request, *args, **kwargs)
+
+        record = cache.get(cache_key)
+        deadline = time.monotonic() + _setting("IDEMPOTENCY_WAIT_SECONDS", 10)
+        while record is not None and record["state"] == IN_PROGRESS and time.monotonic() < deadline:
+            time.sleep(0.05)
+            record = cache.get(cache_key)
+
+        if record is None:
+            # The first request failed and released the key, this retry does the work
+            if cache.add(cache_key, marker, timeout=_setting("IDEMPOTENCY_LOCK_SECONDS", 30)):
+                return run_and_store(cache, cache_key, fingerprint, view_method, self, request, *args, **kwargs)
+            record = cache.get(cache_key) or marker
+
+        if record["fingerprint"] != fingerprint:
+            return Response(
+                {"detail": "Idempotency-Key was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record["state"] == IN_PROGRESS:
+            return Response({"detail": "A request with this Idempotency-Key is still in progress"}, status=status.HTTP_409_CONFLICT)
+
+        response = Response(record["data"], status=record["status"])
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    return wrapper
+
+
+def run_and_store(cache, cache_key, fingerprint, view_method, view, request, *args, **kwargs):
+    try:
+        response = view_method(view, request, *args, **kwargs)
+    except Exception:
+        cache.delete(cache_key)
+        raise
+
+    # Server errors are worth retrying, anything else is the final outcome of this key
+    if response.status_code >= 500 or not hasattr(response, "data"):
+        cache.delete(cache_key)
+    else:
+        record = {"state": DONE, "fingerprint": fingerprint, "status": response.status_code, "data": response.data}
+        cache.set(cache_key, record, timeout=_setting("IDEMPOTENCY_TTL_SECONDS", 86400))
+    return response
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+# Import python standard modules
+from concurrent.futures import ThreadPoolExecutor
+import io, logging, os, posixpath
+
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each derivative
+DERIVATIVE_SIZES = {"thumbnail": 160, "medium": 480, "large": 1080}
+
+# Pillow format and file extension of each derivative encoding
+DERIVATIVE_FORMATS = {"webp": ("WEBP", "webp"), "jpeg": ("JPEG", "jpg")}
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2), thread_name_prefix="image-derivatives"
+)
+
+
+# Return the storage name of one derivative, next to the original in a derivatives/ folder
+def derivative_name(name, size, encoding):
+    folder, filename = posixpath.split(name)
+    stem = os.path.splitext(filename)[0]
+    return posixpath.join(folder, "derivatives", f"{stem}_{size}.{DERIVATIVE_FORMATS[encoding][1]}")
+
+
+# Return the derivative URLs of an image field, {size: {encoding: url}}, or None when there is no image
+def derivative_urls(field_file):
+    if not field_file:
+        return None
+
+    storage = field_file.storage
+    return {
+        size: {encoding: storage.url(derivative_name(field_file.name, size, encoding)) for encoding in DERIVATIVE_FORMATS}
+        for size in DERIVATIVE_SIZES
+    }
+
+
+# Write every derivative of a stored image, the derivatives carry no EXIF metadata
+def generate_derivatives(storage, name):
+    with storage.open(name, "rb") as original:
+        image = Image.open(original)
+        image.load()
+
+    # Apply the camera orientation to the pixels, the EXIF block itself is not copied to the derivatives
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    for size, longest_side in DERIVATIVE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((longest_side, longest_side), Image.LANCZOS)
+
+        for encoding, (image_format, _) in DERIVATIVE_FORMATS.items():
+            frame = resized
+            if image_format == "JPEG" and frame.mode == "RGBA":
+                # JPEG has no alpha channel, flatten onto white
+                frame = Image.new("RGB", resized.size, (255, 255, 255))
+                frame.paste(resized, mask=resized.getchannel("A"))
+
+            buffer = io.BytesIO()
+            if image_format == "JPEG":
+                frame.save(buffer, image_format, quality=82, optimize=True, progressive=True)
+            else:
+                frame.save(buffer, image_format, quality=80, method=4)
+
+            # Overwrite the derivatives of a previous upload with the same name
+            target = derivative_name(name, size, encoding)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def _generate_derivatives_logged(storage, name):
+    try:
+        generate_derivatives(storage, name)
+    except Exception:
+        logger.exception("Could not generate derivatives of %s", name)
+
+
+# Generate the derivatives once the upload is committed, in the thread pool unless IMAGE_DERIVATIVES_ASYNC is off
+def schedule_derivatives(field_file):
+    storage, name = field_file.storage, field_file.name
+
+    # A re-upload of content addressed media already has its derivatives
+    largest = derivative_name(name, list(DERIVATIVE_SIZES)[-1], list(DERIVATIVE_FORMATS)[-1])
+    if storage.exists(largest):
+        return
+
+    def run():
+        if getattr(settings, "IMAGE_DERIVATIVES_ASYNC", True):
+            _executor.submit(_generate_derivatives_logged, storage, name)
+        else:
+            _generate_derivatives_logged(storage, name)
+
+    transaction.on_commit(run)
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+# Import python standard modules
+import datetime, time, uuid
+
+# Import project modules
+from users.authentication import UserClaimsJWTAuthentication
+from users.models import User, RevokedToken
+from users.revocation import revocation_list
+from users.utils import create_access_token, decode_token
+
+
+# Define command that measures the cost of the token revocation check on the authentication path
+class Command(BaseCommand):
+    help = "Benchmark cookie JWT authentication with and without the revocation check"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000, help="Authentications per scenario")
+        parser.add_argument("--revoked", type=int, default=10000, help="Revoked tokens loaded into the deny-list")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+
+        # Run inside a transaction that is rolled back, so nothing is left in the database
+        with transaction.atomic():
+            # An unsaved user is enough, the claims authentication never loads the row
+            user = User(id=0, email="benchmark@example.com", is_verified=True)
+            valid_request = self.make_request(create_access_token(user))
+
+            revoked_token = create_access_token(user)
+            revoked_request = self.make_request(revoked_token)
+            revocation_list.revoke_payload(decode_token(revoked_token))
+            RevokedToken.objects.bulk_create(
+                [RevokedToken(jti=uuid.uuid4().hex, expires_at=timezone.now() + datetime.timedelta(hours=1)) for _ in range(options["revoked"])],
+                batch_size=1000,
+            )
+
+            enabled = revocation_list.enabled
+            try:
+                revocation_list.enabled = False
+                self.report("revocation disabled", valid_request, iterations)
+
+                revocation_list.enabled = True
+                revocation_list.reset()
+                self.report("revocation enabled, valid token", valid_request, iterations)
+                self.report("revocation enabled, revoked token", revoked_request, iterations, expect_failure=True)
+                self.stdout.write(f"Bloom filter hits: {revocation_list.filter_hits}, misses: {revocation_list.filter_misses}")
+            finally:
+                revocation_list.enabled = enabled
+                revocation_list.reset()
+                transaction.set_rollback(True)
+
+    def make_request(self, token):
+        request = RequestFactory().get("/")
+        request.COOKIES["jwt"] = token
+        return request
+
+    def report(self, label, request, iterations, expect_failure=False):
+        authentication = UserClaimsJWTAuthentication()
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            try:
+                authentication.authenticate(request)
+            except Exception:
+                if not expect_failure:
+                    raise
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{label:<36} {elapsed / iterations * 1e6:8.1f} us/auth {iterations / elapsed:10.0f} auths/s"
+        )
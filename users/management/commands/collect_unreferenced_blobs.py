@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+# Import python standard modules
+import datetime
+
+# Import project modules
+from users.models import StoredBlob
+from users.storage import media_storage
+
+
+# Define command that removes content addressed blobs nothing references any more
+class Command(BaseCommand):
+    help = "Delete media blobs whose reference count dropped to zero"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-seconds", type=int, default=3600, help="Keep unreferenced blobs this long, for rolled back or in-flight uploads")
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of blobs removed per transaction")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(seconds=options["grace_seconds"])
+        removed = 0
+
+        while True:
+            with transaction.atomic():
+                # Uploads re-referencing a blob lock the same row, so a blob is never removed while being reused
+                blobs = list(
+                    StoredBlob.objects.select_for_update(skip_locked=True)
+                    .filter(refcount=0, updated_at__lt=cutoff)
+                    .order_by("id")[:options["batch_size"]]
+                )
+                if not blobs:
+                    break
+
+                for blob in blobs:
+                    media_storage.remove_blob(blob.name)
+                StoredBlob.objects.filter(id__in=[blob.id for blob in blobs]).delete()
+                removed += len(blobs)
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} unreferenced blobs"))
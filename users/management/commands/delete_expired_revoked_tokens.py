@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Import project modules
+from users.models import RevokedToken
+from users.utils import delete_in_batches
+
+
+# Define command to sweep revoked tokens that have expired anyway
+class Command(BaseCommand):
+    help = "Delete expired entries from the token revocation list in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows deleted per statement")
+
+    def handle(self, *args, **options):
+        expired_tokens = RevokedToken.objects.filter(expires_at__lte=timezone.now())
+        deleted = delete_in_batches(expired_tokens, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired revoked tokens"))
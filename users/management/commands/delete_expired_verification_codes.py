@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Import project modules
+from users.models import VerificationCode
+from users.utils import delete_in_batches
+
+
+# Define command to sweep expired verification codes in small batches
+class Command(BaseCommand):
+    help = "Delete expired verification codes in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows deleted per statement")
+
+    def handle(self, *args, **options):
+        expired_codes = VerificationCode.objects.filter(expires_at__lte=timezone.now())
+        deleted = delete_in_batches(expired_codes, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired verification codes"))
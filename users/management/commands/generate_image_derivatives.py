@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+# Import project modules
+from users.images import DERIVATIVE_FORMATS, DERIVATIVE_SIZES, derivative_name, generate_derivatives
+from users.signals import IMAGE_FIELDS
+
+
+# Define command to backfill the resized derivatives of images uploaded before the pipeline existed
+class Command(BaseCommand):
+    help = "Generate missing image derivatives for users, vendors and menu items"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate derivatives that already exist")
+
+    def handle(self, *args, **options):
+        generated, failed = 0, 0
+        for model, field in IMAGE_FIELDS.items():
+            names = model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True}).values_list(field, flat=True)
+            storage = model._meta.get_field(field).storage
+
+            for name in names.iterator():
+                last = derivative_name(name, list(DERIVATIVE_SIZES)[-1], list(DERIVATIVE_FORMATS)[-1])
+                if not options["force"] and storage.exists(last):
+                    continue
+
+                try:
+                    generate_derivatives(storage, name)
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{name}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {generated} images, {failed} failed"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Import python standard modules
+import datetime
+
+# Import project modules
+from users.models import OutgoingEmail
+from users.utils import delete_in_batches
+
+
+# Define command to sweep sent and dead-lettered emails from the outbox in small batches
+class Command(BaseCommand):
+    help = "Delete sent and dead-lettered outbox emails in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows deleted per statement")
+        parser.add_argument("--retention-hours", type=int, default=24, help="Hours sent and dead-lettered emails are kept")
+
+    def handle(self, *args, **options):
+        finished_emails = OutgoingEmail.objects.filter(
+            status__in=[OutgoingEmail.SENT, OutgoingEmail.DEAD],
+            created_at__lte=timezone.now() - datetime.timedelta(hours=options["retention_hours"]),
+        )
+        deleted = delete_in_batches(finished_emails, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished outbox emails"))
@@ -0,0 +1,111 @@
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+# Import python standard modules
+import datetime, time
+
+# Import project modules
+from users.models import OutgoingEmail
+
+
+# Define command that drains the email outbox over a single reused SMTP connection per batch
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of emails sent per connection")
+        parser.add_argument("--max-attempts", type=int, default=5, help="Attempts before an email is dead-lettered")
+        parser.add_argument("--backoff", type=int, default=30, help="Base retry delay in seconds, doubled on every attempt")
+        parser.add_argument("--lease", type=int, default=300, help="Seconds a claimed batch is reserved for this worker")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox instead of exiting when it is empty")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep between polls in --loop mode")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.send_batch(options["batch_size"], options["max_attempts"], options["backoff"], options["lease"])
+
+            # Keep going while there is work, otherwise exit or wait for the next poll
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def send_batch(self, batch_size, max_attempts, backoff, lease):
+        started = time.monotonic()
+        emails = self.claim_batch(batch_size, lease)
+        if not emails:
+            return 0
+
+        # Send outside of any transaction, a slow SMTP server holds no row locks
+        sent, retried, dead = 0, 0, 0
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            connection_error = None
+        except Exception as e:
+            connection_error = e
+
+        for email in emails:
+            try:
+                if connection_error is not None:
+                    raise connection_error
+                EmailMessage(email.subject, email.body, email.from_email, [email.to_email], connection=connection).send()
+
+                email.status = OutgoingEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+                email.body = "" # Drop the verification code, only its hash is kept
+                sent += 1
+            except Exception as e:
+                email.last_error = str(e)
+                if email.attempts >= max_attempts:
+                    email.status = OutgoingEmail.DEAD
+                    email.body = ""
+                    dead += 1
+                else:
+                    # Exponential backoff, capped at one hour
+                    delay = min(backoff * 2 ** (email.attempts - 1), 3600)
+                    email.next_attempt_at = timezone.now() + datetime.timedelta(seconds=delay)
+                    retried += 1
+
+            # Record each result on its own, emails sent before a crash are not sent again
+            OutgoingEmail.objects.filter(id=email.id).update(
+                status=email.status,
+                body=email.body,
+                last_error=email.last_error,
+                next_attempt_at=email.next_attempt_at,
+                sent_at=email.sent_at,
+            )
+
+        if connection_error is None:
+            connection.close()
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.stdout.write(
+            f"Processed {len(emails)} emails in {elapsed_ms:.1f} ms: {sent} sent, {retried} retried, {dead} dead-lettered"
+        )
+        return len(emails)
+
+    def claim_batch(self, batch_size, lease):
+        now = timezone.now()
+
+        # A short transaction claims due emails by pushing their next attempt past the lease. Other workers skip
+        # them meanwhile, and emails of a worker that died are picked up again once the lease is over
+        with transaction.atomic():
+            emails = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at", "id")[:batch_size]
+            )
+            if not emails:
+                return []
+
+            # The attempt counts from the claim, so an email that keeps crashing its worker is still dead-lettered
+            for email in emails:
+                email.attempts += 1
+                email.next_attempt_at = now + datetime.timedelta(seconds=lease)
+            OutgoingEmail.objects.bulk_update(emails, ["attempts", "next_attempt_at"])
+        return emails
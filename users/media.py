@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Import python standard modules
+from urllib.parse import quote
+import mimetypes, os, posixpath, re
+
+# Import project modules
+from .storage import BLOB_FOLDER
+
+
+# Content addressed files never change, clients and CDNs may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=3600"
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# Read at most length bytes of a file from start, so a byte range streams without loading it into memory
+class FileRange:
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+# Parse a single "bytes=start-end" range against a file size, returning (start, end) inclusive,
+# None to serve the whole file, or False when the range can't be satisfied
+def parse_range(header, size):
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        # Missing, malformed or multiple ranges, the whole file is a valid answer
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range, the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+# Define view to serve uploaded media, through the front server when MEDIA_SENDFILE_BACKEND is set
+@require_safe
+def serve_media(request, path):
+    # Temporary uploads of the content addressed storage are never served
+    if any(part.startswith(".") for part in path.split("/")):
+        raise Http404("Not found")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    immutable = posixpath.normpath(path).startswith(f"{BLOB_FOLDER}/")
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL
+    last_modified = http_date(stat.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    # Files only change by being replaced, so the modification time is enough to revalidate
+    if_modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    if if_modified_since is not None and int(stat.st_mtime) <= if_modified_since:
+        response = HttpResponseNotModified()
+        response["Cache-Control"] = cache_control
+        return response
+
+    backend = getattr(settings, "MEDIA_SENDFILE_BACKEND", "")
+    if backend:
+        # Hand the file to the front server, it handles ranges and streams without holding a worker
+        response = HttpResponse(content_type=content_type)
+        if backend == "nginx":
+            response["X-Accel-Redirect"] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + path)
+        else:
+            response["X-Sendfile"] = full_path
+    else:
+        response = file_response(request, full_path, stat.st_size, content_type, last_modified)
+
+    response["Cache-Control"] = cache_control
+    response["Last-Modified"] = last_modified
+    return response
+
+
+# Stream a file, or the requested byte range of it, in the application server
+def file_response(request, full_path, size, content_type, last_modified):
+    byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+
+    # A Range with If-Range is only honoured when the client holds the current version
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != last_modified:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        # The WSGI server can use sendfile for whole files
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(open(full_path, "rb"), start, end - start + 1), content_type=content_type, status=206)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_remove_orderitem_item_remove_orderitem_order_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='hashed_verification_code',
+        ),
+        migrations.CreateModel(
+            name='VerificationCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_type', models.CharField(choices=[('user', 'User'), ('vendor', 'Vendor')], max_length=10)),
+                ('email', models.EmailField(max_length=254)),
+                ('hashed_code', models.CharField(max_length=64)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account_type', 'hashed_code'], name='verification_code_lookup_idx'), models.Index(fields=['expires_at'], name='verification_code_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='verificationcode',
+            constraint=models.UniqueConstraint(fields=('account_type', 'email'), name='unique_verification_code_per_account'),
+        ),
+    ]
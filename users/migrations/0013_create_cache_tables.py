@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:10
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+# Create the tables of the database caches in CACHES (the "shared" cache by default), existing ones are kept.
+# Deployments that point the shared cache at Redis or Memcached have none to create
+def create_cache_tables(apps, schema_editor):
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
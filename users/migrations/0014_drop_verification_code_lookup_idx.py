@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_create_cache_tables'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='verificationcode',
+            name='verification_code_lookup_idx',
+        ),
+    ]
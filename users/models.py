@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser 
 from phonenumbers import parse
 from .managers import UserManager
+from .geo import grid_cell
+from .storage import media_storage
 from vendors.models import *
 from django.utils import timezone
 
@@ -10,6 +12,15 @@ class Address(models.Model):
     street = models.CharField(max_length=255)
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=50)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Grid cell of the coordinates, see users.geo
+    grid_cell = models.CharField(max_length=32, null=True, blank=True, editable=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.grid_cell = grid_cell(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
 
 # Define User model
 class User(AbstractUser):
@@ -17,11 +28,11 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, unique=True, null=True, blank=True)
-    hashed_verification_code = models.CharField(max_length=200, null=True, blank=True)
     is_verified = models.BooleanField(default=False)
     is_login = models.BooleanField(default=False)
     address = models.OneToOneField(Address, on_delete=models.CASCADE, null=True, blank=True, default=None)
-    profile_image = models.ImageField(upload_to="user_images/", null=True, blank=True)
+    profile_image = models.ImageField(upload_to="user_images/", storage=media_storage, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
   
   
 
@@ -56,3 +67,77 @@ class User(AbstractUser):
         super().save(*args, **kwargs)
 
 
+# Define VerificationCode model, one pending code per user or vendor email
+class VerificationCode(models.Model):
+    USER = "user"
+    VENDOR = "vendor"
+    ACCOUNT_TYPE_CHOICES = [
+        (USER, "User"),
+        (VENDOR, "Vendor"),
+    ]
+
+    account_type = models.CharField(max_length=10, choices=ACCOUNT_TYPE_CHOICES)
+    email = models.EmailField()
+    hashed_code = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["account_type", "email"], name="unique_verification_code_per_account"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="verification_code_expiry_idx"),
+        ]
+
+
+# Define OutgoingEmail model, an outbox drained by the send_outbox_emails command
+class OutgoingEmail(models.Model):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.EmailField()
+    to_email = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outgoing_email_queue_idx"),
+        ]
+
+
+# Define RevokedToken model, the deny-list of logged out token ids (jti)
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now)
+
+
+
+# Define StoredBlob model, the reference count of a content addressed media file (see users.storage)
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Let the sweep find unreferenced blobs past their grace period
+            models.Index(fields=["refcount", "updated_at"], name="stored_blob_unreferenced_idx"),
+        ]
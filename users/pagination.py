@@ -0,0 +1,177 @@
+# Import third party modules
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.conf import settings
+from django.db.models import Q
+
+# Import python standard modules
+from decimal import Decimal
+import base64, binascii, datetime, json
+
+
+# Define keyset (cursor) pagination, pages are found with an indexed range condition instead of an OFFSET
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def __init__(self, ordering=("id",)):
+        # The last ordering field must be unique (usually "id") so every row has a distinct position
+        self.ordering = ordering
+        self.page_size = getattr(settings, "KEYSET_PAGE_SIZE", 20)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, backwards = self.decode_cursor(request)
+
+        # Walk the index in reverse to fetch the page before the cursor
+        ordering = [self.reverse_field(field) for field in self.ordering] if backwards else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        # Fetch one extra row to know whether there is another page
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        self.has_next = has_more if not backwards else position is not None
+        self.has_previous = has_more if backwards else position is not None
+        self.rows = rows
+        return rows
+
+    def paginate_list(self, items, request, view=None):
+        # The same pages over objects already in memory (e.g. a cart from the cache), with the same cursors
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, backwards = self.decode_cursor(request)
+
+        ordering = [self.reverse_field(field) for field in self.ordering] if backwards else list(self.ordering)
+        items = sorted(items, key=lambda item: self.sort_key(item, ordering))
+        if position is not None:
+            items = [item for item in items if self.is_after(item, ordering, position)]
+
+        rows = items[:page_size]
+        has_more = len(items) > page_size
+        if backwards:
+            rows.reverse()
+
+        self.has_next = has_more if not backwards else position is not None
+        self.has_previous = has_more if backwards else position is not None
+        self.rows = rows
+        return rows
+
+    def sort_key(self, item, ordering):
+        # Descending fields are sorted through a wrapper that inverts the comparison
+        return tuple(
+            Descending(getattr(item, field[1:])) if field.startswith("-") else getattr(item, field)
+            for field in ordering
+        )
+
+    def is_after(self, item, ordering, position):
+        for field, encoded in zip(ordering, position):
+            value = getattr(item, field.lstrip("-"))
+            cursor_value = self.decode_value(encoded, value)
+            if value != cursor_value:
+                return value < cursor_value if field.startswith("-") else value > cursor_value
+        return False
+
+    def decode_value(self, encoded, like):
+        # Cursor values are JSON, bring them back to the type of the field they are compared with
+        try:
+            if isinstance(like, datetime.datetime):
+                return datetime.datetime.fromisoformat(encoded)
+            if isinstance(like, datetime.date):
+                return datetime.date.fromisoformat(encoded)
+            if isinstance(like, Decimal):
+                return Decimal(encoded)
+        except (TypeError, ValueError, ArithmeticError):
+            raise NotFound("Invalid cursor")
+        return encoded
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.build_link(self.rows[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.rows:
+            return None
+        return self.build_link(self.rows[0], backwards=True)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def build_link(self, row, backwards):
+        position = [getattr(row, field.lstrip("-")) for field in self.ordering]
+        cursor = json.dumps({"p": position, "b": backwards}, default=self.encode_value, separators=(",", ":"))
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def encode_value(self, value):
+        # Keep full precision (DjangoJSONEncoder truncates microseconds) so positions compare exactly
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, backwards = cursor["p"], bool(cursor["b"])
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor")
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound("Invalid cursor")
+        return position, backwards
+
+    def reverse_field(self, field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def after(self, ordering, position):
+        # (a, b, c) > (x, y, z) is written as a >= x AND (a > x OR (b >= y AND (b > y OR c > z)))
+        # so the leading column stays a plain index range condition
+        condition = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            strictly_after = Q(**{f"{name}__{lookup}": value})
+            if condition is None:
+                condition = strictly_after
+            else:
+                condition = Q(**{f"{name}__{lookup}e": value}) & (strictly_after | condition)
+        return condition
+
+
+# Invert the ordering of a value, for sorting lists by descending fields
+class Descending:
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return self.value > other.value
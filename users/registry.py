@@ -0,0 +1,90 @@
+from django.apps import apps
+
+# Import python standard modules
+import threading, time
+
+
+# Define a per-process registry of a small, rarely changing table (order statuses, food categories), so lookups
+# by id or name are dict hits. It loads on first use, is invalidated by the model's save/delete signals in this
+# process and reloads every refresh_interval seconds to pick up changes made by other processes. A key it doesn't
+# know reloads it at most once every miss_reload_interval seconds, so unknown ids sent by clients cost no queries.
+# The instances are shared between requests and must not be modified.
+class ModelRegistry:
+    def __init__(self, model_label, refresh_interval, miss_reload_interval=5):
+        self.model_label = model_label
+        self.refresh_interval = refresh_interval
+        self.miss_reload_interval = miss_reload_interval
+        self._tables = None # (by id, by name)
+        self._loaded_at = 0
+        self._miss_reloaded_at = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def tables(self, reload=False):
+        tables = self._tables
+        if reload or tables is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            tables = self.load(tables if reload else None)
+        return tables
+
+    def load(self, stale=None):
+        with self._lock:
+            # Another thread may have loaded the table while we waited for the lock
+            tables = self._tables
+            if tables is not None and tables is not stale and time.monotonic() - self._loaded_at <= self.refresh_interval:
+                return tables
+
+            by_id, by_name = {}, {}
+            for row in self.model.objects.order_by("id"):
+                by_id[row.id] = row
+                by_name.setdefault(row.name, row)
+
+            self._tables = (by_id, by_name)
+            self._loaded_at = time.monotonic()
+            return self._tables
+
+    def lookup(self, index, key):
+        row = self.tables()[index].get(key)
+        if row is None and self.may_reload_on_miss():
+            # Maybe added by another process since the last load, look once more in a fresh copy
+            row = self.tables(reload=True)[index].get(key)
+        if row is None:
+            raise self.model.DoesNotExist(f"{self.model.__name__} {key!r} does not exist")
+        return row
+
+    def may_reload_on_miss(self):
+        # Misses within miss_reload_interval of the last reload they caused are not found without a query
+        with self._lock:
+            now = time.monotonic()
+            if self._miss_reloaded_at is not None and now - self._miss_reloaded_at < self.miss_reload_interval:
+                return False
+            self._miss_reloaded_at = now
+            return True
+
+    def get(self, pk):
+        # Accepts ids from request data, which may be strings. Raises DoesNotExist like the manager's get()
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise self.model.DoesNotExist(f"{self.model.__name__} {pk!r} does not exist")
+        return self.lookup(0, pk)
+
+    def named(self, name):
+        return self.lookup(1, name)
+
+    def all(self):
+        return list(self.tables()[0].values())
+
+    def sync(self, version):
+        # Reload when a change check of the caller (e.g. the latest updated_at and the row count) moved
+        if version != self._version:
+            self.invalidate()
+            self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._tables = None
+            self._loaded_at = 0
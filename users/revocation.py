@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+# Import python standard modules
+import datetime, hashlib, math, threading, time
+import jwt
+
+# Import project modules
+from .models import RevokedToken
+from .utils import decode_token
+
+
+# Define a fixed size Bloom filter over strings
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        # Standard sizing: m = -n ln(p) / ln(2)^2 bits and k = m/n ln(2) hash functions
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing, derive k positions from two 64 bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+# Define the token revocation list, a RevokedToken table fronted by a per-process Bloom filter
+class RevocationList:
+    def __init__(self, enabled, capacity, error_rate, rebuild_interval):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.filter_hits = 0
+        self.filter_misses = 0
+        self._filter = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            pass # Already revoked
+
+        # Update this process right away, other processes pick it up on their next rebuild
+        if self._filter is not None:
+            self._filter.add(jti)
+
+    def revoke_payload(self, payload):
+        expires_at = datetime.datetime.fromtimestamp(payload["exp"], tz=datetime.timezone.utc)
+        self.revoke(payload["jti"], expires_at)
+
+    def is_revoked(self, jti):
+        if not self.enabled:
+            return False
+
+        if self._filter is None or time.monotonic() - self._built_at > self.rebuild_interval:
+            self.rebuild()
+
+        # Most tokens are not in the filter and are cleared without touching the database
+        if jti not in self._filter:
+            self.filter_misses += 1
+            return False
+
+        self.filter_hits += 1
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+    def rebuild(self):
+        with self._lock:
+            # Another thread may have rebuilt the filter while we waited for the lock
+            if self._filter is not None and time.monotonic() - self._built_at <= self.rebuild_interval:
+                return
+
+            bloom_filter = BloomFilter(self.capacity, self.error_rate)
+            revoked = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list("jti", flat=True)
+            for jti in revoked.iterator(chunk_size=2000):
+                bloom_filter.add(jti)
+
+            self._filter = bloom_filter
+            self._built_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._built_at = 0
+            self.filter_hits = 0
+            self.filter_misses = 0
+
+
+revocation_list = RevocationList(
+    enabled=getattr(settings, "TOKEN_REVOCATION_ENABLED", True),
+    capacity=getattr(settings, "TOKEN_REVOCATION_FILTER_CAPACITY", 100000),
+    error_rate=getattr(settings, "TOKEN_REVOCATION_FILTER_ERROR_RATE", 0.001),
+    rebuild_interval=getattr(settings, "TOKEN_REVOCATION_FILTER_REBUILD_SECONDS", 60),
+)
+
+
+# Revoke the access token of an authenticated request and the refresh token from its cookie
+def revoke_request_tokens(request):
+    revocation_list.revoke_payload(request.auth)
+
+    refresh_token = request.COOKIES.get("refresh_jwt")
+    if refresh_token:
+        try:
+            revocation_list.revoke_payload(decode_token(refresh_token, token_type="refresh"))
+        except jwt.InvalidTokenError:
+            pass # Expired or forged refresh tokens are already unusable
@@ -1,19 +1,43 @@
 from rest_framework import serializers
 from .models import User, Address
 from vendors.serializers import MenuSerializer
+from .images import derivative_urls
 
 # Define serializer for Address
 class AddressSerializer(serializers.ModelSerializer):
     class Meta:
         model = Address
-        fields = ["id", "street", "city", "state"]
+        fields = ["id", "street", "city", "state", "latitude", "longitude"]
+
+
+# Define serializer for optional coordinates, both or neither must be given
+class CoordinatesSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False)
+
+    def validate(self, data):
+        if ("latitude" in data) != ("longitude" in data):
+            raise serializers.ValidationError("latitude and longitude must be given together")
+        return data
+
+
+# Define serializer for the nearest vendors search
+class NearestVendorsSerializer(CoordinatesSerializer):
+    radius = serializers.FloatField(min_value=0.1, max_value=50, default=5)
+    k = serializers.IntegerField(min_value=1, max_value=50, required=False)
 
 
 # Define serializer for User
 class UserSerializer(serializers.ModelSerializer):
+    profile_images = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ["id", "last_name", "first_name", "email", "phone_number"]
+        fields = ["id", "last_name", "first_name", "email", "phone_number", "profile_images"]
+
+    # Resized derivatives of the profile image
+    def get_profile_images(self, instance):
+        return derivative_urls(instance.profile_image)
 
 
     # Method to create a new user based on the validated data
@@ -0,0 +1,69 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+# Import project modules
+from .authentication import principal_cache
+from .images import schedule_derivatives
+from .models import User
+from vendors.models import Vendor, Menu
+
+
+# Drop cached principals whenever the underlying user or vendor row changes
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    principal_cache.invalidate(instance)
+
+
+# Image field of each model whose uploads get resized derivatives
+IMAGE_FIELDS = {User: "profile_image", Vendor: "image", Menu: "image"}
+
+
+# Remember whether this save stores a new upload, and which image it replaces.
+# The file is only committed to storage during the save.
+def note_new_image(sender, instance, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    if field in instance.get_deferred_fields():
+        return
+
+    image = getattr(instance, field)
+    instance._new_image = bool(image) and not image._committed
+    if instance._new_image and instance.pk:
+        instance._replaced_image = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+def generate_image_derivatives(sender, instance, **kwargs):
+    if not getattr(instance, "_new_image", False):
+        return
+
+    image = getattr(instance, IMAGE_FIELDS[sender])
+    instance._new_image = False
+    # The row now stores the upload, reference it in the same transaction, see users.storage
+    image.storage.reference(image.name)
+    schedule_derivatives(image)
+
+    # Release the reference to the replaced image, see users.storage
+    replaced = getattr(instance, "_replaced_image", None)
+    instance._replaced_image = None
+    if replaced and replaced != image.name:
+        image.storage.delete(replaced)
+
+
+# Read the image name while the row still exists, deferred fields can't be loaded after the delete
+def note_deleted_image(sender, instance, **kwargs):
+    instance._deleted_image = getattr(instance, IMAGE_FIELDS[sender]).name
+
+
+def release_deleted_image(sender, instance, **kwargs):
+    name = getattr(instance, "_deleted_image", None)
+    if name:
+        sender._meta.get_field(IMAGE_FIELDS[sender]).storage.delete(name)
+
+
+for model in IMAGE_FIELDS:
+    pre_save.connect(note_new_image, sender=model)
+    post_save.connect(generate_image_derivatives, sender=model)
+    pre_delete.connect(note_deleted_image, sender=model)
+    post_delete.connect(release_deleted_image, sender=model)
@@ -0,0 +1,109 @@
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# Import python standard modules
+import hashlib, os, posixpath, tempfile
+
+# Import project modules
+from .images import DERIVATIVE_FORMATS, DERIVATIVE_SIZES, derivative_name
+
+
+# Folder holding the content addressed blobs, fanned out on the first digest byte
+BLOB_FOLDER = "blobs"
+
+
+# Define a content addressed storage, every distinct upload is stored once under its SHA-256 digest and
+# reference counted in StoredBlob. delete() only drops a reference, unreferenced blobs are removed by the
+# collect_unreferenced_blobs command once their grace period is over.
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def is_derivative(self, name):
+        # Derivatives are named after their blob, so they are already content addressed
+        return posixpath.basename(posixpath.dirname(name)) == "derivatives"
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_derivative(name):
+            return super().get_available_name(name, max_length)
+        # The final name is the digest, chosen in _save
+        return name
+
+    def _save(self, name, content):
+        if self.is_derivative(name):
+            return super()._save(name, content)
+
+        # Hash the upload while copying it chunk by chunk to a temporary file on the same filesystem
+        os.makedirs(self.location, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.location, prefix=".upload-")
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(descriptor, "wb") as temporary:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temporary.write(chunk)
+                    size += len(chunk)
+
+            hexdigest = digest.hexdigest()
+            extension = os.path.splitext(name)[1].lower()
+            blob_name = posixpath.join(BLOB_FOLDER, hexdigest[:2], f"{hexdigest}{extension}")
+
+            # Register the blob first, the row lock and its fresh grace period keep the sweep from removing it
+            # under us. The reference itself is taken by the model save storing the name, in its transaction
+            # (see users.signals), so a blob whose save fails or rolls back is left to the sweep
+            with transaction.atomic():
+                self.register(blob_name, size)
+                path = self.path(blob_name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # Atomic, a concurrent upload of the same content writes identical bytes
+                    os.replace(temporary_path, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+        return blob_name
+
+    def register(self, name, size):
+        StoredBlob = apps.get_model("users", "StoredBlob")
+        if StoredBlob.objects.filter(name=name).update(updated_at=timezone.now()):
+            return
+
+        try:
+            with transaction.atomic():
+                StoredBlob.objects.create(name=name, size=size)
+        except IntegrityError:
+            # Another upload of the same content created the row first
+            StoredBlob.objects.filter(name=name).update(updated_at=timezone.now())
+
+    def reference(self, name):
+        # Take a reference to a registered blob, called by the model save that stores the name
+        if self.is_derivative(name):
+            return
+        StoredBlob = apps.get_model("users", "StoredBlob")
+        StoredBlob.objects.filter(name=name).update(refcount=F("refcount") + 1)
+
+    def delete(self, name):
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        if self.is_derivative(name):
+            return super().delete(name)
+
+        # Drop one reference, files uploaded before content addressing have no row and are left alone
+        StoredBlob = apps.get_model("users", "StoredBlob")
+        StoredBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F("refcount") - 1)
+
+    def remove_blob(self, name):
+        # Remove a blob and its derivatives from disk, only called by the sweep under the row lock
+        for size in DERIVATIVE_SIZES:
+            for encoding in DERIVATIVE_FORMATS:
+                super().delete(derivative_name(name, size, encoding))
+        super().delete(name)
+
+
+media_storage = ContentAddressedStorage()
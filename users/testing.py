@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+# Import python standard modules
+from contextlib import ContextDecorator
+
+
+# Define a query budget, usable as a context manager or decorator, that fails when a block runs more queries than declared
+class query_budget(ContextDecorator):
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(self.context.captured_queries, start=1))
+            raise AssertionError(f"{executed} queries executed, budget is {self.max_queries}\n{queries}")
+        return False
+
+
+# Define a context manager that fails when a block runs any query besides those of the database cache, so cache
+# hits count as free whether the shared cache is the database cache or Redis/Memcached
+class cache_queries_only(ContextDecorator):
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+
+        cache_tables = [cache["LOCATION"] for cache in settings.CACHES.values() if cache["BACKEND"].endswith("DatabaseCache")]
+        queries = [
+            query["sql"] for query in self.context.captured_queries
+            if not any(table in query["sql"] for table in cache_tables)
+            # The database cache writes in savepoints of its own
+            and not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))
+        ]
+        if queries:
+            raise AssertionError("Queries executed outside the cache:\n" + "\n".join(queries))
+        return False
@@ -1,3 +1,612 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 # Create your tests here.
+from rest_framework.test import APIClient
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+# Import python standard modules
+from io import BytesIO, StringIO
+import datetime, random, shutil, tempfile
+
+# Import project modules
+from .authentication import principal_cache
+from .models import User, VerificationCode, OutgoingEmail, RevokedToken, StoredBlob
+from .revocation import BloomFilter, revocation_list
+from .testing import query_budget, cache_queries_only
+from .geo import haversine, nearest
+from .images import DERIVATIVE_SIZES, derivative_name
+from .storage import media_storage
+from PIL import Image
+from vendors.models import Location
+from vendors.models import Vendor, Category, Menu
+from .utils import *
+
+
+# Create a user and an API client carrying that user's JWT cookie
+def make_user_client(email="user@example.com", phone_number="+2348012345678"):
+    user = User.objects.create_user(email, phone_number=phone_number, first_name="Ada", last_name="Obi")
+    client = APIClient()
+    client.cookies["jwt"] = create_access_token(user)
+    return user, client
+
+
+class JWTCookieAuthenticationTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.user, self.client = make_user_client()
+
+    def test_missing_cookie_is_unauthenticated(self):
+        response = APIClient().get("/api/user/user_profile/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        client = APIClient()
+        client.cookies["jwt"] = "not-a-token"
+        response = client.get("/api/user/user_profile/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_cached_principal_skips_database(self):
+        self.client.get("/api/user/user_profile/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/user/user_profile/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(principal_cache.stats()["hits"], 1)
+
+    def test_saving_user_invalidates_cached_principal(self):
+        self.client.get("/api/user/user_profile/")
+        self.client.put("/api/user/update_name/", {"first_name": "Chi"}, format="json")
+
+        response = self.client.get("/api/user/user_profile/")
+        self.assertEqual(response.data["user"]["first_name"], "Chi")
+
+
+class VerificationCodeTests(TestCase):
+    def setUp(self):
+        self.user, _ = make_user_client()
+
+    def test_code_is_single_use(self):
+        code = issue_verification_code(VerificationCode.USER, self.user.email)
+        client = APIClient()
+
+        data = {"verification_code": code, "email": self.user.email}
+        response = client.post("/api/user/user_verification/", data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("jwt", response.cookies)
+
+        response = client.post("/api/user/user_verification/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_code_without_email_is_rejected(self):
+        code = issue_verification_code(VerificationCode.USER, self.user.email)
+
+        response = APIClient().post("/api/user/user_verification/", {"verification_code": code}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(check_verification_code(VerificationCode.USER, code, None))
+        self.assertTrue(VerificationCode.objects.filter(email=self.user.email).exists())
+
+    def test_code_is_burnt_after_too_many_attempts(self):
+        code = issue_verification_code(VerificationCode.USER, self.user.email)
+        wrong_code = "0000" if code != "0000" else "0001"
+
+        for _ in range(VERIFICATION_CODE_MAX_ATTEMPTS):
+            self.assertIsNone(check_verification_code(VerificationCode.USER, wrong_code, self.user.email))
+
+        self.assertIsNone(check_verification_code(VerificationCode.USER, code, self.user.email))
+
+    def test_expired_codes_are_swept(self):
+        issue_verification_code(VerificationCode.USER, self.user.email)
+        issue_verification_code(VerificationCode.USER, "other@example.com")
+        VerificationCode.objects.filter(email=self.user.email).update(expires_at=timezone.now())
+
+        call_command("delete_expired_verification_codes", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(VerificationCode.objects.values_list("email", flat=True)), ["other@example.com"])
+
+
+# Email backend that always fails, used to exercise retries and dead-lettering
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+# Email backend that records the outbox row of every message as the worker left it when sending
+class InspectingEmailBackend(BaseEmailBackend):
+    seen = []
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            InspectingEmailBackend.seen.append(OutgoingEmail.objects.values("attempts", "next_attempt_at").get(to_email=message.to[0]))
+        return len(email_messages)
+
+
+class EmailOutboxTests(TestCase):
+    def test_login_queues_email_instead_of_sending(self):
+        user, _ = make_user_client()
+
+        response = APIClient().post("/api/user/login/", {"email": user.email}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().to_email, user.email)
+
+    def test_worker_delivers_queued_emails_in_batches(self):
+        for i in range(5):
+            send_verification_email(f"user{i}@example.com", "1234")
+
+        call_command("send_outbox_emails", batch_size=2, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.SENT).count(), 5)
+        self.assertFalse(OutgoingEmail.objects.exclude(body="").exists())
+
+    @override_settings(EMAIL_BACKEND="users.tests.InspectingEmailBackend")
+    def test_emails_are_claimed_before_they_are_sent(self):
+        InspectingEmailBackend.seen = []
+        send_verification_email("user@example.com", "1234")
+
+        call_command("send_outbox_emails", lease=600, stdout=StringIO())
+
+        # Claimed and leased first, so other workers skip the row while it is sent without holding a lock
+        (row,) = InspectingEmailBackend.seen
+        self.assertEqual(row["attempts"], 1)
+        self.assertGreater(row["next_attempt_at"], timezone.now() + datetime.timedelta(seconds=500))
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    @override_settings(EMAIL_BACKEND="users.tests.FailingEmailBackend")
+    def test_failed_emails_are_retried_then_dead_lettered(self):
+        send_verification_email("user@example.com", "1234")
+
+        call_command("send_outbox_emails", max_attempts=2, stdout=StringIO())
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        call_command("send_outbox_emails", max_attempts=2, stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.DEAD, 2))
+        self.assertIn("SMTP server unavailable", email.last_error)
+        self.assertEqual(email.body, "")
+
+    def test_finished_emails_are_purged(self):
+        send_verification_email("sent@example.com", "1234")
+        send_verification_email("dead@example.com", "1234")
+        send_verification_email("pending@example.com", "1234")
+        send_verification_email("recent@example.com", "1234")
+        OutgoingEmail.objects.filter(to_email="sent@example.com").update(status=OutgoingEmail.SENT)
+        OutgoingEmail.objects.filter(to_email__in=["dead@example.com", "recent@example.com"]).update(status=OutgoingEmail.DEAD)
+        OutgoingEmail.objects.exclude(to_email="recent@example.com").update(created_at=timezone.now() - datetime.timedelta(days=2))
+
+        call_command("purge_outbox_emails", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(OutgoingEmail.objects.values_list("to_email", flat=True)), ["pending@example.com", "recent@example.com"]
+        )
+
+
+class AccessTokenTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.user, self.client = make_user_client()
+
+    def test_expired_access_token_is_rejected(self):
+        self.client.cookies["jwt"] = create_token(self.user, "access", -1)
+        response = self.client.get("/api/user/user_profile/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_token_is_rejected_by_vendor_endpoints(self):
+        response = self.client.get("/api/order/vendor_orders/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_token_is_not_an_access_token(self):
+        self.client.cookies["jwt"] = create_refresh_token(self.user)
+        response = self.client.get("/api/user/user_profile/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_issues_new_access_token(self):
+        client = APIClient()
+        client.cookies["refresh_jwt"] = create_refresh_token(self.user)
+
+        response = client.post("/api/user/token_refresh/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_token(response.cookies["jwt"].value)["id"], self.user.id)
+
+    def test_claims_endpoints_do_not_query_the_database_for_the_principal(self):
+        revocation_list.reset()
+        revocation_list.rebuild()
+
+        # The category change check and the category list, the principal comes from the token
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/user/categories/")
+        self.assertEqual(response.status_code, 200)
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        revocation_list.reset()
+        self.user, self.client = make_user_client()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+        values = [f"token-{i}" for i in range(1000)]
+        for value in values:
+            bloom_filter.add(value)
+
+        self.assertTrue(all(value in bloom_filter for value in values))
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        access_token = self.client.cookies["jwt"].value
+        refresh_token = create_refresh_token(self.user)
+        self.client.cookies["refresh_jwt"] = refresh_token
+
+        response = self.client.post("/api/user/logout/")
+        self.assertEqual(response.status_code, 200)
+
+        # Replay the tokens the client held before logging out
+        replay = APIClient()
+        replay.cookies["jwt"] = access_token
+        replay.cookies["refresh_jwt"] = refresh_token
+        self.assertEqual(replay.get("/api/user/user_profile/").status_code, 401)
+        self.assertEqual(replay.post("/api/user/token_refresh/").status_code, 401)
+
+    def test_unrevoked_tokens_are_cleared_by_the_filter(self):
+        self.client.get("/api/user/categories/")
+        self.assertEqual(revocation_list.filter_hits, 0)
+        self.assertEqual(revocation_list.filter_misses, 1)
+
+    def test_benchmark_runs(self):
+        output = StringIO()
+        call_command("benchmark_auth", iterations=10, revoked=10, stdout=output)
+        self.assertIn("revocation disabled", output.getvalue())
+        self.assertFalse(RevokedToken.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user, self.client = make_user_client()
+        self.vendor = Vendor.objects.create(name="Mama Put", description="Local dishes", email="mama@example.com", contact_info="+2348098765432")
+        category = Category.objects.create(name="Soups", description="Soups")
+        # Duplicate names make the id tie-breaker matter
+        for i in range(7):
+            Menu.objects.create(vendor=self.vendor, category=category, name=f"Dish {i % 3}", description="", price=1000 + i)
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data[link]
+        return ids, response
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(Menu.objects.order_by("name", "id").values_list("id", flat=True))
+
+        ids, last_page = self.walk(f"/api/user/vendor_menu/{self.vendor.id}/?page_size=3", "next")
+        self.assertEqual(ids, expected)
+
+        # Walking back from the last page yields the earlier pages
+        previous_ids, _ = self.walk(last_page.data["previous"], "previous")
+        self.assertEqual(sorted(previous_ids), sorted(expected[:6]))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(f"/api/user/vendor_menu/{self.vendor.id}/?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        revocation_list.reset()
+        revocation_list.rebuild()
+        self.user, self.client = make_user_client()
+
+    def create_vendors(self, count):
+        for i in range(Vendor.objects.count(), count):
+            vendor = Vendor.objects.create(
+                name=f"Vendor {i}", description="", email=f"vendor{i}@example.com", contact_info=f"+23480123000{i:02d}",
+                is_active=True, is_login=True,
+            )
+            vendor.add_location(f"{i} Allen Avenue", "Ikeja", "Lagos")
+            vendor.add_location(f"{i} Awolowo Road", "Ikoyi", "Lagos")
+
+    def test_budget_fails_when_exceeded(self):
+        with self.assertRaises(AssertionError):
+            with query_budget(0):
+                User.objects.count()
+
+    def test_vendor_list_query_count_does_not_grow_with_rows(self):
+        # Vendors with their nested locations, in two queries however many vendors are listed
+        for count in (1, 10):
+            self.create_vendors(count)
+            with query_budget(2):
+                response = self.client.get("/api/user/list_vendors/")
+            self.assertEqual(len(response.data["results"]), count)
+            self.assertEqual(len(response.data["results"][0]["locations"]), 2)
+
+
+class NearestVendorsTests(TestCase):
+    def setUp(self):
+        self.user, self.client = make_user_client()
+
+    def add_vendor(self, name, latitude, longitude, is_active=True):
+        vendor = Vendor.objects.create(
+            name=name, description="", email=f"{name.lower()}@example.com", is_active=is_active,
+            contact_info=f"+234801230{Vendor.objects.count():04d}",
+        )
+        Location.objects.create(vendor=vendor, street=f"{name} street", city="Lagos", state="Lagos", latitude=latitude, longitude=longitude)
+        return vendor
+
+    def test_haversine(self):
+        # Lagos to Abuja is about 525 km
+        self.assertAlmostEqual(haversine(6.5244, 3.3792, 9.0765, 7.3986), 525, delta=5)
+
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(7)
+        for i in range(60):
+            self.add_vendor(f"Vendor{i}", 6.4 + rng.random() * 0.4, 3.2 + rng.random() * 0.4)
+        locations = Location.objects.all()
+        expected = sorted((haversine(6.6, 3.4, location.latitude, location.longitude), location.id) for location in locations)
+
+        within_radius = nearest(locations, 6.6, 3.4, radius_km=10)
+        self.assertEqual([row.id for _, row in within_radius], [id for distance, id in expected if distance <= 10])
+
+        k_nearest = nearest(locations, 6.6, 3.4, radius_km=50, k=5)
+        self.assertEqual([row.id for _, row in k_nearest], [id for _, id in expected[:5]])
+
+    def test_endpoint_returns_active_vendors_nearest_first(self):
+        far = self.add_vendor("Far", 6.60, 3.45)
+        near = self.add_vendor("Near", 6.60, 3.41)
+        self.add_vendor("Closed", 6.60, 3.40, is_active=False)
+        self.add_vendor("Abuja", 9.07, 7.39)
+
+        response = self.client.get("/api/user/nearest_vendors/", {"latitude": 6.6, "longitude": 3.4, "k": 5, "radius": 20})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([vendor["id"] for vendor in response.data], [near.id, far.id])
+        self.assertLess(response.data[0]["distance_km"], 2)
+
+    def test_endpoint_uses_the_user_address(self):
+        vendor = self.add_vendor("Near", 6.60, 3.41)
+        self.client.put("/api/user/update_address/", {"street": "1 Marina", "city": "Lagos", "state": "Lagos", "latitude": 6.6, "longitude": 3.4}, format="json")
+
+        response = self.client.get("/api/user/nearest_vendors/")
+        self.assertEqual([vendor["id"] for vendor in response.data], [vendor.id])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        revocation_list.reset()
+        revocation_list.rebuild()
+        self.user, self.client = make_user_client()
+        self.category = Category.objects.create(name="Soups", description="")
+
+    def test_unchanged_categories_are_not_modified(self):
+        response = self.client.get("/api/user/categories/")
+        etag = response["ETag"]
+
+        # Only the change check runs, nothing is serialized
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/user/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.category.name = "Stews"
+        self.category.save()
+        response = self.client.get("/api/user/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_category_list_is_served_from_the_registry(self):
+        self.client.get("/api/user/categories/")
+
+        # Only the change check runs, the categories are in memory
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/user/categories/")
+        self.assertEqual([category["name"] for category in response.data], ["Soups"])
+
+        # Changes made behind the signals' back (another process) are caught by the change check
+        Category.objects.bulk_create([Category(name="Rice", description="")])
+        response = self.client.get("/api/user/categories/")
+        self.assertEqual([category["name"] for category in response.data], ["Soups", "Rice"])
+
+    def test_deleted_category_changes_the_etag(self):
+        Category.objects.create(name="Rice", description="")
+        etag = self.client.get("/api/user/categories/")["ETag"]
+
+        self.category.delete()
+        response = self.client.get("/api/user/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_honours_if_modified_since(self):
+        response = self.client.get("/api/user/user_profile/")
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get("/api/user/user_profile/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vendor_menu_is_not_modified_until_the_menu_changes(self):
+        vendor = Vendor.objects.create(name="Mama Put", description="", email="mama@example.com", contact_info="+2348098765432")
+        item = Menu.objects.create(vendor=vendor, category=self.category, name="Egusi", description="", price=3000)
+        url = f"/api/user/vendor_menu/{vendor.id}/"
+        etag = self.client.get(url)["ETag"]
+
+        with cache_queries_only():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Another page of the same menu is a different representation
+        self.assertEqual(self.client.get(f"{url}?page_size=1", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        item.price = 3500
+        item.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.user, self.client = make_user_client()
+        self.addCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+
+    def camera_photo(self):
+        # A landscape photo taken with the camera rotated, tagged with an orientation and a GPS position
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x8825] = {1: "N", 2: (6.0, 27.0, 0.0)}
+        buffer = BytesIO()
+        Image.new("RGB", (2400, 1600), (200, 80, 20)).save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("IMG_20221218_135502.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def test_upload_creates_oriented_derivatives_without_exif(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch("/api/user/update_user_image/", {"profile_image": self.camera_photo()}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+
+        self.user.refresh_from_db()
+        for size, longest_side in DERIVATIVE_SIZES.items():
+            for encoding in ("webp", "jpeg"):
+                with default_storage.open(derivative_name(self.user.profile_image.name, size, encoding)) as file:
+                    image = Image.open(file)
+                    # Rotated upright, so the portrait side is the longest
+                    self.assertEqual(image.height, longest_side)
+                    self.assertLess(image.width, image.height)
+                    self.assertEqual(len(image.getexif()), 0)
+
+    def test_profile_exposes_derivative_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch("/api/user/update_user_image/", {"profile_image": self.camera_photo()}, format="multipart")
+
+        images = self.client.get("/api/user/user_profile/").data["user"]["profile_images"]
+        self.assertTrue(images["thumbnail"]["webp"].endswith("_thumbnail.webp"))
+        self.assertTrue(default_storage.exists(images["medium"]["jpeg"][len("/media/"):]))
+
+    def test_saves_without_a_new_upload_do_not_regenerate(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.first_name = "Chi"
+            self.user.save()
+        self.assertEqual(callbacks, [])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_DERIVATIVES_ASYNC=False)
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+        vendor = Vendor.objects.create(name="Mama Put", description="", email="mama@example.com", contact_info="+2348098765432")
+        category = Category.objects.create(name="Rice", description="")
+        self.items = [
+            Menu.objects.create(vendor=vendor, category=category, name=f"Dish {i}", description="", price=1000)
+            for i in range(2)
+        ]
+
+    def upload(self, item, color=(200, 80, 20)):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), color).save(buffer, "JPEG")
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image = SimpleUploadedFile("IMG_20221218_135502.jpg", buffer.getvalue())
+            item.save()
+        return item.image.name
+
+    def sweep(self):
+        call_command("collect_unreferenced_blobs", grace_seconds=0, stdout=StringIO())
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.upload(self.items[0]), self.upload(self.items[1])
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith("blobs/"))
+        self.assertEqual(StoredBlob.objects.get(name=first).refcount, 2)
+
+    def test_blob_is_kept_until_the_last_reference_goes(self):
+        name = self.upload(self.items[0])
+        self.upload(self.items[1])
+
+        self.items[0].delete()
+        self.sweep()
+        self.assertTrue(default_storage.exists(name))
+
+        self.items[1].delete()
+        self.sweep()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(derivative_name(name, "thumbnail", "webp")))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_upload_without_a_saved_row_is_left_to_the_sweep(self):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), (200, 80, 20)).save(buffer, "JPEG")
+        # Stands for a model save that failed or rolled back after its file was stored
+        name = media_storage.save("menu_item_images/IMG_20221218_135502.jpg", SimpleUploadedFile("photo.jpg", buffer.getvalue()))
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 0)
+
+        self.sweep()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_replacing_an_image_releases_the_old_blob(self):
+        old = self.upload(self.items[0])
+        new = self.upload(self.items[0], color=(20, 80, 200))
+
+        self.assertNotEqual(old, new)
+        self.assertEqual(StoredBlob.objects.get(name=old).refcount, 0)
+        self.assertEqual(StoredBlob.objects.get(name=new).refcount, 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaDeliveryTests(TestCase):
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+        self.content = bytes(range(256)) * 4
+        self.blob = default_storage.save("blobs/ab/abcdef.jpg", SimpleUploadedFile("photo.jpg", self.content))
+        self.legacy = default_storage.save("menu_item_images/IMG_20221218_135502.jpg", SimpleUploadedFile("photo.jpg", self.content))
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_content_addressed_files_are_immutable(self):
+        response = self.client.get(f"/media/{self.blob}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertNotIn("immutable", self.client.get(f"/media/{self.legacy}")["Cache-Control"])
+
+    def test_byte_ranges(self):
+        response = self.client.get(f"/media/{self.legacy}", HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+        self.assertEqual(self.body(response), self.content[10:20])
+
+        response = self.client.get(f"/media/{self.legacy}", HTTP_RANGE="bytes=-5")
+        self.assertEqual(self.body(response), self.content[-5:])
+
+        response = self.client.get(f"/media/{self.legacy}", HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_unchanged_file_is_not_modified(self):
+        last_modified = self.client.get(f"/media/{self.blob}")["Last-Modified"]
+        response = self.client.get(f"/media/{self.blob}", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="nginx")
+    def test_nginx_serves_the_file(self):
+        response = self.client.get(f"/media/{self.blob}")
+
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.blob}")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+    def test_paths_outside_media_and_temporary_uploads_are_hidden(self):
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/.upload-abc").status_code, 404)
+        self.assertEqual(self.client.get("/media/blobs/ab/missing.jpg").status_code, 404)
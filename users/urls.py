@@ -5,6 +5,7 @@ urlpatterns = [
     path("register/", RegistrationView.as_view(), name="user_registration"),
     path("login/", LoginView.as_view(), name="user_login"),
     path("user_verification/", VerifyCodeView.as_view(), name="user_verification"),
+    path("token_refresh/", RefreshTokenView.as_view(), name="token_refresh"),
     path("user_profile/", UserView.as_view(), name="user_profile"),
     path("logout/", LogoutView.as_view(), name="logout_user"),
     path("update_email/", UpdateEmailView.as_view(), name="update_email"),
@@ -25,7 +26,9 @@ urlpatterns = [
     path("search_Dishes/", SearchDishesView.as_view(), name="search-Dishes"),
     path("search_category/", SearchDishesByCategoryView.as_view(), name="search-category"),
     path("search_price/", SearchDishesByPriceView.as_view(), name="search-price"),
+    path("filter_dishes/", FilterDishesView.as_view(), name="filter-dishes"),
     path("search_location/", SearchVendorByLocationView.as_view(), name="search-location"),
+    path("nearest_vendors/", NearestVendorsView.as_view(), name="nearest-vendors"),
 
 
 ]
\ No newline at end of file
@@ -1,12 +1,65 @@
 import random
-from django.core.mail import send_mail
+from django.db.models import F
+from django.utils import timezone
+import datetime
 import hashlib
+import uuid
+import jwt
 from decouple import config
 
+from .models import VerificationCode, OutgoingEmail
+
 
 JWT_SECRET_KEY = config("SECRET_KEY")
 JWT_ALGORITH = config("ALGORITH")
-JWT_EXPIRATION_TIME_MINUTES = 60 * 24 * 6
+JWT_EXPIRATION_TIME_MINUTES = 60 * 24 * 6 # Lifetime of refresh tokens
+ACCESS_TOKEN_EXPIRATION_TIME_MINUTES = 15
+VERIFICATION_CODE_EXPIRATION_TIME_MINUTES = 10
+VERIFICATION_CODE_MAX_ATTEMPTS = 5
+
+
+# Create a signed JWT describing a user or vendor
+def create_token(principal, token_type, lifetime_minutes):
+    now = datetime.datetime.utcnow()
+    payload = {
+        "id": principal.id,
+        "type": principal._meta.model_name, # "user" or "vendor"
+        "token_type": token_type,
+        "is_verified": principal.is_verified,
+        "is_active": principal.is_active,
+        "iat": now,
+        "exp": now + datetime.timedelta(minutes=lifetime_minutes),
+        "jti": uuid.uuid4().hex, # Unique token id, used to revoke the token on logout
+    }
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITH).decode("utf-8")
+
+
+# Create a short lived access token
+def create_access_token(principal):
+    return create_token(principal, "access", ACCESS_TOKEN_EXPIRATION_TIME_MINUTES)
+
+
+# Create a long lived refresh token, only accepted by the token refresh endpoint
+def create_refresh_token(principal):
+    return create_token(principal, "refresh", JWT_EXPIRATION_TIME_MINUTES)
+
+
+# Decode a JWT and check its token type, raises jwt.InvalidTokenError when the token is not acceptable
+def decode_token(token, token_type="access"):
+    payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH], options={"require_exp": True})
+    if payload.get("token_type") != token_type or payload.get("type") not in ("user", "vendor") or not payload.get("jti"):
+        raise jwt.InvalidTokenError("Unexpected token type")
+    return payload
+
+
+# Attach fresh access and refresh tokens to a response as httponly cookies
+def set_token_cookies(response, principal):
+    access_token = create_access_token(principal)
+    refresh_token = create_refresh_token(principal)
+    response.set_cookie(key="jwt", value=access_token, httponly=True, max_age=ACCESS_TOKEN_EXPIRATION_TIME_MINUTES * 60)
+    response.set_cookie(key="refresh_jwt", value=refresh_token, httponly=True, max_age=JWT_EXPIRATION_TIME_MINUTES * 60)
+    return access_token, refresh_token
+
 
 # Generates a random 4-digit number
 def generate_verification_code():
@@ -21,17 +74,61 @@ def hash_VC(code):
     return hash_value
 
 
-# Send verification code to email
-def send_verification_email(email, verification_code):
-    subject = "Your Bellyfied account verification code"
-    message = f"Your verification code is: {verification_code}"
-    from_email = "kukiworldwideng@gmail.com" 
-    recipient_list = [email]
-    try:
-        send_mail(subject, message, from_email, recipient_list)
-    except Exception as e:
-        print(f"An error occurred: {e}")
+# Generate a verification code for the account, replacing any pending one
+def issue_verification_code(account_type, email):
+    verification_code = generate_verification_code()
+    VerificationCode.objects.update_or_create(
+        account_type=account_type,
+        email=email,
+        defaults={
+            "hashed_code": hash_VC(verification_code),
+            "attempts": 0,
+            "expires_at": timezone.now() + datetime.timedelta(minutes=VERIFICATION_CODE_EXPIRATION_TIME_MINUTES),
+            "created_at": timezone.now(),
+        },
+    )
+    return verification_code
+
+
+# Consume the verification code issued to an email and return the email, or None if it is invalid.
+# The email is required so every failed guess is counted against the code it targets
+def check_verification_code(account_type, code, email):
+    if not code or not email:
+        return None
+
+    hashed_code = hash_VC(str(code))
+    verification = VerificationCode.objects.filter(
+        account_type=account_type, email=email, expires_at__gt=timezone.now()
+    ).first()
+    if verification is None:
+        return None
 
+    if verification.hashed_code != hashed_code:
+        # Count the failed attempt and burn the code once too many guesses were made
+        if verification.attempts + 1 >= VERIFICATION_CODE_MAX_ATTEMPTS:
+            verification.delete()
+        else:
+            VerificationCode.objects.filter(id=verification.id).update(attempts=F("attempts") + 1)
+        return None
 
+    # Codes are single use
+    verification.delete()
+    return verification.email
 
 
+# Delete the rows of a queryset in batches of primary keys to keep transactions and locks short
+def delete_in_batches(queryset, batch_size=1000):
+    deleted = 0
+    while True:
+        batch = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=batch).delete()[0]
+
+
+# Queue verification code email, it is delivered by the send_outbox_emails command
+def send_verification_email(email, verification_code):
+    subject = "Your Bellyfied account verification code"
+    message = f"Your verification code is: {verification_code}"
+    from_email = "kukiworldwideng@gmail.com" 
+    OutgoingEmail.objects.create(subject=subject, body=message, from_email=from_email, to_email=email)
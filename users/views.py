@@ -1,20 +1,31 @@
 # Import third party modules
 from rest_framework.generics import CreateAPIView, UpdateAPIView
 from rest_framework.views import APIView
-from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
-from django.contrib.auth import get_user_model
+from rest_framework.permissions import AllowAny
+from django.contrib.auth import get_user_model, user_logged_out
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 
 # Import python standard modules
-import jwt, datetime
+import hashlib, jwt
 
 # Import project modules
 from .serializers import *
-from .models import User, Address
+from .models import User, Address, VerificationCode
 from .utils import *
+from .authentication import UserClaimsJWTAuthentication
+from .revocation import revocation_list, revoke_request_tokens
+from .pagination import KeysetPagination
+from .geo import nearest
+from .conditional import conditional_on, latest
+from vendors.search import SEARCH_ORDERING
+from vendors.filters import MENU_SORTS, filter_menu, menu_facets
+from vendors.cache import vendor_cache
 from vendors.models import *
 from vendors.serializers import *
 
@@ -22,21 +33,20 @@ from vendors.serializers import *
 # Define view to create/register user
 class RegistrationView(CreateAPIView):
     serializer_class = UserSerializer # Specify the serializer class
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
     # Define method that handles the POST request for user registration.
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data) # Create an instance of the UserSerializer class
         if serializer.is_valid():
             user = User.objects.create_user(**serializer.validated_data)
 
-            verification_code = generate_verification_code() # Generate verification code for user
-            hash_verification_code = hash_VC(verification_code) # Hash verification code
+            # Generate verification code for user
+            verification_code = issue_verification_code(VerificationCode.USER, user.email)
 
-            # Update and save user details
-            user.hashed_verification_code = hash_verification_code 
-            user.save()
-
-            # Send email verification code 
+            # Send email verification code
             email = user.email
             send_verification_email(email, verification_code)
 
@@ -45,88 +55,116 @@ class RegistrationView(CreateAPIView):
 
             return Response(serialized_data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
+
 
 # Define a login view
 class LoginView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         # Get the user's input email from the request
-        email = request.data.get("email") 
+        email = request.data.get("email")
 
         # Check if the email exists in the database
         user = get_user_model().objects.filter(email=email).first()
         if not user:
             return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        verification_code = generate_verification_code() # Generate verification code for user
-        hash_verification_code = hash_VC(verification_code) # Hash verification code
 
-         # Update and save user details
-        user.hashed_verification_code = hash_verification_code 
-        user.save()
+        # Generate verification code for user
+        verification_code = issue_verification_code(VerificationCode.USER, user.email)
 
-        # Send email verification code 
+        # Send email verification code
         email = user.email
         send_verification_email(email, verification_code)
 
         return Response({"message": "Login successful"}, status=status.HTTP_200_OK)
-        
+
 
 # Define view to verify user verification code and generate JWT
 class VerifyCodeView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
     def post(self, request, *args, **kwargs):
-        # Get the user's input verification code from the request
-        user_input_code = request.data.get("verification_code") 
+        # Get the user's input verification code and email from the request
+        user_input_code = request.data.get("verification_code")
+        user_input_email = request.data.get("email")
+
+        # Codes are checked per email, so failed guesses count against the code they target
+        if not user_input_email:
+            return Response({"detail": "Please provide your email along with the verification code"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            hashed_input_code = hash_VC(user_input_code) # Hash user inputed verification code
-            user = User.objects.get(hashed_verification_code=hashed_input_code) # Get user with that email
+            # Consume the code and get the email it was issued to
+            email = check_verification_code(VerificationCode.USER, user_input_code, user_input_email)
+            user = User.objects.get(email=email) # Get user with that email
 
             # If user Exists
-            if user: 
+            if user:
                 user.is_verified = True
                 user.is_login = True
                 user.save()
 
-                # Create a payload dictionary containing information to be encoded in the JWT
-                payload = {
-                    "id": user.id,
-                    "iat": datetime.datetime.utcnow()
-                }
-
-                # Encode the payload into a JWT using the specified secret key and algorithm
-                token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITH).decode("utf-8")
-
-                # Return token via cookies
+                # Return access and refresh tokens via cookies
                 reponse = Response()
-                reponse.set_cookie(key="jwt", value=token, httponly=True)
+                token, refresh_token = set_token_cookies(reponse, user)
                 reponse.data = {
-                    "jwt": token
+                    "jwt": token,
+                    "refresh": refresh_token,
                 }
 
             return reponse
         except User.DoesNotExist:
             return Response({"detail": "Invalid verification code"}, status=status.HTTP_400_BAD_REQUEST)
-        
+
+
+# Define view to exchange a refresh token for a new access token
+class RefreshTokenView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        # Get the refresh token from the cookie or the request body
+        refresh_token = request.COOKIES.get("refresh_jwt") or request.data.get("refresh")
+        if not refresh_token:
+            return Response({"detail": "Refresh token was not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            payload = decode_token(refresh_token, token_type="refresh")
+        except jwt.InvalidTokenError:
+            return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if revocation_list.is_revoked(payload["jti"]):
+            return Response({"detail": "Token revoked"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Load the principal so the new token carries its current claims
+        model = Vendor if payload["type"] == "vendor" else User
+        principal = model.objects.filter(id=payload["id"]).first()
+        if principal is None or (model is User and not principal.is_active):
+            return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        token = create_access_token(principal)
+        response = Response({"jwt": token}, status=status.HTTP_200_OK)
+        response.set_cookie(key="jwt", value=token, httponly=True, max_age=ACCESS_TOKEN_EXPIRATION_TIME_MINUTES * 60)
+        return response
+
 
 # Define view to retrieve user information(Profile) based on a JWT stored in the request's cookies
+# Change state of the profile, the user row and its address
+def user_profile_state(request):
+    user = request.user
+    address_updated_at = None
+    if user.address_id:
+        address_updated_at = Address.objects.filter(id=user.address_id).values_list("updated_at", flat=True).first()
+    return latest(user.updated_at, address_updated_at), f"{user.id}:{user.address_id}"
+
+
 class UserView(APIView):
+    @method_decorator(conditional_on(user_profile_state))
     def get(self, request):
-        token = request.COOKIES.get("jwt")
-
-        # Check if the token is not present
-        if not token:
-            # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-             # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        user = User.objects.filter(id=payload["id"]).first()
+        user = request.user
         serializer = UserSerializer(user)
         address_serializer = AddressSerializer(user.address)
         response_data = {
@@ -135,163 +173,90 @@ class UserView(APIView):
         }
 
         return Response(response_data, status=status.HTTP_200_OK)
-       
+
 
 # Define view to logout user by deleting the JWT cookie
 class LogoutView(APIView):
     def post(self, request):
-        # Get the JWT token from the cookie
-        token = request.COOKIES.get("jwt")
-
-        # Check if the token is not present
-        if not token:
-           # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-            # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            return Response({"detail": "An error occurred"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get the user
-        user = get_user_model().objects.filter(id=payload["id"]).first()
-
-        # Check if the user is found
-        if not user:
-            return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        
+        user = request.user
+
         # Update is_login to False
         user.is_login = False
         user.save()
 
+        # Revoke the access and refresh tokens so they can't be replayed
+        revoke_request_tokens(request)
+
+        # Let other apps close the session, the cart is written back to the database
+        user_logged_out.send(sender=user.__class__, request=request, user=user)
+
         # Delete the 'jwt' cookie from the response
         response = Response()
-        # Delete the 'jwt' cookie from the response. 
+        # Delete the 'jwt' and 'refresh_jwt' cookies from the response.
         response.delete_cookie("jwt")
+        response.delete_cookie("refresh_jwt")
         response.data = {
             "message": "Logout successful"
         }
         return response
-    
+
 
 # Define view to update user email
 class UpdateEmailView(APIView):
+    @transaction.atomic
     def put(self, request, *args, **kwargs):
-        # Get the JWT token from the cookie
-        token = request.COOKIES.get("jwt")
+        user = request.user
 
         # Get the new email from user
         new_email = request.data.get("email")
 
-        # Check if the token is not present
-        if not token:
-           # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-            # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            return Response({"detail": "An error occurred"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get the user
-        user = get_user_model().objects.filter(id=payload["id"]).first()
-
-        # Check if the user is found
-        if not user:
-            return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        
         # Check if the new email already exists in the database
         if get_user_model().objects.exclude(id=user.id).filter(email=new_email).exists():
             return Response({"detail": "Email already exists"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        
-        verification_code = generate_verification_code() # Generate verification code for user
-        hash_verification_code = hash_VC(verification_code) # Hash verification code
-        
+
+
         # Update user details
         user.email = new_email
         user.username = new_email
-        user.hashed_verification_code = hash_verification_code
         user.save()
 
-        # Send email verification code 
+        # Generate verification code for the new email
+        verification_code = issue_verification_code(VerificationCode.USER, user.email)
+
+        # Send email verification code
         new_email = user.email
         send_verification_email(new_email, verification_code)
         return Response({"message": "Email updated successfully"}, status=status.HTTP_200_OK)
-    
+
 
 # Define view to update user phone number
 class UpdatePhoneNumberView(APIView):
    def put(self, request, *args, **kwargs):
-        # Get the JWT token from the cookie
-        token = request.COOKIES.get("jwt")
+        user = request.user
 
         # Get the new email from user
         new_phone_number = request.data.get("phone_number")
 
-        # Check if the token is not present
-        if not token:
-           # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-            # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            return Response({"detail": "An error occurred"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get the user
-        user = get_user_model().objects.filter(id=payload["id"]).first()
-
-        # Check if the user is found
-        if not user:
-            return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        
         # Check if the new phone number exists in the database
         if get_user_model().objects.exclude(id=user.id).filter(phone_number=new_phone_number).exists():
             return Response({"detail": "phone number already exists"}, status=status.HTTP_400_BAD_REQUEST)
-        
+
         # Update user details
         user.phone_number = new_phone_number
         user.save()
 
         return Response({"message": "phone number updated successfully"}, status=status.HTTP_200_OK)
-   
+
 
 # Define view to update user first_name and last_name
 class UpdateUserNameView(APIView):
     def put(self, request, *args, **kwargs):
-        # Get the JWT token from the cookie
-        token = request.COOKIES.get("jwt")
+        user = request.user
 
         # Get the new name from user
         new_first_name = request.data.get("first_name")
         new_last_name = request.data.get("last_name")
 
-        # Check if the token is not present
-        if not token:
-           # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-            # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            return Response({"detail": "An error occurred"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get the user
-        user = get_user_model().objects.filter(id=payload["id"]).first()
-
-        # Check if the user is found
-        if not user:
-            return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        
         # Update user details
         if new_first_name:
             user.first_name = new_first_name
@@ -300,39 +265,22 @@ class UpdateUserNameView(APIView):
 
         user.save()
         return Response({"message": "Name updated successfully"}, status=status.HTTP_200_OK)
-    
+
 
 # Define View to update user address
 class UpdateUserAddressView(APIView):
     def put(self, request, *args, **kwargs):
-        # Get the JWT token from the cookie
-        token = request.COOKIES.get("jwt")
+        user = request.user
 
         # Get the new address details from the request
         new_street = request.data.get("street")
         new_city = request.data.get("city")
         new_state = request.data.get("state")
 
-        # Check if the token is not present
-        if not token:
-            # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-            # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            return Response({"detail": "An error occurred"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get the user
-        user = get_user_model().objects.filter(id=payload["id"]).first()
-
-        # Check if the user is found
-        if not user:
-            return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        
+        # Validate the optional coordinates used to find vendors near the user
+        coordinates = CoordinatesSerializer(data=request.data)
+        coordinates.is_valid(raise_exception=True)
+
         # Check if the user has an associated address
         if user.address:
             # Update only the specified address fields
@@ -342,11 +290,13 @@ class UpdateUserAddressView(APIView):
                 user.address.city = new_city
             if new_state:
                 user.address.state = new_state
+            for field, value in coordinates.validated_data.items():
+                setattr(user.address, field, value)
 
             user.address.save()
         else:
             # If the user does not have an associated address, create one
-            address = Address.objects.create(street=new_street, city=new_city, state=new_state)
+            address = Address.objects.create(street=new_street, city=new_city, state=new_state, **coordinates.validated_data)
             user.address = address
             user.save()
 
@@ -360,10 +310,14 @@ class UpdateUserAddressView(APIView):
         }
 
         return Response(response_data, status=status.HTTP_200_OK)
-    
+
 
 # Define view to resend verification code to user
 class ResendVerificationCodeView(UpdateAPIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         # Get the user based on the provided email
         email = request.data.get("email")
@@ -377,16 +331,13 @@ class ResendVerificationCodeView(UpdateAPIView):
             return Response({"detail": "User is already verified"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Generate and save a new verification code
-        verification_code = generate_verification_code()
-        hash_verification_code = hash_VC(verification_code)
-        user.hashed_verification_code = hash_verification_code
-        user.save()
+        verification_code = issue_verification_code(VerificationCode.USER, user.email)
 
         # Send the new verification code via email
         send_verification_email(email, verification_code)
 
         return Response({"message": "Verification code resent successfully"}, status=status.HTTP_200_OK)
-    
+
 
 
 # Define view to update user profile image
@@ -394,336 +345,300 @@ class UpdateUserImageView(APIView):
     parser_classes = (MultiPartParser, FormParser)
     def patch(self, request, *args, **kwargs):
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
 
         # Get the image from the request
         image = request.data.get("profile_image")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-            
-
-                if not image:
-                    return Response({"detail": "No image provided"}, status=status.HTTP_400_BAD_REQUEST)
-                
-                user = User.objects.get(id=user_id)
-                
-                # Update the vendor's image
-                user.profile_image = image
-                user.save()
-                response.data = {
-                    "message": "update successfull"
-                }
+        if not image:
+            return Response({"detail": "No image provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+
+        # Update the vendor's image
+        user.profile_image = image
+        user.save()
+        response.data = {
+            "message": "update successfull"
+        }
 
-                return response
-                    
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        return response
 
-            
-        # return response
-            
 
 # Define view to enable user delete thier account
 class UserDeleteAccountView(APIView):
     def delete(self, request, *args, **kwargs):
         response = Response()
 
-        jwt_token = request.COOKIES.get("jwt")
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                user_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                user = User.objects.get(id=user_id)
-
-                # Delete the vendor
-                user.delete()
-                response.data = {
-                    "message": "Your account has been deleted successfully"
-                }
-
-                return response
-            
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        # Delete the user
+        request.user.delete()
+        response.data = {
+            "message": "Your account has been deleted successfully"
+        }
 
+        return response
 
-        # return response
 
-  
 # Define view to list all active vendors
 class ListActiveVendorsView(APIView):
+    # Read-only endpoint, authorized from the token claims without a database lookup
+    authentication_classes = [UserClaimsJWTAuthentication]
+
     def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        active_vendors = Vendor.objects.filter(is_active=True, is_login=True).for_serializer()
+
+        # Paginate the vendors by name
+        paginator = KeysetPagination(ordering=("name", "id"))
+        page = paginator.paginate_queryset(active_vendors, request, view=self)
+        serializer = VendorSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
 
-                active_vendors = Vendor.objects.filter(is_active=True, is_login=True)
-                serializer = VendorSerializer(active_vendors, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+# Change state of a vendor's details, the vendor row and its locations
+def vendor_details_state(request, vendor_id):
+    # The cache version is bumped on every change, so checking it needs no query
+    if vendor_cache.enabled:
+        return vendor_cache.state(vendor_id)
 
-            
+    vendor = Vendor.objects.filter(id=vendor_id).annotate(
+        locations_updated_at=Max("locations__updated_at"), location_count=Count("locations")
+    ).values("updated_at", "locations_updated_at", "location_count").first()
+    if vendor is None:
+        return None
+    return latest(vendor["updated_at"], vendor["locations_updated_at"]), vendor["location_count"]
 
-# Allows users to retrieve details about a specific vendor based on the vendor ID. 
+
+# Allows users to retrieve details about a specific vendor based on the vendor ID.
 class VendorDetailsView(APIView):
+    # Read-only endpoint, authorized from the token claims so a cache hit runs no queries at all
+    authentication_classes = [UserClaimsJWTAuthentication]
+
+    @method_decorator(conditional_on(vendor_details_state))
     def get(self, request, vendor_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        def build():
+            # Retrieve the vendor instance or return a 404 response if not found
+            vendor = get_object_or_404(Vendor.objects.for_serializer(), id=vendor_id)
+            serializer = VendorSerializer(vendor)
+            return serializer.data
+
+        # Serve the cached payload until the vendor or its locations change
+        data = vendor_cache.get_or_set(vendor_id, "detail", build)
+        return Response(data, status=status.HTTP_200_OK)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
 
-                # Retrieve the vendor instance or return a 404 response if not found
-                vendor = get_object_or_404(Vendor, id=vendor_id)
-                serializer = VendorSerializer(vendor)
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+# Change state of a vendor's menu, the count catches deleted items
+def vendor_menu_state(request, vendor_id):
+    if vendor_cache.enabled:
+        return vendor_cache.state(vendor_id)
+
+    menu = Menu.objects.filter(vendor=vendor_id).aggregate(updated_at=Max("updated_at"), count=Count("id"))
+    return menu["updated_at"], menu["count"]
 
-       
 
 # Define view to enables users to view the menu of a specific food vendor
 class VendorMenuView(APIView):
+    # Read-only endpoint, authorized from the token claims so a cache hit runs no queries at all
+    authentication_classes = [UserClaimsJWTAuthentication]
+
+    @method_decorator(conditional_on(vendor_menu_state))
     def get(self, request, vendor_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                
-                # Retrieve the vendor instance or return a 404 response if not found
-                vendor = get_object_or_404(Vendor, id=vendor_id)
-                
-                # Retrieve all items added to the menu by the vendor
-                menu_items = Menu.objects.filter(vendor=vendor)
-
-                # Serialize the items and return the data
-                serializer = MenuSerializer(menu_items, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
-
-            
+        def build():
+            # Retrieve the vendor instance or return a 404 response if not found
+            vendor = get_object_or_404(Vendor, id=vendor_id)
 
-# Define a view that provides users with a list of food categories.
-class CategoryListView(APIView):
-    def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+            # Retrieve all items added to the menu by the vendor
+            menu_items = Menu.objects.filter(vendor=vendor).for_serializer()
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
+            # Paginate and serialize the items
+            paginator = KeysetPagination(ordering=("name", "id"))
+            page = paginator.paginate_queryset(menu_items, request, view=self)
+            serializer = MenuSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
 
-                # Retrieve all food categories
-                categories = Category.objects.all()
+        # Every page is cached on its own, the page links carry the host so it is part of the key
+        page_key = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        data = vendor_cache.get_or_set(vendor_id, f"menu:{page_key}", build)
+        return Response(data, status=status.HTTP_200_OK)
 
-                # Serialize the categories and return the data
-                serializer = CategorySerializer(categories, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
 
+# Change state of the category list, the count catches deleted categories
+def category_list_state(request):
+    categories = Category.objects.aggregate(updated_at=Max("updated_at"), count=Count("id"))
+    state = categories["updated_at"], categories["count"]
+    # The check also notices changes made by other processes, the registry reloads before the list is served
+    category_registry.sync(state)
+    return state
 
 
-# Define a view to retrieve a list of vendors offering food in a specific category 
-class VendorsByCategoryView(APIView):
-    def get(self, request, category_id, *args, **kwargs):  
-        jwt_token = request.COOKIES.get("jwt")
+# Define a view that provides users with a list of food categories.
+class CategoryListView(APIView):
+    # Read-only endpoint, authorized from the token claims without a database lookup
+    authentication_classes = [UserClaimsJWTAuthentication]
+
+    @method_decorator(conditional_on(category_list_state))
+    def get(self, request, *args, **kwargs):
+        # Retrieve all food categories from the in-process registry
+        categories = category_registry.all()
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH]) 
+        # Serialize the categories and return the data
+        serializer = CategorySerializer(categories, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-                # Retrieve the category instance or return a 404 response if not found
-                category = get_object_or_404(Category, id=category_id)
-            
-                # Retrieve all vendors offering food in the specified category
-                vendors = Vendor.objects.filter(menuitem__category=category).distinct()
 
-                # Serialize the vendors and return the data
-                serializer = VendorSerializer(vendors, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+# Define a view to retrieve a list of vendors offering food in a specific category
+class VendorsByCategoryView(APIView):
+    def get(self, request, category_id, *args, **kwargs):
+        # Retrieve the category instance or return a 404 response if not found
+        category = get_object_or_404(Category, id=category_id)
+
+        # Retrieve all vendors offering food in the specified category
+        vendors = Vendor.objects.filter(menu__category=category).distinct().for_serializer()
+
+        # Serialize the vendors and return the data
+        serializer = VendorSerializer(vendors, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
-            
 
 # Define view to search  vendors
 class SearchVendorsView(APIView):
     def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                # Get the search query from the request parameters
-                search_query = request.query_params.get('query', '')
-
-                # Filter vendors based on the search query
-                vendors = Vendor.objects.filter(name__icontains=search_query)
+        # Get the search query from the request parameters
+        search_query = request.query_params.get('query', '')
 
-                # Serialize the queryset
-                serializer = VendorSerializer(vendors, many=True)
+        # Search vendor names and descriptions
+        vendors = Vendor.objects.search(search_query).for_serializer()
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Paginate the best matches first and serialize the queryset
+        paginator = KeysetPagination(ordering=SEARCH_ORDERING)
+        page = paginator.paginate_queryset(vendors, request, view=self)
+        serializer = VendorSerializer(page, many=True)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        return paginator.get_paginated_response(serializer.data)
 
 
 # Define view to  Search  Dishes
 class SearchDishesView(APIView):
     def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        # Get the search query from the request parameters
+        search_query = request.query_params.get('query', '')
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                # Get the search query from the request parameters
-                search_query = request.query_params.get('query', '')
+        # Search dish names and descriptions
+        dishes = Menu.objects.search(search_query).for_serializer()
 
-                # Filter vendors based on the search query
-                vendors = Menu.objects.filter(name__icontains=search_query)
+        # Paginate the best matches first and serialize the queryset
+        paginator = KeysetPagination(ordering=SEARCH_ORDERING)
+        page = paginator.paginate_queryset(dishes, request, view=self)
+        serializer = MenuSerializer(page, many=True)
 
-                # Serialize the queryset
-                serializer = MenuSerializer(vendors, many=True)
-
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        return paginator.get_paginated_response(serializer.data)
 
 
 # Define view to search by category
 class SearchDishesByCategoryView(APIView):
     def get(self, request,  *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                # Get the search query from the request parameters
-                search_query = request.query_params.get('query', '')
+        # Get the search query from the request parameters
+        search_query = request.query_params.get('query', '')
 
-                # Retrieve the category based on the name
-                category = Category.objects.get(name__icontains=search_query)
+        # Retrieve the categories matching the name, the category table is small enough to scan
+        categories = Category.objects.filter(name__icontains=search_query)
 
-                # Filter menu items based on the category
-                menu_items = Menu.objects.filter(category=category)
+        # Filter menu items based on the categories
+        menu_items = Menu.objects.filter(category__in=categories).for_serializer()
 
-                # Serialize the queryset
-                serializer = MenuSerializer(menu_items, many=True)
+        # Serialize the queryset
+        serializer = MenuSerializer(menu_items, many=True)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 
 # Define view to search by price
 class SearchDishesByPriceView(APIView):
     def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        # Get the price from the request parameters
+        price = request.query_params.get('price')
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
+        # Filter menu items based on the specified price
+        menu_items = Menu.objects.filter(price=price).for_serializer()
 
-                # Get the price from the request parameters
-                price = request.query_params.get('price')
+        # Serialize the queryset
+        serializer = MenuSerializer(menu_items, many=True)
 
-                # Filter menu items based on the specified price 
-                menu_items = Menu.objects.filter(price=price)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-                # Serialize the queryset
-                serializer = MenuSerializer(menu_items, many=True)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
+# Define view to filter dishes on any combination of category, vendor, price range and text
+class FilterDishesView(APIView):
+    def get(self, request, *args, **kwargs):
+        # Validate the filters from the request parameters
+        filters = MenuFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        # Rank text searches by relevance unless the client asked for another order, there is nothing to rank without text
+        sort = params.get("sort", "relevance")
+        if sort == "relevance" and not params.get("query"):
+            sort = "name"
+        menu, menu_items = filter_menu(params)
+
+        # Paginate and serialize the matching dishes, with the counts for every facet
+        paginator = KeysetPagination(ordering=MENU_SORTS[sort])
+        page = paginator.paginate_queryset(menu_items.for_serializer(), request, view=self)
+        serializer = MenuSerializer(page, many=True)
+
+        response = paginator.get_paginated_response(serializer.data)
+        response.data["facets"] = menu_facets(menu, params)
+        return response
 
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+# Define view to find the vendors nearest to a point, or to the user's address when no point is given
+class NearestVendorsView(APIView):
+    def get(self, request, *args, **kwargs):
+        params = NearestVendorsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        # Fall back to the coordinates of the user's address
+        address = request.user.address
+        if "latitude" in params:
+            latitude, longitude = params["latitude"], params["longitude"]
+        elif address is not None and address.latitude is not None:
+            latitude, longitude = address.latitude, address.longitude
+        else:
+            return Response({"detail": "latitude and longitude are required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Find the nearest location of each active vendor, within the radius or the k nearest
+        locations = Location.objects.filter(vendor__is_active=True).only("id", "vendor", "latitude", "longitude")
+        nearest_locations = nearest(locations, latitude, longitude, params["radius"], k=params.get("k"), distinct_on="vendor_id")
 
-# Define view to search vendor by location
-class SearchVendorByLocationView(APIView):
-    def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+        # Serialize the vendors nearest first, with the distance to their nearest location
+        vendors = Vendor.objects.for_serializer().in_bulk([location.vendor_id for _, location in nearest_locations])
+        results = []
+        for distance, location in nearest_locations:
+            data = VendorSerializer(vendors[location.vendor_id]).data
+            data["distance_km"] = round(distance, 3)
+            data["location_id"] = location.id
+            results.append(data)
+
+        return Response(results, status=status.HTTP_200_OK)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                # Get the location query from the request parameters
-                location_query = request.query_params.get('location', '')
 
-                # Filter vendors based on the street in the location query
-                vendors = Vendor.objects.filter(vendor_locations__street__icontains=location_query)
 
-                # Serialize the vendors along with their locations
-                serializer = VendorSerializer(vendors, many=True, context={'location_query': location_query})
+# Define view to search vendor by location
+class SearchVendorByLocationView(APIView):
+    def get(self, request, *args, **kwargs):
+        # Get the location query from the request parameters
+        location_query = request.query_params.get('location', '')
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
+        # Filter vendors based on the street in the location query
+        vendors = Vendor.objects.filter(vendor_locations__street__icontains=location_query).distinct().for_serializer()
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except User.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Serialize the vendors along with their locations
+        serializer = VendorSerializer(vendors, many=True, context={'location_query': location_query})
 
-        return Response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_200_OK)
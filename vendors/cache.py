@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import caches
+
+# Import python standard modules
+import datetime, threading, time
+
+# Import project modules
+from users.caches import check_shared_cache
+
+
+# Define a per-vendor versioned cache, bumping a vendor's version orphans every payload cached under the old one.
+# Versions are nanosecond timestamps of the last change, so they double as a Last-Modified time.
+class VendorCache:
+    def __init__(self, enabled, alias, timeout):
+        # Versions bumped by one worker have to reach the others, or they keep serving stale payloads
+        if enabled:
+            check_shared_cache(alias, "The menu cache")
+        self.enabled = enabled
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, vendor_id):
+        return f"vendor_cache:{vendor_id}:version"
+
+    def version(self, vendor_id):
+        version = self.cache.get(self.version_key(vendor_id))
+        if version is None:
+            # Start from the clock, so a version lost to eviction or expiry never comes back to an old payload.
+            # Versions expire like the payloads, ids of vendors that don't exist don't pile up in the cache
+            self.cache.add(self.version_key(vendor_id), time.time_ns(), timeout=self.timeout)
+            version = self.cache.get(self.version_key(vendor_id))
+        return version
+
+    def bump(self, vendor_id):
+        # Concurrent bumps each write a new, never used version, whichever lands last wins
+        self.cache.set(self.version_key(vendor_id), time.time_ns(), timeout=self.timeout)
+
+    def state(self, vendor_id):
+        # Last change time and version, a cheap change check for conditional GETs
+        version = self.version(vendor_id)
+        return datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc), version
+
+    def get_or_set(self, vendor_id, name, build):
+        if not self.enabled:
+            return build()
+
+        key = f"vendor_cache:{vendor_id}:{self.version(vendor_id)}:{name}"
+        data = self.cache.get(key)
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+            return data
+
+        with self._lock:
+            self.misses += 1
+        data = build()
+        self.cache.set(key, data, timeout=self.timeout)
+        return data
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+vendor_cache = VendorCache(
+    enabled=getattr(settings, "MENU_CACHE_ENABLED", True),
+    alias=getattr(settings, "MENU_CACHE_ALIAS", "shared"),
+    timeout=getattr(settings, "MENU_CACHE_TIMEOUT_SECONDS", 3600),
+)
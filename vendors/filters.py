@@ -0,0 +1,56 @@
+from django.db.models import Count, Max, Min, Q
+
+# Import project modules
+from .models import Menu
+from .search import SEARCH_ORDERING
+
+
+# Keyset orderings for each sort option, each one is served by a (filter column, sort column, id) index
+MENU_SORTS = {
+    "name": ("name", "id"),
+    "-name": ("-name", "id"),
+    "price": ("price", "id"),
+    "-price": ("-price", "id"),
+    "relevance": SEARCH_ORDERING,
+}
+
+
+# Build the filter condition for validated menu filter params, leaving out the facets in skip
+def menu_filter_condition(params, skip=()):
+    condition = Q()
+    if "category" not in skip and params.get("category") is not None:
+        condition &= Q(category=params["category"])
+    if "vendor" not in skip and params.get("vendor") is not None:
+        condition &= Q(vendor=params["vendor"])
+    if "price" not in skip and params.get("min_price") is not None:
+        condition &= Q(price__gte=params["min_price"])
+    if "price" not in skip and params.get("max_price") is not None:
+        condition &= Q(price__lte=params["max_price"])
+    return condition
+
+
+# Filter the menu on any combination of category, vendor, price range and text
+def filter_menu(params):
+    # Without a text query there is nothing to rank, so skip the search annotation entirely
+    menu = Menu.objects.search(params["query"]) if params.get("query") else Menu.objects.all()
+    return menu, menu.filter(menu_filter_condition(params))
+
+
+# Count the matches per category and per vendor, and the price range, each facet ignoring its own filter
+def menu_facets(menu, params):
+    def counts(facet, name_field):
+        rows = (
+            menu.filter(menu_filter_condition(params, skip=(facet,)))
+            .order_by()
+            .values(facet, name_field)
+            .annotate(count=Count("id"))
+            .order_by("-count", facet)
+        )
+        return [{"id": row[facet], "name": row[name_field], "count": row["count"]} for row in rows]
+
+    prices = menu.filter(menu_filter_condition(params, skip=("price",))).aggregate(min=Min("price"), max=Max("price"))
+    return {
+        "categories": counts("category", "category__name"),
+        "vendors": counts("vendor", "vendor__name"),
+        "price": prices,
+    }
@@ -0,0 +1,27 @@
+from django.db import models
+
+# Import project modules
+from .search import search
+
+
+class SearchableQuerySet(models.QuerySet):
+    # Full text search over name and description, see vendors.search
+    def search(self, query):
+        return search(self, query)
+
+
+class VendorQuerySet(SearchableQuerySet):
+    # Load only the columns VendorSerializer renders, with every vendor's locations in one extra query
+    def for_serializer(self):
+        from .models import Location
+
+        locations = Location.objects.only("id", "street", "city", "state", "latitude", "longitude")
+        return self.only("id", "name", "description", "contact_info", "email", "image").prefetch_related(
+            models.Prefetch("locations", queryset=locations)
+        )
+
+
+class MenuQuerySet(SearchableQuerySet):
+    # Load only the columns MenuSerializer renders, foreign keys are rendered from their ids
+    def for_serializer(self):
+        return self.only("id", "vendor", "category", "name", "description", "price", "image")
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0014_rename_menuitem_menu'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='vendor',
+            name='hashed_verification_code',
+        ),
+    ]
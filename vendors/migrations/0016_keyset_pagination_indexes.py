@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0015_remove_vendor_hashed_verification_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menu',
+            index=models.Index(fields=['name', 'id'], name='menu_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menu',
+            index=models.Index(fields=['vendor', 'name', 'id'], name='menu_vendor_name_id_idx'),
+        ),
+    ]
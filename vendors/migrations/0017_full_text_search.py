@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+SEARCH_TABLES = ["vendors_vendor", "vendors_menu"]
+
+
+# Keep search_vector in step with name and description on every write, including bulk and raw SQL updates
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("""
+        CREATE FUNCTION vendors_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in SEARCH_TABLES:
+        schema_editor.execute(f"""
+            CREATE TRIGGER {table}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF name, description ON {table}
+            FOR EACH ROW EXECUTE FUNCTION vendors_search_vector_update()
+        """)
+        # Fill the column for existing rows
+        schema_editor.execute(f"""
+            UPDATE {table} SET search_vector =
+                setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        """)
+        # Trigram index on names for the typo tolerant fallback
+        schema_editor.execute(f"CREATE INDEX {table}_name_trgm_idx ON {table} USING gin (name gin_trgm_ops)")
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for table in SEARCH_TABLES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_name_trgm_idx")
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_vector_trigger ON {table}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS vendors_search_vector_update()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0016_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='menu',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='menu',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='menu_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='vendor_search_vector_idx'),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
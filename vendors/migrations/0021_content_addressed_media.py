@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:12
+
+from django.db import migrations, models
+import users.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0020_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='menu',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.ContentAddressedStorage(), upload_to='menu_item_images/'),
+        ),
+        migrations.AlterField(
+            model_name='vendor',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.ContentAddressedStorage(), upload_to='vendor_images/'),
+        ),
+    ]
@@ -1,8 +1,15 @@
+from django.conf import settings
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from phonenumbers import parse
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from .managers import VendorQuerySet, MenuQuerySet
+from users.geo import grid_cell
+from users.storage import media_storage
+from users.registry import ModelRegistry
 
 
 
@@ -12,6 +19,11 @@ class Location(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=50)
     vendor = models.ForeignKey("Vendor", on_delete=models.CASCADE, related_name="vendor_locations", default=None)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Grid cell of the coordinates, lets proximity searches prune with an indexed IN list
+    grid_cell = models.CharField(max_length=32, null=True, blank=True, editable=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ["vendor", "street", "city", "state"]
@@ -23,6 +35,7 @@ class Location(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.grid_cell = grid_cell(self.latitude, self.longitude)
         super().save(*args, **kwargs)
 
     
@@ -34,12 +47,26 @@ class Vendor(models.Model):
     locations = models.ManyToManyField(Location, related_name="vendor_locations", blank=True)
     contact_info = models.CharField(max_length=15, unique=True,  null=True, blank=True)
     email = models.EmailField(unique=True)
-    hashed_verification_code = models.CharField(max_length=200, null=True, blank=True)
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=False)
     is_login = models.BooleanField(default=False)
     registration_date = models.DateTimeField(default=timezone.now) 
-    image = models.ImageField(upload_to="vendor_images/", null=True, blank=True)
+    image = models.ImageField(upload_to="vendor_images/", storage=media_storage, null=True, blank=True)
+    # Weighted name and description lexemes, maintained by a database trigger on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VendorQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="vendor_search_vector_idx"),
+        ]
+
+    # Vendors are authenticated through the JWT cookie, so DRF permission checks treat them as logged in
+    @property
+    def is_authenticated(self):
+        return True
 
 
     def add_location(self, street, city, state):
@@ -70,6 +97,15 @@ class Vendor(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+# Categories change maybe monthly, every process keeps them in memory
+category_registry = ModelRegistry(
+    "vendors.Category",
+    refresh_interval=getattr(settings, "LOOKUP_REGISTRY_REFRESH_SECONDS", 300),
+    miss_reload_interval=getattr(settings, "LOOKUP_REGISTRY_MISS_RELOAD_SECONDS", 5),
+)
     
 
 # Define MenuItem model
@@ -79,5 +115,22 @@ class Menu(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
-    image = models.ImageField(upload_to="menu_item_images/", null=True, blank=True)
+    image = models.ImageField(upload_to="menu_item_images/", storage=media_storage, null=True, blank=True)
+    # Weighted name and description lexemes, maintained by a database trigger on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = MenuQuerySet.as_manager()
+
+    class Meta:
+        # Back the keyset paginated listings ordered by (name, id)
+        indexes = [
+            models.Index(fields=["name", "id"], name="menu_name_id_idx"),
+            models.Index(fields=["vendor", "name", "id"], name="menu_vendor_name_id_idx"),
+            # Back the menu filter, an equality on the facet then a price range and price ordering
+            models.Index(fields=["category", "price", "id"], name="menu_category_price_idx"),
+            models.Index(fields=["vendor", "price", "id"], name="menu_vendor_price_idx"),
+            models.Index(fields=["price", "id"], name="menu_price_id_idx"),
+            GinIndex(fields=["search_vector"], name="menu_search_vector_idx"),
+        ]
     
@@ -0,0 +1,48 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+# Import python standard modules
+import re
+
+
+# Order search results best match first, id keeps the order stable for keyset pagination
+SEARCH_ORDERING = ("-rank", "id")
+
+
+# Split a query into search terms, dropping punctuation that has a meaning in tsquery syntax
+def search_terms(query):
+    return re.findall(r"[^\W_]+", query or "")
+
+
+# Filter a Vendor or Menu queryset on name and description and annotate a "rank" to order by
+def search(queryset, query):
+    terms = search_terms(query)
+    if not terms:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    if connections[queryset.db].vendor != "postgresql":
+        return fallback_search(queryset, terms)
+
+    # Every term has to match, as a prefix so partial words still find results
+    text_query = SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw", config="english")
+    phrase = " ".join(terms)
+
+    # Full text matches use the search_vector GIN index, typos in names are caught by the trigram GIN index
+    rank = SearchRank(F("search_vector"), text_query) + TrigramSimilarity("name", phrase)
+    return queryset.filter(Q(search_vector=text_query) | Q(name__trigram_similar=phrase)).annotate(
+        # Ranks are real, compare them as double precision so keyset cursors round-trip exactly
+        rank=Cast(rank, FloatField())
+    )
+
+
+# Unindexed substring search for databases without full text search, such as SQLite in development
+def fallback_search(queryset, terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+
+    # Rank name matches above description only matches
+    rank = Case(When(name__icontains=" ".join(terms), then=Value(1.0)), default=Value(0.5), output_field=FloatField())
+    return queryset.filter(condition).annotate(rank=rank)
@@ -1,21 +1,27 @@
 from rest_framework import serializers
 from .models import Location, Vendor, Category, Menu
+from users.images import derivative_urls
 
 
 # Location model serializer
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
-        fields = ("id", "street", "city", "state")
+        fields = ("id", "street", "city", "state", "latitude", "longitude")
 
 
 # Vendor model serializer
 class VendorSerializer(serializers.ModelSerializer):
     locations = LocationSerializer(many=True, required=False)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Vendor
-        fields = ("id", "name", "description", "locations", "contact_info", "email")
+        fields = ("id", "name", "description", "locations", "contact_info", "email", "images")
+
+    # Resized derivatives of the vendor image, clients never need the original upload
+    def get_images(self, instance):
+        return derivative_urls(instance.image)
 
     def create(self, validated_data):
         locations_data = validated_data.pop("locations", [])
@@ -51,9 +57,15 @@ class CategorySerializer(serializers.ModelSerializer):
     
 # MenuItem model serializer
 class MenuSerializer(serializers.ModelSerializer):
+    images = serializers.SerializerMethodField()
+
     class Meta:
         model = Menu
-        fields = ("id", "vendor", "category", "name", "description", "price")
+        fields = ("id", "vendor", "category", "name", "description", "price", "images")
+
+    # Resized derivatives of the item image, clients never need the original upload
+    def get_images(self, instance):
+        return derivative_urls(instance.image)
 
 
     def to_representation(self, instance):
@@ -61,3 +73,18 @@ class MenuSerializer(serializers.ModelSerializer):
         # Exclude 'vendor' and 'category' fields
         representation.pop('vendor', None)
         return representation
+
+
+# Query params of the menu filter endpoint
+class MenuFilterSerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False)
+    vendor = serializers.IntegerField(required=False)
+    min_price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+    max_price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+    query = serializers.CharField(required=False, allow_blank=True)
+    sort = serializers.ChoiceField(choices=["name", "-name", "price", "-price", "relevance"], required=False)
+
+    def validate(self, data):
+        if data.get("min_price") is not None and data.get("max_price") is not None and data["min_price"] > data["max_price"]:
+            raise serializers.ValidationError({"min_price": "min_price cannot be greater than max_price"})
+        return data
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+
+# Import project modules
+from .cache import vendor_cache
+from .models import Vendor, Location, Menu, Category, category_registry
+
+
+# Invalidate a vendor's cached detail and menu whenever the vendor, its locations or its menu change.
+# Bumped right away and again at commit: a request reading the old rows before the commit may cache them
+# under the first new version, the second orphans that payload. Queryset update() and bulk operations send
+# no signals, bump the version by hand after them.
+def bump_vendor(vendor_id):
+    vendor_cache.bump(vendor_id)
+    transaction.on_commit(lambda: vendor_cache.bump(vendor_id))
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_vendor(sender, instance, **kwargs):
+    bump_vendor(instance.id)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def invalidate_vendor_of(sender, instance, **kwargs):
+    bump_vendor(instance.vendor_id)
+
+
+@receiver(m2m_changed, sender=Vendor.locations.through)
+def invalidate_vendor_locations(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    # Changes may be made from either side of the relation
+    if isinstance(instance, Vendor):
+        bump_vendor(instance.id)
+    else:
+        for vendor_id in pk_set or ():
+            bump_vendor(vendor_id)
+
+
+# Drop this process' copy of the categories when they change, see orders.signals
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_migrate)
+def invalidate_category_registry(sender, **kwargs):
+    category_registry.invalidate()
+    transaction.on_commit(category_registry.invalidate)
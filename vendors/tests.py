@@ -1,3 +1,179 @@
 from django.test import TestCase
 
+# Import python standard modules
+from unittest.mock import patch
+
 # Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+
+# Import project modules
+from users.revocation import revocation_list
+from users.testing import cache_queries_only
+from users.tests import make_user_client
+from .cache import vendor_cache
+from .managers import MenuQuerySet
+from .models import Vendor, Category, Menu
+from .search import search_terms
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user, self.client = make_user_client()
+        vendor = Vendor.objects.create(name="Mama Put", description="Home cooked local dishes", email="mama@example.com", contact_info="+2348098765432")
+        category = Category.objects.create(name="Rice", description="")
+        self.jollof = Menu.objects.create(vendor=vendor, category=category, name="Jollof Rice", description="Smoky party rice", price=2500)
+        self.fried = Menu.objects.create(vendor=vendor, category=category, name="Fried Rice", description="With jollof spices", price=2500)
+        Menu.objects.create(vendor=vendor, category=category, name="Egusi Soup", description="Melon seed soup", price=3000)
+
+    def test_terms_drop_tsquery_syntax(self):
+        self.assertEqual(search_terms("jollof & rice:* | !(egusi)"), ["jollof", "rice", "egusi"])
+
+    def test_search_matches_name_and_description_best_first(self):
+        response = self.client.get("/api/user/search_Dishes/", {"query": "jollof"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.jollof.id, self.fried.id])
+
+    def test_search_pages_through_ranked_results(self):
+        response = self.client.get("/api/user/search_Dishes/", {"query": "rice", "page_size": 1})
+        next_page = self.client.get(response.data["next"])
+
+        ids = [item["id"] for item in response.data["results"] + next_page.data["results"]]
+        self.assertCountEqual(ids, [self.jollof.id, self.fried.id])
+        self.assertIsNone(next_page.data["next"])
+
+    def test_search_by_category_without_match_is_empty(self):
+        response = self.client.get("/api/user/search_category/", {"query": "Pastries"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+
+    def test_search_uses_prefix_full_text_query_on_postgresql(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("Full text search needs PostgreSQL")
+
+        # "jol" is a prefix of a name in one dish and of a description word in the other
+        results = Menu.objects.search("jol").order_by("-rank", "id").values_list("id", flat=True)
+        self.assertEqual(list(results), [self.jollof.id, self.fried.id])
+
+
+class MenuFilterTests(TestCase):
+    def setUp(self):
+        self.user, self.client = make_user_client()
+        self.mama = Vendor.objects.create(name="Mama Put", description="", email="mama@example.com", contact_info="+2348098765432")
+        self.buka = Vendor.objects.create(name="Buka Hut", description="", email="buka@example.com", contact_info="+2348098765433")
+        self.rice = Category.objects.create(name="Rice", description="")
+        self.soup = Category.objects.create(name="Soup", description="")
+        for vendor, category, name, price in [
+            (self.mama, self.rice, "Jollof Rice", 2500),
+            (self.mama, self.rice, "Fried Rice", 2000),
+            (self.mama, self.soup, "Egusi Soup", 3000),
+            (self.buka, self.rice, "Ofada Rice", 1500),
+            (self.buka, self.soup, "Okra Soup", 4000),
+        ]:
+            Menu.objects.create(vendor=vendor, category=category, name=name, description="", price=price)
+
+    def test_filters_combine_and_sort_by_price(self):
+        response = self.client.get("/api/user/filter_dishes/", {"category": self.rice.id, "min_price": 1800, "sort": "-price"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["name"] for item in response.data["results"]], ["Jollof Rice", "Fried Rice"])
+
+    def test_facet_counts_ignore_their_own_filter(self):
+        response = self.client.get("/api/user/filter_dishes/", {"category": self.rice.id, "vendor": self.mama.id})
+        facets = response.data["facets"]
+
+        # Categories are counted for Mama Put, vendors are counted for rice
+        self.assertEqual([(row["name"], row["count"]) for row in facets["categories"]], [("Rice", 2), ("Soup", 1)])
+        self.assertEqual([(row["name"], row["count"]) for row in facets["vendors"]], [("Mama Put", 2), ("Buka Hut", 1)])
+        self.assertEqual((facets["price"]["min"], facets["price"]["max"]), (2000, 2500))
+
+    def test_invalid_price_range_is_rejected(self):
+        response = self.client.get("/api/user/filter_dishes/", {"min_price": 3000, "max_price": 1000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_category_price_filter_uses_composite_index(self):
+        queryset = Menu.objects.filter(category=self.rice, price__gte=1000, price__lte=3000).order_by("price", "id")
+
+        if connection.vendor == "postgresql":
+            # The table is tiny, so take sequential scans off the table to see which index the planner would pick
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn("menu_category_price_idx", queryset.explain())
+
+
+class VendorCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendor_cache.reset_stats()
+        revocation_list.reset()
+        revocation_list.rebuild()
+        self.user, self.client = make_user_client()
+        self.vendor = Vendor.objects.create(name="Mama Put", description="", email="mama@example.com", contact_info="+2348098765432")
+        category = Category.objects.create(name="Rice", description="")
+        self.item = Menu.objects.create(vendor=self.vendor, category=category, name="Jollof Rice", description="", price=2500)
+        self.url = f"/api/user/vendor_menu/{self.vendor.id}/"
+
+    def test_cache_hit_runs_no_queries(self):
+        self.client.get(self.url)
+        with cache_queries_only():
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data["results"][0]["name"], "Jollof Rice")
+        self.assertEqual(vendor_cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_menu_and_location_changes_invalidate_the_vendor(self):
+        self.client.get(self.url)
+        self.item.name = "Party Jollof"
+        self.item.save()
+        self.assertEqual(self.client.get(self.url).data["results"][0]["name"], "Party Jollof")
+
+        detail_url = f"/api/user/vendor_details/{self.vendor.id}/"
+        self.client.get(detail_url)
+        self.vendor.add_location("1 Marina", "Lagos", "Lagos")
+        self.assertEqual(len(self.client.get(detail_url).data["locations"]), 1)
+
+    def test_payload_cached_before_the_commit_is_dropped_at_commit(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = "Party Jollof"
+            self.item.save()
+            # Stands for a request that read the menu before the change committed
+            with patch.object(MenuQuerySet, "for_serializer", lambda queryset: queryset.none()):
+                self.client.get(self.url)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data["results"][0]["name"], "Party Jollof")
+
+    def test_other_vendors_stay_cached(self):
+        self.client.get(self.url)
+        Vendor.objects.create(name="Buka Hut", description="", email="buka@example.com", contact_info="+2348098765433")
+
+        with cache_queries_only():
+            self.client.get(self.url)
+
+    def test_versions_of_unknown_vendors_expire(self):
+        with patch.object(vendor_cache.cache, "add", wraps=vendor_cache.cache.add) as add:
+            self.assertEqual(self.client.get("/api/user/vendor_details/999999/").status_code, 404)
+            vendor_cache.version(999999)
+
+        # Version keys are created with the payload timeout, not kept forever
+        self.assertTrue(add.called)
+        self.assertTrue(all(call.kwargs["timeout"] == vendor_cache.timeout for call in add.call_args_list))
+
+    def test_disabled_cache_always_builds(self):
+        vendor_cache.enabled = False
+        self.addCleanup(setattr, vendor_cache, "enabled", True)
+
+        self.client.get(self.url)
+        # The menu change check, then the vendor and its menu
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+        # Without the cache the change checks read updated_at from the tables
+        detail_url = f"/api/user/vendor_details/{self.vendor.id}/"
+        etag = self.client.get(detail_url)["ETag"]
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.vendor.add_location("1 Marina", "Lagos", "Lagos")
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
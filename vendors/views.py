@@ -1,34 +1,39 @@
 # Import third party modules
 from rest_framework.generics import CreateAPIView
-from rest_framework.exceptions import AuthenticationFailed
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.permissions import AllowAny
 from django.contrib.auth import logout
 from django.core.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 
 # Import project modules
 from .models import Vendor, Location, Menu
 from .serializers import VendorSerializer, MenuSerializer
 from users.utils import *
-
-# Import python standard modules
-import jwt, datetime
+from users.authentication import VendorJWTAuthentication
+from users.revocation import revoke_request_tokens
+from users.idempotency import idempotent
+from users.models import VerificationCode
+from users.serializers import CoordinatesSerializer
 
 
 # Define view for vendor Creation
 class CreateVendorView(CreateAPIView):
     serializer_class = VendorSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        # Generate verification code for user
-        verification_code = generate_verification_code()
-        hash_verification_code = hash_VC(verification_code)
-
         # Save the vendor instance
-        vendor = serializer.save(hashed_verification_code=hash_verification_code)
+        vendor = serializer.save()
+
+        # Generate verification code for vendor
+        verification_code = issue_verification_code(VerificationCode.VENDOR, vendor.email)
 
         # Send email verification code
         email = vendor.email
@@ -43,6 +48,10 @@ class CreateVendorView(CreateAPIView):
 
 # Define view to login vendor
 class LoginVendorView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         # Get the vendor's input email from the request
         email = request.data.get("email") 
@@ -51,12 +60,8 @@ class LoginVendorView(APIView):
             # Check if a vendor with the given email exists
             vendor = Vendor.objects.get(email=email)
 
-            verification_code = generate_verification_code() # Generate verification code for user
-            hash_verification_code = hash_VC(verification_code) # Hash verification code
-
-            # Update and save vendor details
-            vendor.hashed_verification_code = hash_verification_code 
-            vendor.save()
+            # Generate verification code for vendor
+            verification_code = issue_verification_code(VerificationCode.VENDOR, vendor.email)
 
             # Send email verification code 
             email = vendor.email
@@ -68,13 +73,22 @@ class LoginVendorView(APIView):
 
 # Define view to verify vendor 
 class VerifyCodeView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
     def post(self, request, *args, **kwargs):
-        # Get the vendor's input verification code from the request
+        # Get the vendor's input verification code and email from the request
         vendor_input_code = request.data.get("verification_code") 
+        vendor_input_email = request.data.get("email")
+
+        # Codes are checked per email, so failed guesses count against the code they target
+        if not vendor_input_email:
+            return Response({"detail": "Please provide your email along with the verification code"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            hashed_input_code = hash_VC(vendor_input_code) # Hash user inputed verification code
-            vendor = Vendor.objects.get(hashed_verification_code=hashed_input_code) # Get user with that email
+            # Consume the code and get the email it was issued to
+            email = check_verification_code(VerificationCode.VENDOR, vendor_input_code, vendor_input_email)
+            vendor = Vendor.objects.get(email=email) # Get vendor with that email
 
             # If vendor Exists
             if vendor: 
@@ -82,20 +96,12 @@ class VerifyCodeView(APIView):
                 vendor.is_login = True
                 vendor.save()
 
-                # Create a payload dictionary containing information to be encoded in the JWT
-                payload = {
-                    "id": vendor.id,
-                    "iat": datetime.datetime.utcnow()
-                }
-
-                # Encode the payload into a JWT using the specified secret key and algorithm
-                token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITH).decode("utf-8")
-
-                # Return token via cookies
+                # Return access and refresh tokens via cookies
                 reponse = Response()
-                reponse.set_cookie(key="jwt", value=token, httponly=True)
+                token, refresh_token = set_token_cookies(reponse, vendor)
                 reponse.data = {
-                    "jwt": token
+                    "jwt": token,
+                    "refresh": refresh_token,
                 }
 
             return reponse
@@ -105,23 +111,10 @@ class VerifyCodeView(APIView):
 
 # # Define view to retrieve Vendor information(Profile) based on a JWT stored in the request's cookies
 class VendorView(APIView):
-    def get(self, request):
-        token = request.COOKIES.get("jwt")
+    authentication_classes = [VendorJWTAuthentication]
 
-        # Check if the token is not present
-        if not token:
-            # Raise an AuthenticationFailed exception with a message
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        try:
-             # Decode the JWT using the provided secret key and algorithm
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithm=JWT_ALGORITH)
-        except jwt.DecodeError:
-            # Handle every potential decoding errors.
-            raise AuthenticationFailed("Unauthenticated!")
-        
-        vendor = Vendor.objects.filter(id=payload["id"]).first()
-        serializer = VendorSerializer(vendor)
+    def get(self, request):
+        serializer = VendorSerializer(request.user)
         response_data = {
             "Vendor": serializer.data,
         }
@@ -132,252 +125,194 @@ class VendorView(APIView):
 
 # Define view to logout vendor   
 class LogoutVendorView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def post(self, request, *args, **kwargs):
-        # Clear the JWT token from the cookie to log the user out
+        # Clear the JWT tokens from the cookies to log the user out
         response = Response()
         response.delete_cookie("jwt")
+        response.delete_cookie("refresh_jwt")
 
-        # Retrieve the current vendor, by decoding the JWT token
-        jwt_token = request.COOKIES.get("jwt")
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Update is_login to False
-                vendor.is_login = False
-                vendor.save()
-                logout(request)
-                response.data = {
-                    "message": "Logout successful"
-                }
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        vendor = request.user
+
+        # Update is_login to False
+        vendor.is_login = False
+        vendor.save()
+
+        # Revoke the access and refresh tokens so they can't be replayed
+        revoke_request_tokens(request)
+        logout(request)
+        response.data = {
+            "message": "Logout successful"
+        }
 
         return response
     
 
 # Define view to enable vendor delete thier account
 class VendorDeleteAccountView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def delete(self, request, *args, **kwargs):
         response = Response()
 
-        jwt_token = request.COOKIES.get("jwt")
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Delete the vendor
-                vendor.delete()
-                response.data = {
-                    "message": "Your account has been deleted successfully"
-                }
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Delete the vendor
+        request.user.delete()
+        response.data = {
+            "message": "Your account has been deleted successfully"
+        }
 
         return response
     
 
 # Define view to update vendor email
 class UpdateVendorEmailView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
+    @transaction.atomic
     def put(self, request, *args, **kwargs):
 
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
+        vendor = request.user
 
         # Get the new email from user
         new_email = request.data.get("email")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                verification_code = generate_verification_code() # Generate verification code for user
-                hash_verification_code = hash_VC(verification_code) # Hash verification code
+        # Update vendor details
+        vendor.email = new_email
+        vendor.is_verified = False
+        vendor.save()
 
-                # Update vendor details
-                vendor.email = new_email
-                vendor.hashed_verification_code = hash_verification_code
-                vendor.is_verified = False
-                vendor.save()
-                
-                # Send email verification code 
-                send_verification_email(new_email, verification_code)
-                response.data = {"message": "Email updated successfully"}
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Generate verification code for the new email
+        verification_code = issue_verification_code(VerificationCode.VENDOR, new_email)
+        
+        # Send email verification code 
+        send_verification_email(new_email, verification_code)
+        response.data = {"message": "Email updated successfully"}
 
         return response
     
 
 # Define view to update vendor contact_info
 class UpdateVendorContactInfoView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def put(self, request, *args, **kwargs):
 
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
+        vendor = request.user
 
         # Get the new contact info
         new_contact_info = request.data.get("contact_info")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Check if the new_contact_info already exists for another vendor
-                if Vendor.objects.exclude(id=vendor_id).filter(contact_info=new_contact_info).exists():
-                    return Response({"detail": "This contact_info already exists for another vendor."}, status=status.HTTP_400_BAD_REQUEST)
+        # Check if the new_contact_info already exists for another vendor
+        if Vendor.objects.exclude(id=vendor.id).filter(contact_info=new_contact_info).exists():
+            return Response({"detail": "This contact_info already exists for another vendor."}, status=status.HTTP_400_BAD_REQUEST)
 
-                # Update the contact_info
-                vendor.contact_info = new_contact_info
-                vendor.save()
-
-                response.data = {
-                    "message": "Contact info updated successfully."
-                }
+        # Update the contact_info
+        vendor.contact_info = new_contact_info
+        vendor.save()
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        response.data = {
+            "message": "Contact info updated successfully."
+        }
 
         return response
 
 
 # Define view to update vendor name and description
 class UpdateVendorNameAndDescriptionView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def put(self, request, *args, **kwargs):
 
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
+        vendor = request.user
 
         
         # Get the new name and description from vendor
         new_name = request.data.get("name")
         new_description = request.data.get("description")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Update vendor details
-                if new_name:
-                    vendor.name = new_name
-                if new_description:
-                        vendor.description = new_description
-                vendor.save()
+        # Update vendor details
+        if new_name:
+            vendor.name = new_name
+        if new_description:
+                vendor.description = new_description
+        vendor.save()
 
-                response.data = {
-                    "message": "update successfull"
-                }
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        response.data = {
+            "message": "update successfull"
+        }
 
         return response
 
 
 # Define view to add location to vendor
 class AddVendorLocationView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def post(self, request, *args, **kwargs):
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
+        vendor = request.user
 
         vendor_street = request.data.get("street")
         vendor_city = request.data.get("city")
         vendor_state = request.data.get("state")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Create a new location and associate it with the vendor
-                location = Location(street=vendor_street, city=vendor_city, state=vendor_state, vendor=vendor)
+        # Validate the optional coordinates used by the nearest vendors search
+        coordinates = CoordinatesSerializer(data=request.data)
+        coordinates.is_valid(raise_exception=True)
 
-                try:
-                    location.save()
-                    vendor.locations.add(location)
-                    vendor.is_active = True
-                    vendor.save()
+        # Create a new location and associate it with the vendor
+        location = Location(street=vendor_street, city=vendor_city, state=vendor_state, vendor=vendor, **coordinates.validated_data)
 
-                    response.data = {
-                        "message": "Location created and associated with the vendor."
-                    }
-                except ValidationError as e:
-                    return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            location.save()
+            vendor.locations.add(location)
+            vendor.is_active = True
+            vendor.save()
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+            response.data = {
+                "message": "Location created and associated with the vendor."
+            }
+        except ValidationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return response
     
 
 # Define view to delete a particular location from vendor
 class DeleteVendorLocationView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def delete(self, request, location_id, *args, **kwargs):
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
+        vendor = request.user
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Check if the location exists and belongs to the vendor
-                try:
-                    location = Location.objects.get(id=location_id, vendor=vendor)
-                except Location.DoesNotExist:
-                    return Response({"detail": "Location not found or does not belong to the vendor"}, status=status.HTTP_404_NOT_FOUND)
+        # Check if the location exists and belongs to the vendor
+        try:
+            location = Location.objects.get(id=location_id, vendor=vendor)
+        except Location.DoesNotExist:
+            return Response({"detail": "Location not found or does not belong to the vendor"}, status=status.HTTP_404_NOT_FOUND)
 
-                # Delete the location
-                location.delete()
+        # Delete the location
+        location.delete()
 
-                response.data = {
-                    "message": "Location deleted successfully."
-                }
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        response.data = {
+            "message": "Location deleted successfully."
+        }
 
         return response
     
 
 # Define view to add item to menu
 class AddMenuItemView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
+    @idempotent
     def post(self, request, *args, **kwargs):
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
 
         # Get data for the new menu item from the request
         category_id=request.data.get("category_id")
@@ -385,123 +320,82 @@ class AddMenuItemView(APIView):
         description = request.data.get("description")
         price = request.data.get("price")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-
-                # Create a new menu item
-                menu_item = Menu.objects.create(
-                    vendor_id=vendor_id,
-                    category_id=category_id,  
-                    name=name,
-                    description=description,
-                    price=price
-                )
-
-                # Serialize the new menu item and return the data
-                serializer = MenuSerializer(menu_item)
-                response.data = serializer.data
-                response.status_code = status.HTTP_201_CREATED
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Create a new menu item
+        menu_item = Menu.objects.create(
+            vendor_id=request.user.id,
+            category_id=category_id,  
+            name=name,
+            description=description,
+            price=price
+        )
+
+        # Serialize the new menu item and return the data
+        serializer = MenuSerializer(menu_item)
+        response.data = serializer.data
+        response.status_code = status.HTTP_201_CREATED
 
         return response
     
 
 # Define view to Retrieve all vendor items(vendor menu)
 class VendorMenuView(APIView):
-    def get(self, request, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
+    authentication_classes = [VendorJWTAuthentication]
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Retrieve all items added by the vendor
-                items = Menu.objects.filter(vendor=vendor)
+    def get(self, request, *args, **kwargs):
+        # Retrieve all items added by the vendor
+        items = Menu.objects.filter(vendor=request.user).for_serializer()
 
     
-                # Serialize the items and return the data
-                serializer = MenuSerializer(items, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Serialize the items and return the data
+        serializer = MenuSerializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 # Define view to get vendor menu by categories
 class VendorItemsByCategoryView(APIView):
-    def get(self, request, category_id, *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                vendor = Vendor.objects.get(id=vendor_id)
+    authentication_classes = [VendorJWTAuthentication]
 
-                # Retrieve all items added by the vendor for the specified category
-                items = Menu.objects.filter(vendor=vendor, category=category_id)
+    def get(self, request, category_id, *args, **kwargs):
+        # Retrieve all items added by the vendor for the specified category
+        items = Menu.objects.filter(vendor=request.user, category=category_id).for_serializer()
 
     
-                # Serialize the items and return the data
-                serializer = MenuSerializer(items, many=True)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Serialize the items and return the data
+        serializer = MenuSerializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
             
 
 
 # Define view to delete a particular item from menu
 class DeleteVendorItemView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def delete(self, request, item_id, *args, **kwargs):
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
-
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Check if the item exists and belongs to the vendor
-                try:
-                    item = Menu.objects.get(id=item_id, vendor=vendor)
-                except Menu.DoesNotExist:
-                    return Response({"detail": "Item not found or does not belong to the vendor"}, status=status.HTTP_404_NOT_FOUND)
 
-                # Delete the location
-                item.delete()
+        # Check if the item exists and belongs to the vendor
+        try:
+            item = Menu.objects.get(id=item_id, vendor=request.user)
+        except Menu.DoesNotExist:
+            return Response({"detail": "Item not found or does not belong to the vendor"}, status=status.HTTP_404_NOT_FOUND)
 
-                response.data = {
-                    "message": "Item deleted successfully."
-                }
+        # Delete the location
+        item.delete()
 
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        response.data = {
+            "message": "Item deleted successfully."
+        }
 
         return response
     
 
 # Define view to update vendor item
 class UpdateItemView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
+
     def put(self, request,  item_id, *args, **kwargs):
 
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
 
         
         # Get the new item name, description and price from vendor
@@ -509,123 +403,77 @@ class UpdateItemView(APIView):
         new_description = request.data.get("description")
         new_price = request.data.get("price")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                # Check if the item exists and belongs to the vendor
-                try:
-                    item = Menu.objects.get(id=item_id, vendor=vendor)
-                except Menu.DoesNotExist:
-                    return Response({"detail": "Item not found or does not belong to the vendor"}, status=status.HTTP_404_NOT_FOUND)
-
-
-                # Update item details
-                if new_name:
-                    item.name = new_name
-                if new_description:
-                        item.description = new_description
-                if new_price:
-                    item.price = new_price
-                item.save()
-
-                response.data = {
-                    "message": "update successfull"
-                }
-
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Check if the item exists and belongs to the vendor
+        try:
+            item = Menu.objects.get(id=item_id, vendor=request.user)
+        except Menu.DoesNotExist:
+            return Response({"detail": "Item not found or does not belong to the vendor"}, status=status.HTTP_404_NOT_FOUND)
+
+
+        # Update item details
+        if new_name:
+            item.name = new_name
+        if new_description:
+                item.description = new_description
+        if new_price:
+            item.price = new_price
+        item.save()
+
+        response.data = {
+            "message": "update successfull"
+        }
 
         return response
     
 
 # Define view to update vendor profile image
 class UpdateVendorImageView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
     parser_classes = (MultiPartParser, FormParser)
     def patch(self, request, *args, **kwargs):
         response = Response()
-        jwt_token = request.COOKIES.get("jwt")
 
         # Get the image from the request
         image = request.data.get("image")
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-
-
-                if not image:
-                    return Response({"detail": "No image provided"}, status=status.HTTP_400_BAD_REQUEST)
-                
-                vendor = Vendor.objects.get(id=vendor_id)
-                
-                # Update the vendor's image
-                vendor.image = image
-                vendor.save()
-                response.data = {
-                    "message": "update successfull"
-                }
-                    
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not image:
+            return Response({"detail": "No image provided"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        vendor = request.user
+        
+        # Update the vendor's image
+        vendor.image = image
+        vendor.save()
+        response.data = {
+            "message": "update successfull"
+        }
             
         return response
             
 
 # Define view to update item  image
 class UpdateItemImageView(APIView):
+    authentication_classes = [VendorJWTAuthentication]
     parser_classes = (MultiPartParser, FormParser)
 
     def patch(self, request, item_id,  *args, **kwargs):
-        jwt_token = request.COOKIES.get("jwt")
-
         # Retrieve the menu item instance or return a 404 response if not found
         menu_item = get_object_or_404(Menu, id=item_id)
 
-        if jwt_token:
-            try:
-                decoded_payload = jwt.decode(jwt_token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITH])
-                vendor_id = decoded_payload.get("id")
-                # Retrieve the vendor from the database
-                vendor = Vendor.objects.get(id=vendor_id)
-
-                if vendor != menu_item.vendor:
-                    return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-
-                # Assuming the user is the owner, update the image
-                menu_item.image = request.data.get('image', menu_item.image)
-                
-                try:
-                    # Save the updated menu item
-                    menu_item.save()
-
-                    # Serialize the updated menu item and return the data
-                    serializer = MenuSerializer(menu_item)
-                    return Response(serializer.data, status=status.HTTP_200_OK)
-
-                except Exception as e:
-                    # Handle validation errors or other exceptions
-                    return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-                
-            except jwt.InvalidTokenError:
-                return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-            except Vendor.DoesNotExist:
-                return Response({"detail": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
-
-            
-
+        if request.user.id != menu_item.vendor_id:
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
+        # Assuming the user is the owner, update the image
+        menu_item.image = request.data.get('image', menu_item.image)
+        
+        try:
+            # Save the updated menu item
+            menu_item.save()
 
-    
-            
-
+            # Serialize the updated menu item and return the data
+            serializer = MenuSerializer(menu_item)
+            return Response(serializer.data, status=status.HTTP_200_OK)
 
-       
\ No newline at end of file
+        except Exception as e:
+            # Handle validation errors or other exceptions
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)